@@ -0,0 +1,112 @@
+"""
+Cliente de OpenRouter compartido por todo el proceso.
+
+El cliente (y su pool de conexiones HTTP) se crea una sola vez por proceso con
+timeouts explícitos de conexión y lectura, en lugar de construir un cliente
+nuevo, con su propio handshake TLS, en cada petición. ``openai`` y ``httpx``
+se importan recién al crear el cliente: son la mayor parte del tiempo de
+arranque de la aplicación y solo los necesitan las rutas de resúmenes con IA.
+"""
+
+import os
+import threading
+
+SYSTEM_PROMPT = (
+    "Eres un asistente especializado en redactar resúmenes profesionales para currículums. "
+    "Genera resúmenes concisos, profesionales y orientados a resultados, redactados en primera persona, "
+    "resaltando mis logros, habilidades y experiencia de manera clara y efectiva."
+)
+
+DEFAULT_MODEL = 'deepseek/deepseek-r1:free'
+
+RESUMEN_GENERICO = (
+    "Profesional con experiencia en el sector, enfocado en resultados y mejora continua. "
+    "Combina habilidades técnicas con capacidad de liderazgo y trabajo en equipo. "
+    "Comprometido con la excelencia y el aprendizaje constante."
+)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+class AIConfigurationError(Exception):
+    """Falta la configuración necesaria para llamar a OpenRouter."""
+
+
+def get_openrouter_client():
+    """Devuelve el cliente de OpenRouter del proceso, creándolo la primera vez."""
+    global _client, _client_pid
+    # Las conexiones abiertas no se comparten entre procesos (fork de gunicorn)
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            api_key = os.getenv('OPENROUTER_API_KEY')
+            if not api_key:
+                raise AIConfigurationError('No se encontró la API key de OpenRouter')
+            import httpx
+            from openai import OpenAI
+            timeout = httpx.Timeout(
+                float(os.getenv('OPENROUTER_READ_TIMEOUT', '60')),
+                connect=float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', '5'))
+            )
+            http_client = httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv('OPENROUTER_MAX_CONNECTIONS', '20')),
+                    max_keepalive_connections=int(os.getenv('OPENROUTER_MAX_KEEPALIVE', '10'))
+                )
+            )
+            _client = OpenAI(
+                api_key=api_key,
+                base_url=os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1'),
+                http_client=http_client,
+                timeout=timeout,
+                max_retries=int(os.getenv('OPENROUTER_MAX_RETRIES', '0'))
+            )
+            _client_pid = os.getpid()
+    return _client
+
+
+def is_rate_limited(error):
+    """Indica si el error de la API es un 429 (sin importar ``openai`` para comprobarlo)."""
+    return getattr(error, 'status_code', None) == 429
+
+
+def build_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def generate_summary(prompt, model=DEFAULT_MODEL, timeout=None):
+    """Genera el resumen completo en una sola respuesta."""
+    options = {'timeout': timeout} if timeout is not None else {}
+    chat = get_openrouter_client().chat.completions.create(
+        model=model,
+        messages=build_messages(prompt),
+        **options
+    )
+    return chat.choices[0].message.content
+
+
+def stream_summary(prompt, model=DEFAULT_MODEL, timeout=None):
+    """Genera el resumen en streaming, devolviendo los fragmentos de texto a medida que llegan."""
+    options = {'timeout': timeout} if timeout is not None else {}
+    stream = get_openrouter_client().chat.completions.create(
+        model=model,
+        messages=build_messages(prompt),
+        stream=True,
+        **options
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        stream.close()
@@ -1,5 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, make_response, current_app
-import mercadopago
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, make_response, Response, stream_with_context
 import os
 import json
 import tempfile
@@ -7,18 +6,31 @@ import base64
 from dotenv import load_dotenv
 from datetime import datetime
 from io import BytesIO
-from fpdf import FPDF
+import re
 import uuid
-import requests
-from openai import OpenAI
+import sqlite3
+from concurrent.futures import Future
+from cache import LRUCache, PDFCache, cv_digest
+from cv_model import InvalidCV, compile_cv
+from images import (DEFAULT_IMAGE_DPI, MAX_IMAGE_PIXELS, ImageTooLarge, InvalidImage, ProfileImageCache,
+                    check_image_pixels, sniff_image_type, store_profile_image)
+from render_pool import RenderPool, RenderPoolError
+from batch import NDJSON_MIMETYPES, iter_json_items, iter_ndjson_items, stream_pdf_zip
+from template_engine import RenderEnv
+from cv_templates import template_registry
+from form_store import create_form_store
+from blob_store import BlobTooLarge, FileBlobStore, blob_ref, is_blob_ref
+from ai_client import AIConfigurationError, DEFAULT_MODEL, RESUMEN_GENERICO
+from model_router import ModelRouter, SummaryUnavailable, parse_models
+from summary_cache import SummaryCache
+from payments import LazyMPSDK, create_payment_store
+from prerender import PrerenderStore
+from pdf_archive import PDFArchive
+from request_log import annotate, configure_logging, parse_sample_rates, payload_summary, stage
+from metrics import (IMAGE_CACHE, PDF_BYTES, PDF_CACHE, PREVIEW_CACHE, RENDERS, SUMMARY_CACHE,
+                     registry as metrics_registry)
+from pdf_profiles import DEFAULT_PROFILE, get_profile
 
-try:
-    from PIL import Image
-    HAS_PIL = True
-except ImportError:
-    HAS_PIL = False
-
-import io
 
 # Cargar variables de entorno
 load_dotenv()
@@ -41,6 +53,120 @@ else:
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Logging estructurado: nivel, formato (text o json) y muestreo por evento ("request=0.1,pdf.imagen=0.5")
+log = configure_logging(
+    app,
+    level=os.getenv('LOG_LEVEL') or ('DEBUG' if app.config['ENVIRONMENT'] == 'development' else 'INFO'),
+    fmt=os.getenv('LOG_FORMAT') or ('text' if app.config['ENVIRONMENT'] == 'development' else 'json'),
+    sample_rates=parse_sample_rates(os.getenv('LOG_SAMPLE'))
+)
+
+# Métricas de Prometheus en /metrics, combinadas entre procesos a través de archivos en METRICS_DIR
+metrics_registry.configure(
+    directory=os.getenv('METRICS_DIR') or os.path.join(PDF_FOLDER, 'metrics'),
+    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+)
+
+# Almacén de datos de formulario (reemplaza los archivos form_<uuid>.json)
+form_store = create_form_store(
+    os.getenv('FORM_STORE', 'sqlite'),
+    path=os.getenv('FORM_STORE_PATH') or os.path.join(PDF_FOLDER, 'forms.db'),
+    ttl=int(os.getenv('FORM_TTL', str(48 * 3600))),
+    sweep_interval=int(os.getenv('FORM_SWEEP_INTERVAL', '600')),
+    legacy_dir=PDF_FOLDER
+)
+
+# Fotos de perfil guardadas una sola vez, por contenido; los formularios solo guardan la referencia
+blob_store = FileBlobStore(os.getenv('BLOB_STORE_PATH') or os.path.join(PDF_FOLDER, 'blobs'))
+form_store.sweep_hooks.append(lambda: blob_store.sweep(form_store.ttl))
+
+# Tamaño máximo de la foto subida en binario a /upload_image
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv('MAX_IMAGE_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+# Margen para los encabezados y separadores de un cuerpo multipart
+MULTIPART_OVERHEAD = 16 * 1024
+
+# Caché de PDFs generados (LRU en memoria)
+pdf_cache = PDFCache(
+    max_entries=int(os.getenv('PDF_CACHE_MAX_ENTRIES', '128')),
+    max_bytes=int(os.getenv('PDF_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+)
+
+# Vista previa de la primera página del PDF como imagen de baja resolución, en caché por digest del CV
+PREVIEW_MIMETYPES = {'png': 'image/png', 'webp': 'image/webp'}
+PREVIEW_DPI = int(os.getenv('PREVIEW_DPI', '72'))
+PREVIEW_FORMAT = os.getenv('PREVIEW_FORMAT', 'png')
+preview_cache = LRUCache(
+    max_entries=int(os.getenv('PREVIEW_CACHE_MAX_ENTRIES', '256')),
+    max_bytes=int(os.getenv('PREVIEW_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+)
+
+# Archivo en disco de los PDFs generados, indexado en SQLite, con vencimiento y cuota (PDF_ARCHIVE=0 lo desactiva)
+pdf_archive = PDFArchive(
+    os.getenv('PDF_ARCHIVE_PATH') or os.path.join(PDF_FOLDER, 'archive'),
+    ttl=int(os.getenv('PDF_ARCHIVE_TTL', str(7 * 24 * 3600))),
+    max_bytes=int(os.getenv('PDF_ARCHIVE_MAX_BYTES', str(512 * 1024 * 1024)))
+) if os.getenv('PDF_ARCHIVE', '1') == '1' else None
+if pdf_archive is not None:
+    form_store.sweep_hooks.append(pdf_archive.sweep)
+
+# Identificador de un PDF archivado: digest SHA-256 del CV en hexadecimal
+PDF_ID_RE = re.compile(r'[0-9a-f]{64}')
+
+# Con PDF_X_SENDFILE=1 los PDFs archivados los envía el servidor web (cabecera X-Sendfile)
+app.config['USE_X_SENDFILE'] = os.getenv('PDF_X_SENDFILE') == '1'
+
+# Caché de fotos de perfil ya procesadas (JPEG listo para incrustar a IMAGE_DPI en su recuadro)
+profile_image_cache = ProfileImageCache(
+    max_entries=int(os.getenv('IMAGE_CACHE_MAX_ENTRIES', '256')),
+    max_bytes=int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+    blob_store=blob_store,
+    dpi=int(os.getenv('IMAGE_DPI', str(DEFAULT_IMAGE_DPI))),
+    max_pixels=int(os.getenv('MAX_IMAGE_PIXELS', str(MAX_IMAGE_PIXELS)))
+)
+
+# Perfil de salida de los PDFs cuando la petición no indica output_profile ("screen" o "print")
+PDF_OUTPUT_PROFILE = get_profile(os.getenv('PDF_OUTPUT_PROFILE', DEFAULT_PROFILE)).name
+
+# Pool de procesos de render (RENDER_WORKERS=0 genera los PDFs en el hilo de la petición)
+render_pool = RenderPool(
+    workers=int(os.getenv('RENDER_WORKERS', '0')),
+    queue_size=int(os.getenv('RENDER_QUEUE_SIZE')) if os.getenv('RENDER_QUEUE_SIZE') else None,
+    timeout=float(os.getenv('RENDER_TIMEOUT', '30')),
+    retry_after=int(os.getenv('RENDER_RETRY_AFTER', '5')),
+    start_method=os.getenv('RENDER_START_METHOD') or None
+)
+
+# Modelos para los resúmenes con IA, en orden de preferencia ("modelo=concurrencia,..."), y plazo total por petición
+SUMMARY_DEADLINE = float(os.getenv('SUMMARY_DEADLINE', '20'))
+model_router = ModelRouter(
+    parse_models(
+        os.getenv('OPENROUTER_MODELS', DEFAULT_MODEL),
+        default_concurrency=int(os.getenv('OPENROUTER_MODEL_CONCURRENCY', '8'))
+    ),
+    deadline=SUMMARY_DEADLINE,
+    attempt_timeout=float(os.getenv('OPENROUTER_ATTEMPT_TIMEOUT')) if os.getenv('OPENROUTER_ATTEMPT_TIMEOUT') else None,
+    cooldown=float(os.getenv('OPENROUTER_COOLDOWN', '30')),
+    stats_max_age=float(os.getenv('OPENROUTER_STATS_MAX_AGE', '300'))
+)
+
+# Caché de resúmenes generados con IA (LRU con TTL y, opcionalmente, SQLite compartido entre procesos)
+summary_cache = SummaryCache(
+    max_entries=int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '1024')),
+    ttl=int(os.getenv('SUMMARY_CACHE_TTL', str(24 * 3600))),
+    path=(os.getenv('SUMMARY_CACHE_PATH') or os.path.join(PDF_FOLDER, 'summaries.db')) if os.getenv('SUMMARY_CACHE_DISK') == '1' else None,
+    wait_timeout=SUMMARY_DEADLINE
+)
+form_store.sweep_hooks.append(summary_cache.sweep)
+
+# PDFs generados en segundo plano al aprobarse un pago (PRERENDER=0 lo desactiva); quedan en la caché y en el archivo
+prerender_store = PrerenderStore() if os.getenv('PRERENDER', '1') == '1' else None
+# Tiempo que una descarga espera un pre-render en ejecución antes de generar el PDF por su cuenta
+PRERENDER_WAIT = float(os.getenv('PRERENDER_WAIT', '2'))
+
+# Límites para la generación por lotes
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+BATCH_MAX_IN_FLIGHT = int(os.getenv('BATCH_MAX_IN_FLIGHT', str(max(1, render_pool.workers))))
+
 # Configuración de precios según entorno
 if app.config['ENVIRONMENT'] == 'production':
     # En producción (rama main)
@@ -65,7 +191,46 @@ mp_public_key = os.getenv('MP_PUBLIC_KEY')
 if not mp_access_token or not mp_public_key:
     raise ValueError("MP_ACCESS_TOKEN y MP_PUBLIC_KEY deben estar configurados en las variables de entorno")
 
-sdk = mercadopago.SDK(mp_access_token)
+# SDK con conexiones reutilizables entre llamadas y timeout explícito (se crea en la primera llamada)
+sdk = LazyMPSDK(
+    mp_access_token,
+    timeout=float(os.getenv('MP_TIMEOUT', '10')),
+    max_retries=int(os.getenv('MP_MAX_RETRIES', '2')),
+    base_url=os.getenv('MP_API_URL') or None
+)
+
+# Estado de los pagos recibido por /webhook, para no consultar la API en /success ni en las descargas
+payment_store = create_payment_store(
+    os.getenv('FORM_STORE', 'sqlite'),
+    path=os.getenv('PAYMENT_STORE_PATH') or os.path.join(PDF_FOLDER, 'payments.db'),
+    ttl=int(os.getenv('PAYMENT_TTL', str(7 * 24 * 3600)))
+)
+form_store.sweep_hooks.append(payment_store.sweep)
+
+def fetch_payment(payment_id):
+    """Devuelve el pago desde el almacén local y, si no está, desde la API de MercadoPago (y lo guarda)."""
+    payment = payment_store.get(payment_id)
+    if payment is not None:
+        log.debug('pago.local', payment_id=payment_id)
+        return payment
+    payment_info = sdk.payment().get(payment_id)
+    payment = payment_info.get('response')
+    if not isinstance(payment, dict):
+        return None
+    # Solo se guardan respuestas válidas; un error de la API se devuelve tal cual, sin guardarlo
+    if payment_info.get('status') == 200 and 'id' in payment:
+        payment_store.put(payment)
+    else:
+        log.warning('pago.respuesta_inesperada', payment_id=payment_id, status=payment_info.get('status'))
+    return payment
+
+def resolve_form_id(data):
+    """Completa ``form_id`` a partir de ``payment_id`` (referencia externa del pago) si no viene en los datos."""
+    if 'form_id' not in data and data.get('payment_id'):
+        payment = fetch_payment(data['payment_id'])
+        if payment and payment.get('external_reference'):
+            data['form_id'] = payment['external_reference']
+    return 'form_id' in data
 
 @app.route('/')
 def index():
@@ -87,19 +252,9 @@ def create_preference():
         else:
             price = app.config['PRECIO_BASICO']
         
-        # Cargar los datos existentes del formulario
-        json_path = os.path.join(PDF_FOLDER, f'form_{external_reference}.json')
-        if os.path.exists(json_path):
-            with open(json_path, 'r', encoding='utf-8') as f:
-                form_data = json.load(f)
-                # Actualizar el color en los datos guardados
-                form_data['template_color'] = template_color
-                app.logger.info(f"[DEBUG] Actualizando color en datos guardados: {template_color}")
-            
-            # Guardar los datos actualizados
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(form_data, f, ensure_ascii=False, indent=2)
-                app.logger.info(f"[DEBUG] Datos actualizados guardados con color: {template_color}")
+        # Actualizar el color en los datos guardados del formulario (actualización parcial atómica)
+        if external_reference and form_store.update(external_reference, {'template_color': template_color}) is not None:
+            log.debug('formulario.color_actualizado', form_id=external_reference, template_color=template_color)
         
         # Crear el objeto de preferencia
         preference_data = {
@@ -125,7 +280,7 @@ def create_preference():
         preference_response = sdk.preference().create(preference_data)
         
         if "response" not in preference_response:
-            current_app.logger.error(f"Error en la respuesta de MercadoPago: {preference_response}")
+            log.error('preferencia.respuesta_invalida', respuesta=str(preference_response))
             return jsonify({"error": "Error al crear la preferencia"}), 500
             
         return jsonify({
@@ -134,7 +289,7 @@ def create_preference():
         })
             
     except Exception as e:
-        current_app.logger.error(f"Error creating preference: {str(e)}")
+        log.error('preferencia.error', error=str(e))
         return jsonify({"error": str(e)}), 500
 
 @app.route('/save_form_data', methods=['POST'])
@@ -143,38 +298,91 @@ def save_form_data():
         if not request.is_json:
             return jsonify({"error": "Se requiere JSON"}), 400
             
-        data = request.get_json()
+        with stage('json_load'):
+            data = request.get_json()
         
         # Verificar el color de la plantilla
         template_type = data.get('template_type')
         template_color = data.get('template_color')
         
-        app.logger.info(f"[DEBUG] Tipo de plantilla recibido: {template_type}")
-        app.logger.info(f"[DEBUG] Color de plantilla recibido: {template_color}")
+        log.debug('formulario.recibido', template_type=template_type, template_color=template_color)
         
         # Generar un ID único para el formulario
         form_id = str(uuid.uuid4())
         
-        # Guardar los datos en un archivo JSON
-        json_path = os.path.join(PDF_FOLDER, f'form_{form_id}.json')
-        
-        # Asegurarse de que el directorio existe
-        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+        # Guardar la foto aparte y dejar en el registro solo su referencia
+        if data.get('profile_image') and not is_blob_ref(data['profile_image']):
+            try:
+                with stage('blob_store'):
+                    data['profile_image'] = store_profile_image(blob_store, data['profile_image'])
+                log.debug('formulario.imagen_guardada', ref=data['profile_image'])
+            except Exception as e:
+                log.warning('formulario.imagen_no_guardada', error=str(e))
+        elif data.get('profile_image') and not blob_store.touch(data['profile_image']):
+            # Token de /upload_image vencido o inválido: el PDF saldrá sin foto
+            log.warning('formulario.imagen_no_encontrada', ref=data['profile_image'])
         
-        app.logger.info(f"[DEBUG] Guardando datos en: {json_path}")
-        app.logger.info(f"[DEBUG] Datos a guardar: {str(data)[:100]}...")
+        # Guardar los datos en el almacén de formularios
+        log.debug('formulario.guardando', form_id=form_id, datos=lambda: payload_summary(data))
         
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with stage('form_write'):
+            form_store.put(form_id, data)
             
-        app.logger.info(f"[DEBUG] Datos guardados exitosamente con color: {data.get('template_color')}")
+        log.debug('formulario.guardado', form_id=form_id, template_color=data.get('template_color'))
         
         return jsonify({"form_id": form_id})
         
     except Exception as e:
-        app.logger.error(f"[ERROR] Error al guardar datos del formulario: {str(e)}")
+        log.error('formulario.error', error=str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/upload_image', methods=['POST'])
+def upload_image():
+    """Recibe la foto de perfil en binario (cuerpo crudo o multipart) y devuelve su token ``blob:<digest>``.
+
+    La foto se escribe al almacén de blobs por bloques, sin pasar por JSON ni
+    base64; los formularios y las descargas envían solo el token.
+    """
+    try:
+        if request.content_length is not None and request.content_length > MAX_IMAGE_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+            return jsonify({"error": "La imagen es demasiado grande"}), 413
+        
+        if request.mimetype == 'multipart/form-data':
+            # Sin Content-Length no se puede acotar lo que el parser de multipart lee
+            if request.content_length is None:
+                return jsonify({"error": "Se requiere Content-Length"}), 411
+            upload = request.files.get('profile_image') or next(iter(request.files.values()), None)
+            if upload is None:
+                return jsonify({"error": "No se recibió ninguna imagen"}), 400
+            stream = upload.stream
+        else:
+            stream = request.stream
+        
+        head = stream.read(16)
+        mimetype = sniff_image_type(head)
+        if mimetype is None:
+            return jsonify({"error": "Formato de imagen no soportado"}), 415
+        
+        # Las imágenes ilegibles o con demasiados píxeles (solo se lee el encabezado) no llegan a guardarse
+        with stage('image_upload'):
+            digest, size = blob_store.put_stream(
+                stream, MAX_IMAGE_UPLOAD_BYTES, head=head,
+                validate=lambda f: check_image_pixels(f, profile_image_cache.max_pixels)
+            )
+        log.debug('imagen.subida', digest=digest, bytes=size, mimetype=mimetype)
+        
+        return jsonify({"image_token": blob_ref(digest), "bytes": size})
+        
+    except (BlobTooLarge, ImageTooLarge) as e:
+        log.warning('imagen.demasiado_grande', error=str(e))
+        return jsonify({"error": "La imagen es demasiado grande"}), 413
+    except InvalidImage as e:
+        log.warning('imagen.invalida', error=str(e))
+        return jsonify({"error": "Formato de imagen no soportado"}), 415
+    except Exception as e:
+        log.error('imagen.error', error=str(e))
+        return jsonify({"error": "No se pudo guardar la imagen"}), 500
+
 @app.route('/success')
 def success():
     try:
@@ -186,50 +394,59 @@ def success():
         if status != 'approved':
             return redirect(url_for('failure'))
             
-        # Registrar información del pago
-        if payment_id:
-            try:
-                payment_info = sdk.payment().get(payment_id)
-                if 'response' in payment_info:
-                    current_app.logger.info(f"Pago confirmado: {payment_info['response']}")
+        # Registrar información del pago (del almacén local; la API solo si el webhook aún no llegó)
+        payment = None
+        try:
+            if payment_id:
+                with stage('payment'):
+                    payment = fetch_payment(payment_id)
+            elif external_reference:
+                payment = payment_store.get_by_reference(external_reference, status='approved')
+                payment_id = payment['id'] if payment else None
+        except Exception as e:
+            log.error('pago.error_verificacion', error=str(e))
+
+        if payment is not None:
+            log.info('pago.confirmado', payment_id=payment.get('id'), status=payment.get('status'),
+                     external_reference=payment.get('external_reference'))
+            
+            # Obtener el form_id del external_reference o del pago
+            form_id = external_reference or payment.get('external_reference')
+            
+            if form_id:
+                # Verificar que existen los datos del formulario
+                with stage('form_read'):
+                    form_data = form_store.get(form_id)
+                if form_data is not None:
+                    log.debug('formulario.encontrado', form_id=form_id)
                     
-                    # Obtener el form_id del external_reference o del payment_info
-                    form_id = external_reference or payment_info['response'].get('external_reference')
+                    # Obtener el color de la plantilla
+                    template_type = form_data.get('template_type', 'basico')
+                    template_color = form_data.get('template_color', 'azul-marino')
                     
-                    if form_id:
-                        # Verificar que existe el archivo JSON
-                        json_path = os.path.join(PDF_FOLDER, f'form_{form_id}.json')
-                        if os.path.exists(json_path):
-                            current_app.logger.info(f"[DEBUG] Archivo de datos encontrado: {json_path}")
-                            with open(json_path, 'r', encoding='utf-8') as f:
-                                form_data = json.load(f)
-                            
-                            # Obtener el color de la plantilla
-                            template_type = form_data.get('template_type', 'basico')
-                            template_color = form_data.get('template_color', 'azul-marino')
-                            
-                            current_app.logger.info(f"[DEBUG] Tipo de plantilla: {template_type}")
-                            current_app.logger.info(f"[DEBUG] Color de plantilla: {template_color}")
-                            
-                            # Renderizar success.html con el form_id y template_color
-                            return render_template('success.html',
-                                               template_type=template_type,
-                                               template_color=template_color,
-                                               payment_id=payment_id,
-                                               form_id=form_id)
-                        else:
-                            current_app.logger.error(f"[ERROR] No se encontró el archivo de datos: {json_path}")
-                    else:
-                        current_app.logger.error("[ERROR] No se encontró form_id en la respuesta del pago")
-            except Exception as e:
-                current_app.logger.error(f"[ERROR] Error al verificar pago: {str(e)}")
+                    log.debug('success.plantilla', template_type=template_type, template_color=template_color)
+                    
+                    # Si el webhook no llegó antes, empezar el PDF mientras se carga la página
+                    if payment.get('status') == 'approved':
+                        schedule_prerender(form_id)
+                    
+                    # Renderizar success.html con el form_id y template_color
+                    return render_template('success.html',
+                                       template_type=template_type,
+                                       template_color=template_color,
+                                       payment_id=payment_id,
+                                       form_id=form_id)
+                else:
+                    log.error('formulario.no_encontrado', form_id=form_id)
+            else:
+                log.error('pago.sin_form_id', payment_id=payment_id)
         
         # Si no se encuentra el form_id o hay algún error, mostrar mensaje de error
         return render_template('error.html',
                            message="No se pudieron recuperar los datos del CV. Por favor, intente nuevamente.")
         
     except Exception as e:
-        current_app.logger.error(f"[ERROR] Error en success: {str(e)}")
+        log.error('success.error', error=str(e))
         return str(e), 500
 
 @app.route('/failure')
@@ -252,23 +469,30 @@ def webhook():
         if not data:
             return jsonify({'error': 'No se recibieron datos'}), 400
 
-        if data.get('type') == 'payment' and data.get('action') == 'payment.updated':
+        if data.get('type') == 'payment' and data.get('action') in ('payment.created', 'payment.updated'):
             payment_id = data.get('data', {}).get('id')
             if payment_id:
-                payment_info = sdk.payment().get(payment_id)
+                with stage('payment_api'):
+                    payment_info = sdk.payment().get(payment_id)
                 
-                if 'response' in payment_info:
+                if payment_info.get('status') == 200 and 'id' in payment_info.get('response', {}):
                     payment_data = payment_info['response']
-                    current_app.logger.info(f"Pago recibido: {payment_data}")
+                    # Guardar el estado para que /success y las descargas no consulten la API
+                    payment_store.put(payment_data)
+                    log.info('pago.recibido', payment_id=payment_data.get('id'), status=payment_data.get('status'),
+                             external_reference=payment_data.get('external_reference'))
+                    if payment_data.get('status') == 'approved':
+                        # Tener el PDF listo antes de que el navegador lo pida
+                        schedule_prerender(payment_data.get('external_reference'))
                     return jsonify({'status': 'success'}), 200
                 else:
-                    current_app.logger.error(f"Error al obtener información del pago: {payment_info}")
+                    log.error('pago.error_consulta', payment_id=payment_id, respuesta=str(payment_info))
                     return jsonify({'error': 'Error al procesar el pago'}), 400
         
         return jsonify({'status': 'ignored'}), 200
         
     except Exception as e:
-        current_app.logger.error(f"Error en webhook: {str(e)}")
+        log.error('webhook.error', error=str(e))
         return jsonify({'error': str(e)}), 500
 
 @app.route('/generate_pdf', methods=['POST'])
@@ -278,534 +502,516 @@ def generate_pdf():
         if not request.is_json:
             return jsonify({"error": "Se requiere JSON"}), 400
             
-        data = request.get_json()
+        with stage('json_load'):
+            data = request.get_json()
         if data is None:
             return jsonify({"error": "JSON inválido"}), 400
             
-        # Obtener datos del CV, ya sea del archivo JSON o directamente
+        # Obtener datos del CV, ya sea del almacén de formularios o directamente
         cv_data = None
         
         if 'cv_data' in data:
             cv_data = data['cv_data']
-        elif 'form_id' in data:
-            json_path = os.path.join(PDF_FOLDER, f'form_{data["form_id"]}.json')
-            if os.path.exists(json_path):
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    cv_data = json.load(f)
-                try:
-                    os.remove(json_path)
-                except Exception as e:
-                    current_app.logger.error(f"Error al eliminar archivo temporal: {str(e)}")
+        elif resolve_form_id(data):
+            # Los datos se consumen: obtener y eliminar en una sola operación
+            with stage('form_read'):
+                cv_data = form_store.pop(data['form_id'])
         
         if cv_data is None:
             return jsonify({"error": "No se encontraron datos del CV"}), 400
 
-        # Generar PDF
-        pdf = generate_pdf_content(cv_data)
-        
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            pdf.output(tmp_file.name)
-            
-            # Leer el archivo
-            with open(tmp_file.name, 'rb') as f:
-                pdf_bytes = f.read()
-                
-            # Eliminar archivo temporal
-            os.unlink(tmp_file.name)
-            
-            # Enviar respuesta
-            response = make_response(pdf_bytes)
-            response.headers['Content-Type'] = 'application/pdf'
-            response.headers['Content-Disposition'] = 'attachment; filename=cv.pdf'
-            return response
+        # Generar PDF en memoria (o tomarlo de la caché o del archivo) y enviarlo
+        return cached_pdf_response(cv_data, form_id=None if 'cv_data' in data else data.get('form_id'))
             
     except Exception as e:
-        current_app.logger.error(f"Error generando PDF: {str(e)}")
+        log.error('pdf.error', error=str(e))
         return jsonify({"error": str(e)}), 500
 
+def prepare_download_data(data):
+    """Combina los datos directos con los del formulario guardado.
+
+    Devuelve None si se indicó un ``form_id`` que no existe. La validación y la
+    normalización de los campos quedan a cargo de ``compile_cv``.
+    """
+    # Guardar la imagen y el color si están presentes en los datos directos
+    profile_image = data.get('profile_image')
+    template_color = data.get('template_color')
+    
+    # Si se proporciona form_id (o un payment_id), cargar los datos guardados del formulario
+    if resolve_form_id(data):
+        form_id = data['form_id']
+        with stage('form_read'):
+            stored_data = form_store.get(form_id)
+        
+        if stored_data is None:
+            log.error('formulario.no_encontrado', form_id=form_id)
+            return None
+        log.debug('formulario.cargado', form_id=form_id)
+            
+        # Mantener la imagen del perfil si se proporcionó en los datos directos
+        if profile_image:
+            stored_data['profile_image'] = profile_image
+            log.debug('pdf.imagen', origen='directa')
+        elif 'profile_image' in stored_data:
+            log.debug('pdf.imagen', origen='formulario')
+        else:
+            log.debug('pdf.imagen', origen='ninguna')
+        
+        # Mantener el perfil de salida si se proporcionó en los datos directos
+        if data.get('output_profile'):
+            stored_data['output_profile'] = data['output_profile']
+        
+        # Mantener el color si se proporcionó en los datos directos
+        if template_color:
+            stored_data['template_color'] = template_color
+            log.debug('pdf.color', origen='directo', template_color=template_color)
+        elif 'template_color' in stored_data:
+            log.debug('pdf.color', origen='formulario', template_color=stored_data['template_color'])
+        else:
+            log.debug('pdf.color', origen='ninguno')
+        
+        # Actualizar otros campos desde los datos directos
+        stored_data['template_type'] = data.get('template_type', stored_data.get('template_type', 'basico'))
+        
+        data = stored_data
+    
+    log.debug('pdf.datos_finales', datos=lambda: payload_summary(data))
+    return data
+
 @app.route('/download_pdf', methods=['POST'])
 def download_pdf():
     try:
         # Verificar que los datos son JSON válidos
         if not request.is_json:
-            app.logger.error("[ERROR] La solicitud no contiene JSON")
+            log.error('pdf.solicitud_sin_json')
             return jsonify({"error": "Se requiere JSON"}), 400
             
-        data = request.get_json()
+        with stage('json_load'):
+            data = request.get_json()
         if data is None:
-            app.logger.error("[ERROR] JSON inválido")
+            log.error('pdf.json_invalido')
             return jsonify({"error": "JSON inválido"}), 400
         
-        app.logger.info(f"[DEBUG] Datos recibidos para PDF: {str(data)[:100]}...")
-        app.logger.info(f"[DEBUG] Color recibido: {data.get('template_color', 'No especificado')}")
-        
-        # Guardar la imagen y el color si están presentes en los datos directos
-        profile_image = data.get('profile_image')
-        template_color = data.get('template_color')
-        
-        # Si se proporciona form_id, cargar datos del archivo JSON
-        if 'form_id' in data:
-            form_id = data['form_id']
-            json_path = os.path.join(PDF_FOLDER, f'form_{form_id}.json')
-            
-            if os.path.exists(json_path):
-                app.logger.info(f"[DEBUG] Cargando datos del archivo: {json_path}")
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    stored_data = json.load(f)
-                    
-                # Mantener la imagen del perfil si se proporcionó en los datos directos
-                if profile_image:
-                    stored_data['profile_image'] = profile_image
-                    app.logger.info("[DEBUG] Usando imagen proporcionada en los datos directos")
-                elif 'profile_image' in stored_data:
-                    app.logger.info("[DEBUG] Usando imagen del archivo JSON almacenado")
-                else:
-                    app.logger.warning("[WARNING] No se encontró imagen ni en los datos directos ni en el archivo JSON")
-                
-                # Mantener el color si se proporcionó en los datos directos
-                if template_color:
-                    stored_data['template_color'] = template_color
-                    app.logger.info(f"[DEBUG] Usando color proporcionado en los datos directos: {template_color}")
-                elif 'template_color' in stored_data:
-                    app.logger.info(f"[DEBUG] Usando color del archivo JSON almacenado: {stored_data['template_color']}")
-                else:
-                    app.logger.warning("[WARNING] No se encontró color ni en los datos directos ni en el archivo JSON")
-                
-                # Actualizar otros campos desde los datos directos
-                stored_data['template_type'] = data.get('template_type', stored_data.get('template_type', 'basico'))
-                
-                data = stored_data
-            else:
-                app.logger.error(f"[ERROR] No se encontró el archivo: {json_path}")
-                return jsonify({"error": "Datos no encontrados"}), 404
-        
-        # Aplicar capitalize a los campos necesarios
-        nombre = capitalize_text(data.get('nombre', ''))
+        log.debug('pdf.solicitud', datos=lambda: payload_summary(data))
         
-        experiencia = data.get('experiencia', [])
-        for exp in experiencia:
-            exp['empresa'] = capitalize_text(exp.get('empresa', ''))
-            exp['cargo'] = capitalize_text(exp.get('cargo', ''))
-            
-        educacion = data.get('educacion', [])
-        for edu in educacion:
-            edu['titulo'] = capitalize_text(edu.get('titulo', ''))
-            edu['institucion'] = capitalize_text(edu.get('institucion', ''))
-        
-        # Verificar si hay imagen después de todo el proceso
-        if 'profile_image' in data:
-            app.logger.info(f"[DEBUG] Imagen encontrada en los datos finales, longitud: {len(data['profile_image'])}")
-        else:
-            app.logger.warning("[WARNING] No se encontró imagen en los datos finales")
-            
-        # Verificar el color final
-        app.logger.info(f"[DEBUG] Color final a usar: {data.get('template_color', 'No especificado')}")
+        with stage('prepare'):
+            request_data = data
+            data = prepare_download_data(data)
+        if data is None:
+            return jsonify({"error": "Datos no encontrados"}), 404
+        # prepare_download_data completa form_id a partir de payment_id en los datos de la petición
+        form_id = request_data.get('form_id')
         
         # Generar PDF con el contenido requerido
         try:
-            # Generar el PDF
-            pdf = generate_pdf_content(data)
-            
-            # Crear archivo temporal
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                # Guardar el PDF en el archivo temporal
-                pdf.output(tmp_file.name)
-                tmp_file_path = tmp_file.name
-                app.logger.info(f"[DEBUG] PDF generado y guardado en: {tmp_file_path}")
-                
-                # Leer el archivo generado
-                with open(tmp_file_path, 'rb') as f:
-                    pdf_bytes = f.read()
-                    app.logger.info(f"[DEBUG] PDF leído correctamente, tamaño: {len(pdf_bytes)} bytes")
-                
-                # Eliminar archivo temporal
-                try:
-                    os.unlink(tmp_file_path)
-                    app.logger.info(f"[DEBUG] Archivo temporal eliminado: {tmp_file_path}")
-                except Exception as e:
-                    app.logger.error(f"[ERROR] Error al eliminar archivo temporal: {str(e)}")
-                
-                # Crear y enviar la respuesta
-                response = make_response(pdf_bytes)
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = 'attachment; filename=cv.pdf'
-                app.logger.info("[INFO] PDF enviado correctamente al cliente")
-                return response
+            # Generar el PDF en memoria (o tomarlo de la caché, del archivo o del pre-render) y crear la respuesta
+            response = cached_pdf_response(data, form_id=form_id)
+            return response
         except Exception as e:
-            app.logger.error(f"[ERROR] Error durante la generación o entrega del PDF: {str(e)}")
+            log.error('pdf.error_entrega', error=str(e))
             raise
             
     except Exception as e:
-        app.logger.error(f"[ERROR] Error generando PDF: {str(e)}")
+        log.error('pdf.error', error=str(e))
         return jsonify({"error": str(e)}), 500
 
-def capitalize_text(text):
-    """Capitaliza cada palabra en el texto."""
-    if text:
-        return ' '.join(word.capitalize() for word in text.split())
-    return ''
-
-def generate_pdf_content(data):
+@app.route('/preview', methods=['POST'])
+def preview_cv():
+    """Imagen de la primera página del CV con el layout real del PDF, para la vista previa del formulario."""
     try:
-        app.logger.info("[DEBUG] Iniciando generación de contenido PDF")
-        app.logger.info(f"[DEBUG] Tipo de plantilla: {data.get('template_type', 'No especificado')}")
-        app.logger.info(f"[DEBUG] ¿Tiene imagen?: {'Sí' if data.get('profile_image') else 'No'}")
-        
-        # Importar módulos necesarios
-        import base64
-        import tempfile
-        import os
-        import re
-        
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Determinar tipo de plantilla
-        template_type = data.get('template_type', 'basico')
-        
-        # Obtener color seleccionado (solo para plantilla profesional)
-        template_color = data.get('template_color', 'azul-marino')
-        
-        # Configuración de colores según la plantilla y el color seleccionado
-        if template_type == 'profesional':
-            if template_color == 'azul-marino':
-                header_color = (26, 73, 113)  # #1a4971 - Azul marino
-                text_color = (68, 68, 68)  # #444444
-                accent_color = (26, 73, 113)  # #1a4971
-            elif template_color == 'amarillo-claro':
-                header_color = (242, 201, 76)  # #F2C94C - Amarillo claro
-                text_color = (68, 68, 68)  # #444444
-                accent_color = (242, 201, 76)  # #F2C94C
-            elif template_color == 'rosado-pastel':
-                header_color = (242, 166, 166)  # #F2A6A6 - Rosado pastel
-                text_color = (68, 68, 68)  # #444444
-                accent_color = (242, 166, 166)  # #F2A6A6
-            elif template_color == 'morado':
-                header_color = (149, 91, 165)  # #955BA5 - Morado
-                text_color = (68, 68, 68)  # #444444
-                accent_color = (149, 91, 165)  # #955BA5
-            else:
-                # Valor por defecto (azul marino)
-                header_color = (26, 73, 113)  # #1a4971
-                text_color = (68, 68, 68)  # #444444
-                accent_color = (26, 73, 113)  # #1a4971
-        else:
-            header_color = (100, 100, 100)  # Cambiado de #4a4a4a a un gris más claro
-            text_color = (0, 0, 0)  # #000000
-            accent_color = (74, 74, 74)  # #4a4a4a
+        if not request.is_json:
+            return jsonify({"error": "Se requiere JSON"}), 400
+        with stage('json_load'):
+            data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "JSON inválido"}), 400
+        image_format = request.args.get('format', PREVIEW_FORMAT)
+        if image_format not in PREVIEW_MIMETYPES:
+            return jsonify({"error": f"Formato de vista previa desconocido: {image_format}"}), 400
         
-        # Encabezado con datos personales
-        pdf.set_fill_color(*header_color)
-        pdf.rect(0, 0, 210, 50, 'F')  # Reducimos la altura del encabezado de 50 a 40
+        with stage('prepare'):
+            data = prepare_download_data(data)
+        if data is None:
+            return jsonify({"error": "Datos no encontrados"}), 404
+        try:
+            # La foto se prepara con el perfil liviano: la imagen no necesita más resolución
+            cv = compile_cv(dict(data, output_profile='screen'), PDF_OUTPUT_PROFILE)
+        except InvalidCV as e:
+            return jsonify({"error": str(e)}), 400
+        key = f'{cv_digest(cv)}-{PREVIEW_DPI}.{image_format}'
         
-        # Si es plantilla profesional y hay imagen, agregarla
-        if template_type == 'profesional' and data.get('profile_image'):
+        # Ediciones que vuelven a un estado ya visto se responden desde la caché
+        if request.if_none_match.contains(key):
+            response = make_response('', 304)
+            response.set_etag(key)
+            return response
+        with stage('cache'):
+            image_bytes = preview_cache.get(key)
+        cache_status = 'HIT'
+        if image_bytes is None:
+            cache_status = 'MISS'
             try:
-                # Importar PIL para manejar las imágenes
-                from PIL import Image
-                import io
-                
-                # Decodificar la imagen base64
-                image_data = data['profile_image']
-                app.logger.info(f"[DEBUG] Imagen recibida (longitud): {len(image_data)}")
-                app.logger.info(f"[DEBUG] Primeros 50 caracteres de la imagen: {image_data[:50]}...")
-                
-                # Asegurarse de que la cadena base64 esté correctamente formateada
-                if ',' in image_data:
-                    app.logger.info(f"[DEBUG] Encontrado separador en la imagen base64")
-                    image_data = image_data.split(',')[1]
-                
-                # Decodificar la imagen
-                try:
-                    image_bytes = base64.b64decode(image_data)
-                    app.logger.info(f"[DEBUG] Imagen decodificada correctamente, tamaño: {len(image_bytes)} bytes")
-                    
-                    # Crear un objeto de imagen con PIL
-                    img = Image.open(io.BytesIO(image_bytes))
-                    app.logger.info(f"[DEBUG] Imagen abierta con PIL: formato={img.format}, tamaño={img.size}")
-                    
-                    # Redimensionar la imagen si es necesario
-                    max_size = (300, 300)
-                    if img.width > max_size[0] or img.height > max_size[1]:
-                        img.thumbnail(max_size, Image.LANCZOS)
-                        app.logger.info(f"[DEBUG] Imagen redimensionada a {img.size}")
-                    
-                    # Convertir a RGB si tiene transparencia (modo RGBA)
-                    if img.mode == 'RGBA':
-                        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                        rgb_img.paste(img, mask=img.split()[3])  # Usar el canal alfa como máscara
-                        img = rgb_img
-                        app.logger.info("[DEBUG] Imagen convertida de RGBA a RGB")
-                    
-                    # Guardar como JPEG en un archivo temporal
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_img:
-                        img.save(temp_img.name, 'JPEG', quality=95)
-                        temp_img_path = temp_img.name
-                        app.logger.info(f"[DEBUG] Imagen guardada como JPEG en: {temp_img_path}")
-                    
-                    # Agregar imagen al PDF - usar 'jpg' en minúsculas para FPDF 1.7.2
-                    try:
-                        pdf.image(temp_img_path, x=170, y=5, w=30, h=30, type='jpg')
-                        app.logger.info("[DEBUG] Imagen agregada al PDF correctamente")
-                    except Exception as e:
-                        app.logger.error(f"[ERROR] Error al agregar la imagen al PDF: {str(e)}")
-                        app.logger.error(f"[ERROR] Ruta de la imagen: {temp_img_path}")
-                        app.logger.error(f"[ERROR] ¿Existe el archivo?: {os.path.exists(temp_img_path)}")
-                        raise
-                    
-                    # Eliminar archivo temporal
-                    try:
-                        os.unlink(temp_img_path)
-                        app.logger.info("[DEBUG] Archivo temporal de imagen eliminado")
-                    except Exception as e:
-                        app.logger.error(f"[ERROR] Error al eliminar archivo temporal: {str(e)}")
-                except Exception as e:
-                    app.logger.error(f"[ERROR] Error al procesar la imagen con PIL: {str(e)}")
-                    raise
-            except Exception as e:
-                app.logger.error(f"[ERROR] Error al procesar la imagen: {str(e)}")
-                app.logger.error(f"[ERROR] Tipo de datos de la imagen: {type(data.get('profile_image'))}")
-                # Continuar sin la imagen en caso de error
-                app.logger.info("[INFO] Continuando la generación del PDF sin la imagen debido al error")
-        
-        # Nombre
-        pdf.set_font("Arial", 'B', 24)
-        pdf.set_text_color(255, 255, 255)  # Blanco
-        pdf.set_xy(10, 10)
-        pdf.cell(160, 10, txt=capitalize_text(data.get('nombre', 'Sin Nombre')), ln=True, align='L')
-        
-        # Información de contacto secundaria (uno debajo del otro)
-        pdf.set_font("Arial", '', 11)
-        pdf.set_xy(10, 25)  # Reducido de 30 a 25
-        if data.get('dni'):
-            pdf.cell(160, 5, txt=f"DNI: {data.get('dni')}", ln=True, align='L')
-        if data.get('fecha_nacimiento'):
-            pdf.cell(160, 5, txt=f"Fecha de Nacimiento: {data.get('fecha_nacimiento')}", ln=True, align='L')
-        if data.get('edad'):
-            pdf.cell(160, 5, txt=f"Edad: {data.get('edad')}", ln=True, align='L')
-        
-        # Información de contacto primaria (en línea) debajo de la información secundaria
-        current_y = pdf.get_y()
-        pdf.set_xy(10, current_y)
-        contact_primary = []
-        if data.get('email'): contact_primary.append(f"Email: {data.get('email')}")
-        if data.get('telefono'): contact_primary.append(f"Tel: {data.get('telefono')}")
-        if data.get('direccion'): contact_primary.append(f"Dirección: {data.get('direccion')}")
-        pdf.cell(160, 6, txt=" | ".join(contact_primary), ln=True, align='L')
-        
-        # Resetear color de texto y continuar con el resto del CV
-        pdf.set_text_color(*text_color)
-        pdf.ln(5)  # Reducido de 20 a 5 para disminuir el espacio
-        
-        # Resumen Profesional (si existe)
-        if data.get('resumen'):
-            pdf.set_font("Arial", 'B', 16)
-            pdf.set_text_color(*accent_color)
-            pdf.cell(0, 10, txt="Resumen Profesional", ln=True, align='L')
-            pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-            pdf.ln(5)
-            
-            pdf.set_font("Arial", '', 11)
-            pdf.set_text_color(*text_color)
-            pdf.multi_cell(0, 6, txt=data.get('resumen', ''))
-            pdf.ln(5)
-        
-        # Experiencia Laboral
-        pdf.set_font("Arial", 'B', 16)
-        pdf.set_text_color(*accent_color)
-        pdf.cell(0, 10, txt="Experiencia Laboral", ln=True, align='L')
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(5)
-        
-        experiencia = data.get('experiencia', [])
-        for exp in experiencia:
-            # Empresa y periodo en la misma línea
-            pdf.set_font("Arial", 'B', 12)
-            pdf.set_text_color(*accent_color)
-            empresa = exp.get('empresa', '')
-            periodo = exp.get('periodo', '')
-            
-            # Calcular ancho del texto de la empresa
-            empresa_width = pdf.get_string_width(empresa)
-            
-            # Imprimir empresa
-            pdf.cell(empresa_width + 5, 8, txt=capitalize_text(empresa), align='L')
-            
-            # Imprimir periodo a la derecha
-            pdf.set_font("Arial", '', 10)
-            pdf.set_text_color(*text_color)
-            pdf.cell(0, 8, txt=periodo, ln=True, align='R')
-            
-            # Cargo
-            pdf.set_font("Arial", 'I', 11)
-            pdf.set_text_color(*text_color)
-            pdf.cell(0, 6, txt=capitalize_text(exp.get('cargo', '')), ln=True, align='L')
-            
-            # Descripción
-            if exp.get('descripcion'):
-                pdf.set_font("Arial", '', 10)
-                pdf.multi_cell(0, 6, txt=exp.get('descripcion', ''))
-            
-            pdf.ln(3)  # Reducido de 5 a 3
-        
-        # Educación
-        pdf.ln(2)  # Reducido de 5 a 2
-        pdf.set_font("Arial", 'B', 16)
-        pdf.set_text_color(*accent_color)
-        pdf.cell(0, 10, txt="Educación", ln=True, align='L')
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(5)
-        
-        educacion = data.get('educacion', [])
-        for edu in educacion:
-            # Título y año en la misma línea
-            pdf.set_font("Arial", 'B', 12)
-            pdf.set_text_color(*accent_color)
-            titulo = edu.get('titulo', '')
-            anio = edu.get('año', '')
-            
-            # Calcular ancho del texto del título
-            titulo_width = pdf.get_string_width(titulo)
-            
-            # Imprimir título
-            pdf.cell(titulo_width + 5, 8, txt=capitalize_text(titulo), align='L')
-            
-            # Imprimir año a la derecha
-            pdf.set_font("Arial", '', 10)
-            pdf.set_text_color(*text_color)
-            pdf.cell(0, 8, txt=anio, ln=True, align='R')
-            
-            # Institución
-            pdf.set_font("Arial", 'I', 11)
-            pdf.set_text_color(*text_color)
-            pdf.cell(0, 6, txt=capitalize_text(edu.get('institucion', '')), ln=True, align='L')
-            
-            pdf.ln(3)  # Reducido de 5 a 3
-        
-        # Habilidades
-        pdf.ln(2)  # Reducido de 5 a 2
-        pdf.set_font("Arial", 'B', 16)
-        pdf.set_text_color(*accent_color)
-        pdf.cell(0, 10, txt="Habilidades", ln=True, align='L')
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(5)
-        
-        # Crear lista de habilidades
-        pdf.set_font("Arial", '', 11)
-        pdf.set_text_color(*text_color)
-        for habilidad in data.get('habilidades', []):
-            pdf.cell(0, 6, txt="- " + habilidad, ln=True, align='L')  # Usando guión en lugar de bullet point
-        
-        app.logger.info("[DEBUG] PDF generado exitosamente")
-        return pdf
+                with stage('render'):
+                    image_bytes = render_pool.run(render_preview_bytes, cv, PREVIEW_DPI, image_format)
+            except RenderPoolError as e:
+                return render_unavailable_response(e)
+            preview_cache.put(key, image_bytes)
+        annotate(cache=cache_status, preview_bytes=len(image_bytes))
+        PREVIEW_CACHE.inc(result=cache_status.lower())
+        
+        response = make_response(image_bytes)
+        response.headers['Content-Type'] = PREVIEW_MIMETYPES[image_format]
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = cache_status
+        response.set_etag(key)
+        return response
         
     except Exception as e:
-        app.logger.error(f"[ERROR] Error en generate_pdf_content: {str(e)}")
-        raise
+        log.error('preview.error', error=str(e))
+        return jsonify({"error": str(e)}), 500
 
-def generate_pdf(data):
+@app.route('/pdf/<pdf_id>', methods=['GET', 'HEAD'])
+def archived_pdf(pdf_id):
+    """Entrega un PDF archivado por su identificador (el ETag de la descarga), con soporte de Range."""
+    if pdf_archive is None or not PDF_ID_RE.fullmatch(pdf_id):
+        return jsonify({"error": "PDF no encontrado"}), 404
+    with stage('archive'):
+        record = pdf_archive.get(pdf_id)
+    if record is None:
+        return jsonify({"error": "PDF no encontrado"}), 404
+    annotate(cache='ARCHIVE', pdf_bytes=record.size, output_profile=record.output_profile)
+    return archived_pdf_response(record)
+
+@app.route('/generate_pdf_batch', methods=['POST'])
+def generate_pdf_batch():
     try:
-        app.logger.info("[DEBUG] Iniciando generate_pdf")
+        # NDJSON se lee línea por línea; un arreglo JSON se parsea completo
+        if request.mimetype in NDJSON_MIMETYPES:
+            items = iter_ndjson_items(request.stream)
+        elif request.is_json:
+            with stage('json_load'):
+                data = request.get_json(silent=True)
+            if not isinstance(data, list):
+                return jsonify({"error": "Se requiere un arreglo JSON de CVs"}), 400
+            items = iter_json_items(data)
+        else:
+            return jsonify({"error": "Se requiere JSON o NDJSON"}), 400
         
-        # Generar PDF
-        pdf = generate_pdf_content(data)
+        log.debug('lote.inicio', formato=request.mimetype)
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            app.logger.info(f"[DEBUG] Generando PDF en archivo temporal: {tmp_file.name}")
-            pdf.output(tmp_file.name)
-            tmp_path = tmp_file.name
-            
-        # Leer el archivo y devolverlo como respuesta
-        app.logger.info(f"[DEBUG] Leyendo archivo PDF generado: {tmp_path}")
-        with open(tmp_path, 'rb') as f:
-            pdf_bytes = f.read()
-            app.logger.info(f"[DEBUG] PDF leído, tamaño: {len(pdf_bytes)} bytes")
+        zip_stream = stream_pdf_zip(
+            items,
+            submit=submit_batch_render,
+            result=batch_render_result,
+            max_in_flight=BATCH_MAX_IN_FLIGHT,
+            max_items=BATCH_MAX_ITEMS,
+            queue_wait=render_pool.timeout,
+            timeout=render_pool.timeout
+        )
+        response = Response(stream_with_context(zip_stream), mimetype='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename=cvs.zip'
+        return response
         
-        # Eliminar archivo temporal
+    except Exception as e:
+        log.error('lote.error', error=str(e))
+        return jsonify({"error": str(e)}), 500
+
+def schedule_prerender(form_id):
+    """Programa en segundo plano el PDF del formulario de un pago aprobado, tal como lo pedirá /download_pdf."""
+    if prerender_store is None or not form_id:
+        return
+    data = prepare_download_data({'form_id': form_id})
+    if data is None:
+        return
+    try:
+        cv = compile_cv(data, PDF_OUTPUT_PROFILE)
+    except InvalidCV as e:
+        log.warning('prerender.datos_invalidos', form_id=form_id, error=str(e))
+        return
+    digest = cv_digest(cv)
+    if digest in pdf_cache.memory or (pdf_archive is not None and pdf_archive.get(digest) is not None):
+        return
+
+    def render():
         try:
-            os.unlink(tmp_path)
-            app.logger.info(f"[DEBUG] Archivo temporal eliminado: {tmp_path}")
+            pdf_bytes = render_pool.run(render_pdf_bytes, cv)
         except Exception as e:
-            app.logger.error(f"[ERROR] Error al eliminar archivo temporal: {str(e)}")
+            log.warning('prerender.error', form_id=form_id, error=str(e))
+            raise
+        pdf_cache.put(digest, pdf_bytes)
+        archive_pdf(digest, pdf_bytes, cv, form_id)
+        return pdf_bytes
+
+    if prerender_store.submit(digest, render):
+        log.debug('prerender.programado', form_id=form_id)
+
+def submit_batch_render(cv_data):
+    """Encola el render de un CV del lote, usando la caché de PDFs si ya está generado."""
+    cv = compile_cv(cv_data, PDF_OUTPUT_PROFILE)
+    digest = cv_digest(cv)
+    pdf_bytes = pdf_cache.get(digest)
+    PDF_CACHE.inc(result='hit' if pdf_bytes is not None else 'miss')
+    if pdf_bytes is not None:
+        future = Future()
+        future.set_result(pdf_bytes)
+    else:
+        future = render_pool.submit(render_pdf_bytes, cv)
+    future.cv_digest = digest
+    return future
+
+def batch_render_result(future, timeout):
+    """Obtiene el PDF de un CV del lote (RenderTimeout si venció) y lo guarda en la caché."""
+    pdf_bytes = render_pool.result(future, timeout=timeout)
+    pdf_cache.put(future.cv_digest, pdf_bytes)
+    return pdf_bytes
+
+def embed_profile_image(pdf, image_data, x, y, w, h):
+    """Incrusta la foto de perfil en el PDF; si falla, el CV se genera sin foto."""
+    try:
+        # Obtener la foto ya procesada para el perfil de salida (sin pasar por PIL si está en caché)
+        profile = pdf.output_profile or get_profile(PDF_OUTPUT_PROFILE)
+        processed, image_key, cache_hit = profile_image_cache.get_or_process(
+            image_data, box_mm=(w, h), dpi=profile.image_dpi, quality=profile.jpeg_quality)
+        IMAGE_CACHE.inc(result='hit' if cache_hit else 'miss')
+        log.debug('pdf.imagen_lista', ancho=processed.width, alto=processed.height,
+                  bytes=len(processed.jpeg_bytes), cache='HIT' if cache_hit else 'MISS')
+        
+        # Agregar imagen al PDF desde memoria
+        pdf.image_from_bytes(f'profile_{image_key}.jpg', processed.jpeg_bytes, x=x, y=y, w=w, h=h)
+    except Exception as e:
+        # Continuar sin la imagen en caso de error
+        log.error('pdf.imagen_error', error=str(e), tipo=type(image_data).__name__)
+
+# Servicios que usan los planes de render
+render_env = RenderEnv(embed_image=embed_profile_image)
+
+def generate_pdf_content(cv):
+    """Genera el documento a partir del CV compilado (``compile_cv``)."""
+    try:
+        log.debug('pdf.render', template_type=cv.template_type, template_color=cv.template_color,
+                  imagen=bool(cv.profile_image))
+        
+        # Plan precompilado para la plantilla y el color seleccionados
+        plan = template_registry.get_plan(cv.template_type, cv.template_color)
+        
+        from pdf_document import MemoryFPDF
+        
+        with stage('layout'):
+            pdf = MemoryFPDF(output_profile=get_profile(cv.output_profile))
+            pdf.add_page()
+            plan.render(pdf, cv, render_env)
+        
+        return pdf
+        
+    except Exception as e:
+        log.error('pdf.render_error', error=str(e))
+        raise
+
+def render_pdf_bytes(cv):
+    """Genera el PDF del CV compilado y lo devuelve como bytes, sin tocar el disco."""
+    RENDERS.inc(template_type=cv.template_type, template_color=cv.template_color)
+    pdf = generate_pdf_content(cv)
+    with stage('pdf_output'):
+        return pdf.output_bytes()
+
+def render_preview_bytes(cv, dpi, image_format):
+    """Dibuja la primera página del CV compilado como imagen PNG o WebP (sin generar el PDF completo)."""
+    pdf = generate_pdf_content(cv)
+    from preview import render_preview
+    with stage('rasterize'):
+        return render_preview(pdf, dpi, image_format)
+
+def pdf_response(pdf_bytes, filename='cv.pdf'):
+    """Construye la respuesta HTTP de descarga para un PDF ya generado."""
+    with stage('response_build'):
+        response = make_response(pdf_bytes)
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.headers['Content-Length'] = str(len(pdf_bytes))
+    return response
+
+def render_unavailable_response(error):
+    """Respuesta cuando el pool de render no puede aceptar o terminar el trabajo."""
+    log.warning('render_pool.no_disponible', error=str(error), status=error.status_code)
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status_code
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def archive_pdf(digest, pdf_bytes, cv, form_id=None):
+    """Registra el PDF generado en el archivo en disco (si está activado)."""
+    if pdf_archive is None:
+        return
+    try:
+        pdf_archive.put(digest, pdf_bytes, form_id=form_id, template_type=cv.template_type,
+                        template_color=cv.template_color, output_profile=cv.output_profile)
+    except (OSError, sqlite3.Error) as e:
+        log.warning('archivo_pdf.error', form_id=form_id, error=str(e))
+
+def archived_pdf_response(record):
+    """Envía un PDF del archivo desde el disco (condicionales, Range en GET y X-Sendfile si está configurado)."""
+    with stage('response_build'):
+        response = send_file(record.path, mimetype='application/pdf', as_attachment=True,
+                             download_name='cv.pdf', conditional=True, etag=record.id, max_age=0)
+    response.headers['X-Cache'] = 'ARCHIVE'
+    if record.output_profile:
+        response.headers['X-PDF-Profile'] = record.output_profile
+    return response
+
+def cached_pdf_response(data, form_id=None):
+    """Responde con el PDF del CV usando la caché por contenido y un ETag fuerte.
+
+    Los datos se compilan y validan antes de buscar en la caché: unos datos mal formados responden 400.
+    El perfil de salida forma parte del digest: cada perfil tiene su propio PDF en caché.
+    """
+    try:
+        cv = compile_cv(data, PDF_OUTPUT_PROFILE)
+    except InvalidCV as e:
+        log.warning('pdf.datos_invalidos', error=str(e))
+        return jsonify({"error": str(e)}), 400
+    digest = cv_digest(cv)
+    
+    # El cliente ya tiene esta versión del PDF
+    if request.if_none_match.contains(digest):
+        response = make_response('', 304)
+        response.set_etag(digest)
+        return response
+    
+    with stage('cache'):
+        pdf_bytes = pdf_cache.get(digest)
+    cache_status = 'HIT'
+    if pdf_bytes is None and pdf_archive is not None:
+        with stage('archive'):
+            record = pdf_archive.get(digest)
+        if record is not None:
+            annotate(cache='ARCHIVE', pdf_bytes=record.size, output_profile=cv.output_profile)
+            PDF_CACHE.inc(result='archive')
+            PDF_BYTES.observe(record.size, output_profile=cv.output_profile)
+            return archived_pdf_response(record)
+    if pdf_bytes is None and prerender_store is not None:
+        # Pre-render en curso en este proceso; al terminar ya guardó el PDF en la caché y en el archivo
+        with stage('prerender_wait'):
+            pdf_bytes = prerender_store.get(digest, wait=PRERENDER_WAIT)
+        if pdf_bytes is not None:
+            cache_status = 'PRERENDER'
+    if pdf_bytes is None:
+        cache_status = 'MISS'
+        try:
+            with stage('render'):
+                pdf_bytes = render_pool.run(render_pdf_bytes, cv)
+        except RenderPoolError as e:
+            return render_unavailable_response(e)
+        pdf_cache.put(digest, pdf_bytes)
+        archive_pdf(digest, pdf_bytes, cv, form_id)
+    annotate(cache=cache_status, pdf_bytes=len(pdf_bytes), output_profile=cv.output_profile)
+    PDF_CACHE.inc(result=cache_status.lower())
+    PDF_BYTES.observe(len(pdf_bytes), output_profile=cv.output_profile)
+    
+    response = pdf_response(pdf_bytes)
+    response.set_etag(digest)
+    response.headers['X-Cache'] = cache_status
+    response.headers['X-PDF-Profile'] = cv.output_profile
+    return response
+
+def generate_pdf(data):
+    try:
         
-        # Crear BytesIO para manejar el PDF en memoria
-        pdf_buffer = BytesIO(pdf_bytes)
-        app.logger.info("[DEBUG] PDF convertido a BytesIO")
+        # Generar PDF en memoria y devolverlo como BytesIO
+        pdf_buffer = BytesIO(render_pdf_bytes(compile_cv(data, PDF_OUTPUT_PROFILE)))
+        log.debug('pdf.generado', bytes=pdf_buffer.getbuffer().nbytes)
         return pdf_buffer
     except Exception as e:
-        app.logger.error(f"[ERROR] Error en generate_pdf: {str(e)}")
+        log.error('pdf.error', error=str(e))
         raise
 
 @app.route('/generar_resumen_ia', methods=['POST'])
 def generar_resumen_ia():
     try:
-        # Verificar variables de entorno
-        app.logger.info(f"[DEBUG] Entorno actual: {app.config['ENVIRONMENT']}")
-        app.logger.info(f"[DEBUG] OPENROUTER_API_KEY configurada: {'Sí' if os.getenv('OPENROUTER_API_KEY') else 'No'}")
-        
         # Obtener el prompt del request
         data = request.json
         prompt = data.get('prompt', '')
         
-        app.logger.info(f"[DEBUG] Datos recibidos para generación de resumen: {str(data)[:200]}...")
-        app.logger.info(f"[DEBUG] Prompt recibido: {prompt[:200]}...")
+        log.debug('ia.prompt', largo=len(prompt))
         
         if not prompt:
-            app.logger.warning("[WARNING] No se proporcionó un prompt válido")
+            log.warning('ia.prompt_vacio')
             return jsonify({'error': 'No se proporcionó un prompt válido'}), 400
         
-        # Configurar la solicitud a la API de OpenRouter usando OpenAI
-        from openai import OpenAI
-        
-        # Depuración de credenciales
-        api_key = os.getenv('OPENROUTER_API_KEY')
-        api_url = os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1')
-        
-        app.logger.info(f"[DEBUG] API Key (primeros 5 caracteres): {api_key[:5] if api_key else 'No configurada'}")
-        app.logger.info(f"[DEBUG] API URL: {api_url}")
-        
-        # Verificar que la API key esté presente
-        if not api_key:
-            app.logger.error("[ERROR] No se encontró la API key de OpenRouter")
-            return jsonify({'error': 'Configuración de API incorrecta'}), 500
-        
-        client = OpenAI(
-            api_key=api_key,
-            base_url=api_url
-        )
-
-        # Crear la solicitud de completación de chat
+        # Pedir el resumen al primer modelo disponible dentro del plazo (o reutilizar un resumen igual)
         try:
-            chat = client.chat.completions.create(
-                model="deepseek/deepseek-r1:free",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un asistente especializado en redactar resúmenes profesionales para currículums. Genera resúmenes concisos, profesionales y orientados a resultados, redactados en primera persona, resaltando mis logros, habilidades y experiencia de manera clara y efectiva."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            with stage('ai'):
+                response_text, hit = summary_cache.get_or_generate(prompt, model_router.generate)
+        except AIConfigurationError as e:
+            log.error('ia.configuracion', error=str(e))
+            return jsonify({'error': 'Configuración de API incorrecta'}), 500
+        except (SummaryUnavailable, TimeoutError) as e:
+            log.warning('ia.resumen_generico', error=str(e))
+            return jsonify({'resumen': RESUMEN_GENERICO})
         except Exception as e:
-            app.logger.error(f"[ERROR] Error al llamar a la API de OpenRouter: {str(e)}")
+            log.error('ia.error_api', error=str(e))
             return jsonify({'error': 'Error en la solicitud a la API'}), 500
         
-        # Obtener la respuesta generada por la IA
-        response_text = chat.choices[0].message.content
-        app.logger.info(f"[DEBUG] Respuesta IA: {str(response_text)[:200]}...")
-        
-        # Usar response_text en lugar de la respuesta JSON anterior
+        annotate(ia_cache='HIT' if hit else 'MISS')
+        SUMMARY_CACHE.inc(result='hit' if hit else 'miss')
+        log.debug('ia.resumen', largo=len(response_text or ''))
         return jsonify({'resumen': response_text})
             
     except Exception as e:
-        app.logger.error(f"[ERROR] Error al generar resumen con IA: {str(e)}")
-        resumen_generico = "Profesional con experiencia en el sector, enfocado en resultados y mejora continua. Combina habilidades técnicas con capacidad de liderazgo y trabajo en equipo. Comprometido con la excelencia y el aprendizaje constante."
-        return jsonify({'resumen': resumen_generico})
+        log.error('ia.error', error=str(e))
+        return jsonify({'resumen': RESUMEN_GENERICO})
+
+def sse_event(payload, event=None):
+    """Formatea un evento server-sent events con datos JSON."""
+    data = json.dumps(payload, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {data}\n\n"
+    return f"data: {data}\n\n"
+
+def sse_response(events):
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Evitar que nginx acumule la respuesta antes de enviarla
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/generar_resumen_ia/stream', methods=['POST'])
+def generar_resumen_ia_stream():
+    """Igual que /generar_resumen_ia pero envía el resumen como server-sent events a medida que se genera."""
+    data = request.get_json(silent=True) or {}
+    prompt = data.get('prompt', '')
+    if not prompt:
+        log.warning('ia.prompt_vacio')
+        return jsonify({'error': 'No se proporcionó un prompt válido'}), 400
+
+    cached = summary_cache.get(prompt)
+    SUMMARY_CACHE.inc(result='hit' if cached is not None else 'miss')
+    if cached is not None:
+        # Resumen ya generado: se envía completo en un solo fragmento
+        def generate_cached():
+            yield sse_event({'delta': cached})
+            yield sse_event({'resumen': cached}, event='done')
+        return sse_response(generate_cached())
+
+    def generate():
+        partes = []
+        try:
+            # Las peticiones simultáneas con el mismo prompt comparten una sola llamada a la API
+            for delta in summary_cache.stream(prompt, model_router.stream):
+                partes.append(delta)
+                yield sse_event({'delta': delta})
+        except Exception as e:
+            log.error('ia.error_stream', error=str(e))
+            # Sin texto generado se ofrece el resumen genérico, como en el endpoint JSON
+            yield sse_event({'error': 'Error en la solicitud a la API', 'resumen': RESUMEN_GENERICO if not partes else ''.join(partes)}, event='error')
+            return
+        yield sse_event({'resumen': ''.join(partes)}, event='done')
+
+    return sse_response(generate())
+
+@app.route('/metrics')
+def metrics():
+    """Métricas en formato de texto de Prometheus, sumadas entre todos los procesos."""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/condiciones')
 def condiciones():
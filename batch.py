@@ -0,0 +1,172 @@
+"""
+Generación de PDFs por lotes con salida ZIP en streaming.
+
+Cada CV del lote se genera en el pool de render y se escribe en el ZIP apenas
+termina. Los errores por CV quedan en ``manifest.json`` dentro del archivo en
+lugar de hacer fallar todo el lote, incluido un CV que supera el tiempo máximo
+de render. La cantidad de trabajos en curso está acotada, así que con NDJSON la
+memoria no crece con el tamaño del lote (un arreglo JSON se parsea completo).
+"""
+
+import io
+import json
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from werkzeug.utils import secure_filename
+
+from render_pool import RenderQueueFull
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se vacía."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_json_items(items):
+    """Recorre un arreglo JSON ya parseado como tuplas (índice, cv_data, error)."""
+    for index, item in enumerate(items):
+        yield _normalize_item(index, item)
+
+
+def iter_ndjson_items(stream):
+    """Lee un stream NDJSON línea por línea como tuplas (índice, cv_data, error)."""
+    index = 0
+    for line in iter(stream.readline, b''):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield index, None, f'JSON inválido: {str(e)}'
+        else:
+            yield _normalize_item(index, item)
+        index += 1
+
+
+def _normalize_item(index, item):
+    # Se aceptan tanto los datos del CV directamente como {"cv_data": {...}}
+    if isinstance(item, dict) and isinstance(item.get('cv_data'), dict):
+        item = item['cv_data']
+    if not isinstance(item, dict):
+        return index, None, 'Cada elemento del lote debe ser un objeto JSON'
+    return index, item, None
+
+
+def entry_name(index, cv_data):
+    """Nombre del PDF dentro del ZIP."""
+    nombre = secure_filename(str(cv_data.get('nombre') or '')).lower()
+    return f'cv_{index + 1:04d}_{nombre}.pdf' if nombre else f'cv_{index + 1:04d}.pdf'
+
+
+def stream_pdf_zip(items, submit, result, max_in_flight=4, max_items=None, queue_wait=30.0, timeout=None):
+    """Genera los PDFs del lote y produce el ZIP por partes a medida que se completan.
+
+    ``submit(cv_data)`` encola un render y devuelve un Future; ``result(future, timeout)``
+    devuelve los bytes del PDF o lanza la excepción del trabajo (con ``timeout=0``,
+    la de un trabajo vencido). Cada trabajo tiene ``timeout`` segundos desde que se
+    encola para terminar.
+    """
+    buffer = ZipStreamBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED)
+    manifest = []
+    in_flight = {}
+
+    def collect(done):
+        for future in done:
+            index, name, _ = in_flight.pop(future)
+            try:
+                pdf_bytes = result(future, 0)
+            except Exception as e:
+                manifest.append({'index': index, 'status': 'error', 'error': str(e)})
+                continue
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            archive.writestr(info, pdf_bytes)
+            manifest.append({'index': index, 'status': 'ok', 'file': name, 'size': len(pdf_bytes)})
+
+    def wait_some(max_wait=None):
+        """Espera a que termine o venza algún trabajo y los agrega al ZIP o al manifiesto."""
+        now = time.monotonic()
+        remaining = max(0.0, min(deadline for _, _, deadline in in_flight.values()) - now)
+        if max_wait is not None:
+            remaining = min(remaining, max_wait)
+        done, _ = wait(in_flight, timeout=None if remaining == float('inf') else remaining,
+                       return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        # Los vencidos se cancelan (o se termina solo su proceso) y quedan como RenderTimeout
+        expired = [future for future, (_, _, deadline) in in_flight.items()
+                   if future not in done and deadline <= now]
+        collect(list(done) + expired)
+
+    def submit_with_backpressure(cv_data):
+        deadline = time.monotonic() + queue_wait
+        while True:
+            try:
+                return submit(cv_data)
+            except RenderQueueFull:
+                if time.monotonic() >= deadline:
+                    raise
+                # Esperar a que termine alguno de nuestros trabajos antes de reintentar
+                if in_flight:
+                    wait_some(0.5)
+                else:
+                    time.sleep(0.1)
+
+    for index, cv_data, error in items:
+        if max_items is not None and index >= max_items:
+            manifest.append({'index': index, 'status': 'error',
+                             'error': f'El lote supera el máximo de {max_items} CVs'})
+            break
+        if error:
+            manifest.append({'index': index, 'status': 'error', 'error': error})
+            continue
+        try:
+            future = submit_with_backpressure(cv_data)
+        except Exception as e:
+            manifest.append({'index': index, 'status': 'error', 'error': str(e)})
+            continue
+        deadline = time.monotonic() + timeout if timeout is not None else float('inf')
+        in_flight[future] = (index, entry_name(index, cv_data), deadline)
+
+        # Mantener acotados los trabajos en curso
+        while len(in_flight) >= max_in_flight:
+            wait_some()
+        chunk = buffer.drain()
+        if chunk:
+            yield chunk
+
+    while in_flight:
+        wait_some()
+        chunk = buffer.drain()
+        if chunk:
+            yield chunk
+
+    manifest.sort(key=lambda entry: entry['index'])
+    summary = {
+        'total': len(manifest),
+        'ok': sum(1 for entry in manifest if entry['status'] == 'ok'),
+        'errors': sum(1 for entry in manifest if entry['status'] == 'error'),
+        'items': manifest,
+    }
+    archive.writestr('manifest.json', json.dumps(summary, ensure_ascii=False, indent=2))
+    archive.close()
+    yield buffer.drain()
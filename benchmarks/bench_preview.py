@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Benchmark de la vista previa de la primera página (``POST /preview``).
+
+Para cada clase de tamaño de ``cv_corpus`` simula una sesión de edición: en
+cada paso cambia un campo (como al escribir en el formulario) y pide la vista
+previa, que es siempre un fallo de caché; luego repite los mismos estados, que
+se sirven desde la caché. Como el formulario, la foto se sube una vez a
+``/upload_image`` y cada petición envía solo el token (o la foto en base64 si
+la subida se rechaza). Informa latencia p50/p99 de ambos casos y el tamaño de
+la imagen. Con ``--max-ms`` termina con error si el p50 sin caché de alguna
+clase lo supera.
+
+Con ``--threads N`` además dibuja la misma vista previa desde dos hilos a la
+vez, N veces con las cachés de fuentes, letras y palabras vacías (como dos
+peticiones simultáneas en un worker ``gthread``), y termina con error si los
+bytes no coinciden con los de un render en un solo hilo.
+
+Ejecutar con: python benchmarks/bench_preview.py [--steps N] [--classes minimo,foto_12mp] [--format webp] [--threads N]
+"""
+
+import argparse
+import base64
+import json
+import sys
+import threading
+import time
+
+from bench_render import load_app, percentile
+
+import cv_corpus
+
+
+def upload_photo(client, cv):
+    """Sube la foto del CV como lo hace main.js y la reemplaza por su token."""
+    header, _, payload = cv['profile_image'].partition(',')
+    response = client.post('/upload_image', data=base64.b64decode(payload),
+                           content_type=header[len('data:'):].split(';')[0])
+    if response.status_code != 200:
+        # Igual que main.js: si la subida falla se envía la foto en base64
+        print(f'  /upload_image respondió {response.status_code}: se envía la foto en base64')
+        return cv
+    return dict(cv, profile_image=response.get_json()['image_token'])
+
+
+def measure(client, cv, steps, image_format):
+    if cv.get('profile_image'):
+        cv = upload_photo(client, cv)
+    url = f'/preview?format={image_format}'
+    bodies = [json.dumps(dict(cv, nombre=f"{cv.get('nombre', '')}{'x' * step}")) for step in range(steps)]
+    client.post(url, data=bodies[0], content_type='application/json')  # calentamiento
+    results = {}
+    for name in ('miss', 'hit'):
+        latencies = []
+        for body in bodies[1:]:
+            started = time.perf_counter()
+            response = client.post(url, data=body, content_type='application/json')
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'/preview respondió {response.status_code}: {response.get_data(as_text=True)}')
+            size = len(response.data)
+        results[name] = (percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000)
+    return results, size
+
+
+def check_threads(app_module, cv, image_format, rounds):
+    """Dibuja la vista previa desde dos hilos a la vez y devuelve cuántas veces difirió del render en un hilo."""
+    import preview
+    compiled = app_module.compile_cv(dict(cv, output_profile='screen'), app_module.PDF_OUTPUT_PROFILE)
+    dpi = app_module.PREVIEW_DPI
+    expected = app_module.render_preview_bytes(compiled, dpi, image_format)
+    mismatches = 0
+    for _ in range(rounds):
+        # Cachés vacías: los dos hilos dibujan y guardan las mismas letras y palabras al mismo tiempo
+        preview._glyphs.clear()
+        preview._words.clear()
+        barrier = threading.Barrier(2)
+        results = [None, None]
+
+        def render(index):
+            barrier.wait()
+            results[index] = app_module.render_preview_bytes(compiled, dpi, image_format)
+
+        threads = [threading.Thread(target=render, args=(index,)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        mismatches += sum(result != expected for result in results)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=40, help='ediciones simuladas por clase')
+    parser.add_argument('--classes', default=','.join(cv_corpus.SIZE_CLASSES), help='clases de cv_corpus separadas por coma')
+    parser.add_argument('--format', default='png', choices=('png', 'webp'))
+    parser.add_argument('--max-ms', type=float, help='máximo aceptable para el p50 sin caché (ms)')
+    parser.add_argument('--threads', type=int, default=0, help='rondas del render desde dos hilos a la vez (0 = no)')
+    args = parser.parse_args()
+
+    app_module = load_app()
+    client = app_module.app.test_client()
+    print(f'vista previa a {app_module.PREVIEW_DPI} ppp en {args.format}')
+    print(f"{'caso':<20} {'sin caché p50':>14} {'p99':>9} {'en caché p50':>14} {'bytes':>9}")
+    failed = []
+    mismatched = []
+    for case in args.classes.split(','):
+        results, size = measure(client, cv_corpus.make_cv(case), args.steps, args.format)
+        miss_p50, miss_p99 = results['miss']
+        print(f'{case:<20} {miss_p50:>11.1f} ms {miss_p99:>6.1f} ms {results["hit"][0]:>11.2f} ms {size:>9}')
+        if args.max_ms is not None and miss_p50 > args.max_ms:
+            failed.append(case)
+        if args.threads:
+            mismatches = check_threads(app_module, cv_corpus.make_cv(case), args.format, args.threads)
+            print(f'{"":<20} dos hilos: {mismatches} de {args.threads * 2} vistas previas distintas')
+            if mismatches:
+                mismatched.append(case)
+    if failed:
+        print(f'ERROR: p50 sin caché mayor a {args.max_ms:.1f} ms en: {", ".join(failed)}')
+    if mismatched:
+        print(f'ERROR: vistas previas distintas al dibujarlas desde dos hilos en: {", ".join(mismatched)}')
+    if failed or mismatched:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
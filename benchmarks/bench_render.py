@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+Benchmark de generación de PDFs y de capitalize_text con un corpus sintético.
+
+Mide ``render_pdf_bytes`` (``generate_pdf_content`` + ``output_bytes``) para
+cada clase de tamaño de ``cv_corpus`` y ``capitalize_text`` sobre los campos
+que normaliza ``compile_cv``. Cada clase se mide en un proceso aparte que
+recibe el CV ya generado (en un archivo JSON), para que el pico de memoria (RSS)
+sea el de cargar la aplicación y generar los PDFs de esa clase. Informa operaciones por
+segundo, latencia p50/p99, pico de RSS y tamaño del PDF; con ``--repeat`` se
+repite cada caso y se informa la corrida con mejor p50, para reducir el ruido
+de otras cargas de la máquina.
+
+Con ``--save-baseline`` guarda los resultados en JSON; con ``--baseline``
+compara contra un archivo guardado y termina con error si p50, operaciones por
+segundo, RSS o tamaño empeoran más que ``--threshold`` (el p99 solo se
+informa: con pocas iteraciones varía demasiado entre corridas).
+
+Ejecutar con:
+    python benchmarks/bench_render.py [--iterations N] [--repeat N] [--classes minimo,foto_12mp]
+    python benchmarks/bench_render.py --save-baseline benchmarks/baseline_render.json
+    python benchmarks/bench_render.py --baseline benchmarks/baseline_render.json [--threshold 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv_corpus  # noqa: E402
+
+CAPITALIZE = 'capitalize_text'
+CASES = cv_corpus.SIZE_CLASSES + (CAPITALIZE,)
+
+# Llamadas a capitalize_text por muestra: una sola tarda microsegundos
+CAPITALIZE_BATCH = 100
+
+# Métricas comparadas contra la línea base y si un valor mayor es peor
+COMPARED = {'p50_ms': True, 'ops_s': False, 'rss_mb': True, 'bytes': True}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def peak_rss_mb():
+    # En Linux, ru_maxrss conserva el pico del proceso padre a través de fork + exec;
+    # VmHWM es el pico de este proceso desde su exec
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def load_app():
+    os.environ.setdefault('MP_ACCESS_TOKEN', 'TEST-bench')
+    os.environ.setdefault('MP_PUBLIC_KEY', 'TEST-bench')
+    os.environ.setdefault('FORM_STORE', 'memory')
+    os.environ.setdefault('PRERENDER', '0')
+    os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='bench-metrics-'))
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    import app as app_module
+    return app_module
+
+
+def capitalize_fields(cv):
+    """Textos que ``compile_cv`` pasa por ``capitalize_text``."""
+    texts = [cv.get('nombre', '')]
+    for exp in cv.get('experiencia', []):
+        texts += [exp.get('empresa', ''), exp.get('cargo', '')]
+    for edu in cv.get('educacion', []):
+        texts += [edu.get('titulo', ''), edu.get('institucion', '')]
+    return texts
+
+
+def measure(case, iterations, cv_file=None):
+    """Mide un caso en el proceso actual y devuelve sus resultados."""
+    app_module = load_app()
+    latencies = []
+    output_bytes = 0
+    if case == CAPITALIZE:
+        from template_engine import capitalize_text
+        texts = capitalize_fields(cv_corpus.make_cv('experiencias_50'))
+
+        def operation():
+            for _ in range(CAPITALIZE_BATCH):
+                for text in texts:
+                    capitalize_text(text)
+        per_sample = CAPITALIZE_BATCH
+    else:
+        if cv_file:
+            with open(cv_file, encoding='utf-8') as f:
+                cv = json.load(f)
+        else:
+            cv = cv_corpus.make_cv(case)
+        # Las rutas generan el PDF a partir del CV ya compilado
+        cv = app_module.compile_cv(cv, app_module.PDF_OUTPUT_PROFILE)
+
+        def operation():
+            nonlocal output_bytes
+            # Cada CV real trae su propia foto: se mide sin la caché de fotos procesadas
+            app_module.profile_image_cache.cache.clear()
+            output_bytes = len(app_module.render_pdf_bytes(cv))
+        per_sample = 1
+
+    operation()  # calentamiento: planes, fuentes e imports perezosos
+    started = time.perf_counter()
+    for _ in range(iterations):
+        sample_started = time.perf_counter()
+        operation()
+        latencies.append((time.perf_counter() - sample_started) / per_sample)
+    total = time.perf_counter() - started
+    return {
+        'ops_s': round(iterations * per_sample / total, 2),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'rss_mb': round(peak_rss_mb(), 1),
+        'bytes': output_bytes,
+    }
+
+
+def run_case(case, iterations, repeat):
+    """Ejecuta un caso ``repeat`` veces, cada una en un proceso nuevo, y devuelve la corrida con mejor p50."""
+    command = [sys.executable, os.path.abspath(__file__), '--child', case, '--iterations', str(iterations)]
+    cv_file = None
+    if case != CAPITALIZE:
+        # El CV (y su foto) se genera acá: generarlo en el proceso medido inflaría su RSS
+        fd, cv_file = tempfile.mkstemp(prefix=f'bench-{case}-', suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cv_corpus.make_cv(case), f)
+        command += ['--cv-file', cv_file]
+    runs = []
+    try:
+        for _ in range(repeat):
+            output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True, cwd=ROOT).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        if cv_file:
+            os.unlink(cv_file)
+    return min(runs, key=lambda run: run['p50_ms'])
+
+
+def compare(results, baseline, threshold):
+    """Devuelve las regresiones respecto de la línea base que superan ``threshold``."""
+    regressions = []
+    for case, values in results.items():
+        previous = baseline.get('results', {}).get(case)
+        if not previous:
+            continue
+        for metric, higher_is_worse in COMPARED.items():
+            old, new = previous.get(metric), values.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old if higher_is_worse else (old - new) / old
+            if change > threshold:
+                regressions.append(f'{case}: {metric} {old} -> {new} ({change:+.0%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20, help='muestras por caso (después de un calentamiento)')
+    parser.add_argument('--repeat', type=int, default=3, help='corridas por caso (se informa la de mejor p50)')
+    parser.add_argument('--classes', default=','.join(CASES), help=f'casos separados por coma ({", ".join(CASES)})')
+    parser.add_argument('--save-baseline', metavar='RUTA', help='guardar los resultados como línea base en JSON')
+    parser.add_argument('--baseline', metavar='RUTA', help='comparar contra una línea base guardada')
+    parser.add_argument('--threshold', type=float, default=0.2, help='empeoramiento máximo aceptado (0.2 = 20%%)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--cv-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.iterations, args.cv_file)))
+        return 0
+
+    cases = [case.strip() for case in args.classes.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f'casos desconocidos: {", ".join(unknown)}')
+
+    print(f'{"caso":<22} {"ops/s":>9} {"p50 (ms)":>10} {"p99 (ms)":>10} {"RSS (MB)":>9} {"PDF (bytes)":>12}')
+    results = {}
+    for case in cases:
+        values = results[case] = run_case(case, args.iterations, args.repeat)
+        print(f'{case:<22} {values["ops_s"]:>9.2f} {values["p50_ms"]:>10.3f} {values["p99_ms"]:>10.3f} '
+              f'{values["rss_mb"]:>9.1f} {values["bytes"] or "-":>12}')
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'iterations': args.iterations,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'Línea base guardada en {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('platform') != report['platform']:
+            print(f'Aviso: la línea base se tomó en otra plataforma ({baseline.get("platform")})')
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'ERROR: regresiones mayores a {args.threshold:.0%}:')
+            for regression in regressions:
+                print(f'  {regression}')
+            return 1
+        print(f'Sin regresiones mayores a {args.threshold:.0%} respecto de {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Informe del tiempo de arranque en frío de la aplicación.
+
+En procesos nuevos (como un arranque en frío de Vercel) mide:
+
+- el tiempo de ``import app`` y cuánto aporta cada import directo de
+  ``app.py`` y cada paquete (con ``python -X importtime``);
+- el tiempo hasta responder la primera petición a ``/`` y el primer PDF con
+  foto, que es cuando se cargan ``fpdf`` y PIL.
+
+Con ``--max-ms`` termina con error si la mediana de ``import app`` lo supera.
+
+Ejecutar con: python benchmarks/bench_startup.py [--repeat N] [--top N] [--max-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+FIRST_REQUESTS = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/').close()
+index = time.perf_counter()
+from cv_corpus import make_cv, make_photo
+cv = dict(make_cv('minimo'), template_type='profesional', profile_image=make_photo(size=(400, 300)))
+photo_ready = time.perf_counter()
+client.post('/download_pdf', json=cv).close()
+pdf = time.perf_counter()
+print(json.dumps({
+    'import app': (imported - started) * 1000,
+    'primera petición /': (index - imported) * 1000,
+    'primer PDF con foto': (pdf - photo_ready) * 1000,
+}))
+'''
+
+
+def app_env(workdir):
+    env = dict(os.environ)
+    env.setdefault('MP_ACCESS_TOKEN', 'TEST-bench')
+    env.setdefault('MP_PUBLIC_KEY', 'TEST-bench')
+    env.setdefault('LOG_LEVEL', 'ERROR')
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, BENCHMARKS, env.get('PYTHONPATH', '')])
+    env['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+    return env
+
+
+def parse_importtime(stderr):
+    """Devuelve (tiempo de ``app``, aporte de cada import directo, tiempo propio por paquete) en ms."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+
+    # -X importtime lista cada módulo después de sus dependencias: los hijos directos
+    # de ``app`` son las entradas de profundidad 1 anteriores a ella
+    index = next(i for i, entry in enumerate(entries) if entry[1] == 'app' and entry[0] == 0)
+    first = index
+    while first > 0 and entries[first - 1][0] > 0:
+        first -= 1
+    subtree = entries[first:index]
+    direct = {name: cumulative for depth, name, _, cumulative in subtree if depth == 1}
+    packages = {}
+    for _, name, self_ms, _ in subtree + [entries[index]]:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + self_ms
+    return entries[index][3], direct, packages
+
+
+def median_by_key(runs):
+    keys = {key for run in runs for key in run}
+    return {key: statistics.median(run.get(key, 0.0) for run in runs) for key in keys}
+
+
+def print_table(title, values, top):
+    print(f'\n{title}')
+    for name, ms in sorted(values.items(), key=lambda item: -item[1])[:top]:
+        print(f'  {name:<40} {ms:>9.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='procesos nuevos por medición (se informa la mediana)')
+    parser.add_argument('--top', type=int, default=15, help='filas por tabla')
+    parser.add_argument('--max-ms', type=float, help='máximo aceptable para import app (ms)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cv-arranque-')
+    env = app_env(workdir)
+    totals, directs, packages, first_requests = [], [], [], []
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                cwd=workdir, env=env, stderr=subprocess.PIPE, text=True, check=True)
+        total, direct, package = parse_importtime(result.stderr)
+        totals.append(total)
+        directs.append(direct)
+        packages.append(package)
+        output = subprocess.run([sys.executable, '-c', FIRST_REQUESTS],
+                                cwd=workdir, env=env, stdout=subprocess.PIPE, text=True, check=True).stdout
+        first_requests.append(json.loads(output.strip().splitlines()[-1]))
+
+    total = statistics.median(totals)
+    print(f'import app: {total:.1f} ms (mediana de {args.repeat} procesos nuevos)')
+    print_table('Aporte de cada import de app.py (acumulado)', median_by_key(directs), args.top)
+    print_table('Tiempo propio por paquete', median_by_key(packages), args.top)
+    print('\nPrimeras peticiones (mediana)')
+    for name, ms in median_by_key(first_requests).items():
+        print(f'  {name:<40} {ms:>9.1f} ms')
+
+    if args.max_ms is not None and total > args.max_ms:
+        print(f'ERROR: import app tarda {total:.1f} ms, más que el máximo de {args.max_ms:.1f} ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Benchmark de /generar_resumen_ia con un OpenRouter falso.
+
+El modelo principal es lento, a veces responde 429 y mientras genera envía
+keep-alives (así ninguna lectura supera el timeout de httpx); el segundo es
+rápido.
+Compara la latencia del endpoint usando solo el modelo principal y usando la
+cadena de modelos con plazo por petición, y verifica que el p99 de la cadena
+quede por debajo del SLO. Además envía ``--coalesce`` peticiones simultáneas
+con el mismo prompt a ``/generar_resumen_ia/stream`` (y una a la ruta JSON) y
+verifica que hagan una sola llamada a la API y reciban el mismo resumen.
+
+Ejecutar con: python benchmarks/bench_summary_routing.py [--requests N] [--slo S]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeOpenRouter, ModelBehavior  # noqa: E402
+
+PRIMARY = 'deepseek/deepseek-r1:free'
+SECONDARY = 'rapido/modelo-chico'
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_scenario(app_module, router, requests, concurrency):
+    """Envía ``requests`` prompts distintos con ``concurrency`` hilos y devuelve latencias y respuestas genéricas."""
+    app_module.model_router = router
+    client = app_module.app.test_client()
+    latencies = []
+    fallbacks = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            response = client.post('/generar_resumen_ia', json={'prompt': f'Resumen de prueba {i} {time.time()}'})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.get_json().get('resumen') == app_module.RESUMEN_GENERICO:
+                    fallbacks[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, fallbacks[0]
+
+
+def stream_summary_text(client, prompt):
+    """Resumen del evento ``done`` de /generar_resumen_ia/stream (None si no terminó bien)."""
+    body = client.post('/generar_resumen_ia/stream', json={'prompt': prompt}).get_data(as_text=True)
+    for event in body.split('\n\n'):
+        if event.startswith('event: done\n'):
+            return json.loads(event.split('data: ', 1)[1])['resumen']
+    return None
+
+
+def check_coalescing(app_module, server, router, requests):
+    """Peticiones simultáneas con el mismo prompt (streaming y JSON): devuelve (llamadas a la API, resúmenes)."""
+    app_module.model_router = router
+    client = app_module.app.test_client()
+    prompt = f'Resumen compartido {time.time()}'
+    calls_before = sum(server.calls.values())
+    results = []
+    lock = threading.Lock()
+
+    def stream_request():
+        summary = stream_summary_text(client, prompt)
+        with lock:
+            results.append(summary)
+
+    def json_request():
+        summary = client.post('/generar_resumen_ia', json={'prompt': prompt}).get_json().get('resumen')
+        with lock:
+            results.append(summary)
+
+    threads = [threading.Thread(target=stream_request) for _ in range(requests)]
+    threads.append(threading.Thread(target=json_request))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(server.calls.values()) - calls_before, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--primary-latency', type=float, default=3.0)
+    parser.add_argument('--primary-rate-limit', type=float, default=0.2)
+    parser.add_argument('--primary-keepalive', type=float, default=0.2,
+                        help='intervalo de keep-alives del modelo principal (0 los desactiva)')
+    parser.add_argument('--secondary-latency', type=float, default=0.3)
+    parser.add_argument('--deadline', type=float, default=2.5)
+    parser.add_argument('--attempt-timeout', type=float, default=1.5)
+    parser.add_argument('--slo', type=float, default=3.0, help='p99 máximo aceptable con la cadena (segundos)')
+    parser.add_argument('--coalesce', type=int, default=8, help='streams simultáneos con el mismo prompt')
+    args = parser.parse_args()
+
+    server = FakeOpenRouter({
+        PRIMARY: ModelBehavior(args.primary_latency, rate_limit=args.primary_rate_limit,
+                               keepalive=args.primary_keepalive),
+        SECONDARY: ModelBehavior(args.secondary_latency),
+    }).start()
+    os.environ.update({
+        'OPENROUTER_API_URL': server.url,
+        'OPENROUTER_API_KEY': os.getenv('OPENROUTER_API_KEY', 'sk-bench'),
+        'MP_ACCESS_TOKEN': os.getenv('MP_ACCESS_TOKEN', 'TEST-bench'),
+        'MP_PUBLIC_KEY': os.getenv('MP_PUBLIC_KEY', 'TEST-bench'),
+        'FORM_STORE': 'memory',
+    })
+
+    import logging
+    import app as app_module
+    from model_router import ModelRouter
+    app_module.app.logger.setLevel(logging.ERROR)
+
+    scenarios = [
+        # Comportamiento anterior: un solo modelo, sin plazo ni pausa tras un 429
+        ('solo principal', ModelRouter([(PRIMARY, args.concurrency)], deadline=60, attempt_timeout=60, cooldown=0)),
+        ('cadena con plazo', ModelRouter([(PRIMARY, 4), (SECONDARY, args.concurrency)],
+                                         deadline=args.deadline, attempt_timeout=args.attempt_timeout, cooldown=2)),
+    ]
+    print(f'{"escenario":<18} {"p50 (s)":>9} {"p99 (s)":>9} {"máx (s)":>9} {"genéricos":>10}')
+    p99 = None
+    try:
+        for name, router in scenarios:
+            latencies, fallbacks = run_scenario(app_module, router, args.requests, args.concurrency)
+            p99 = percentile(latencies, 0.99)
+            print(f'{name:<18} {percentile(latencies, 0.5):9.3f} {p99:9.3f} {max(latencies):9.3f} {fallbacks:10d}')
+        print('llamadas por modelo:', server.calls)
+        calls, summaries = check_coalescing(
+            app_module, server, ModelRouter([(SECONDARY, args.concurrency)], deadline=args.deadline), args.coalesce)
+    finally:
+        server.stop()
+    print(f'{args.coalesce} streams + 1 JSON con el mismo prompt: {calls} llamada(s) a la API')
+    if calls != 1 or len(set(summaries)) != 1 or app_module.RESUMEN_GENERICO in summaries or None in summaries:
+        print(f'ERROR: se esperaba una sola llamada y el mismo resumen en todas las respuestas: {summaries}')
+        sys.exit(1)
+
+    if p99 > args.slo:
+        print(f'ERROR: el p99 de la cadena ({p99:.3f}s) supera el SLO de {args.slo:.3f}s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
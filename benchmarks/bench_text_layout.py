@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark del corte de líneas: FPDF.multi_cell frente a text_layout.multi_cell.
+
+Mide descripciones largas (incluida una de 10.000 caracteres) y verifica que
+ambos caminos produzcan exactamente el mismo contenido de página (todas las
+páginas y la posición final del cursor).
+
+Ejecutar con: python benchmarks/bench_text_layout.py [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf import FPDF  # noqa: E402
+
+import text_layout  # noqa: E402
+
+WORDS = ('desarrollo', 'sistemas', 'equipo', 'clientes', 'gestión', 'proyectos', 'implementación',
+         'mejora', 'continua', 'análisis', 'de', 'y', 'con', 'para', 'la', 'el', 'en', 'procesos')
+
+
+def make_text(length, seed=42):
+    """Texto pseudoaleatorio de ``length`` caracteres con palabras y saltos de línea ocasionales."""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        sep = '\n' if rng.random() < 0.01 else ' '
+        parts.append(word + sep)
+        size += len(word) + 1
+    return ''.join(parts)[:length]
+
+
+def render(multi_cell, text):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('Arial', '', 10)
+    multi_cell(pdf, text)
+    # En FPDF 1.7 el contenido queda en pdf.pages hasta close(); pdf.buffer sigue vacío
+    return dict(pdf.pages), pdf.x, pdf.y
+
+
+def fpdf_multi_cell(pdf, text):
+    pdf.multi_cell(0, 6, txt=text)
+
+
+def fast_multi_cell(pdf, text):
+    text_layout.multi_cell(pdf, 0, 6, text)
+
+
+def timeit(fn, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='repeticiones por caso (se informa la mejor)')
+    args = parser.parse_args()
+
+    print(f"{'caracteres':>10}  {'FPDF (ms)':>10}  {'text_layout (ms)':>16}  {'aceleración':>11}")
+    for length in (500, 2000, 10000, 50000):
+        text = make_text(length)
+        if render(fpdf_multi_cell, text) != render(fast_multi_cell, text):
+            print(f'ERROR: la salida difiere para {length} caracteres')
+            return 1
+        slow = timeit(lambda t: render(fpdf_multi_cell, t), text, args.repeat)
+        fast = timeit(lambda t: render(fast_multi_cell, t), text, args.repeat)
+        print(f'{length:>10}  {slow * 1000:>10.2f}  {fast * 1000:>16.2f}  {slow / fast:>10.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Generador reproducible de CVs sintéticos para benchmarks.
+
+Cada clase de tamaño representa un caso real de carga distinta:
+
+- ``minimo``: CV básico con los campos mínimos.
+- ``foto_12mp``: CV profesional con una foto de 12 MP (4000x3000) en base64.
+- ``foto_48mp``: CV profesional con una foto de 48 MP (8000x6000) en base64.
+- ``experiencias_50``: CV con 50 experiencias laborales.
+- ``descripciones_largas``: resumen y descripciones de decenas de miles de caracteres.
+
+El mismo ``seed`` genera siempre los mismos datos.
+"""
+
+import base64
+import io
+import random
+
+WORDS = ('desarrollo', 'sistemas', 'equipo', 'clientes', 'gestión', 'proyectos', 'implementación',
+         'mejora', 'continua', 'análisis', 'de', 'y', 'con', 'para', 'la', 'el', 'en', 'procesos',
+         'atención', 'logística', 'ventas', 'coordinación', 'soporte', 'técnico', 'informes')
+NOMBRES = ('juan', 'maría', 'carlos', 'lucía', 'martín', 'sofía', 'pablo', 'valentina')
+APELLIDOS = ('pérez', 'gómez', 'rodríguez', 'fernández', 'lópez', 'martínez', 'díaz', 'sánchez')
+EMPRESAS = ('acme corp', 'distribuidora del sur sa', 'tecnología andina srl', 'servicios integrales',
+            'banco regional', 'consultora patagónica', 'logística norte', 'estudio contable')
+CARGOS = ('desarrollador senior', 'analista funcional', 'jefe de proyecto', 'asistente administrativo',
+          'vendedor', 'técnico de soporte', 'responsable de logística', 'contador')
+COLORES = ('azul-marino', 'amarillo-claro', 'rosado-pastel', 'morado')
+
+SIZE_CLASSES = ('minimo', 'foto_12mp', 'foto_48mp', 'experiencias_50', 'descripciones_largas')
+
+# Fotos ya generadas por (tamaño, seed), para no codificar 12 MP en cada CV
+_photos = {}
+
+
+def make_text(rng, length):
+    """Texto pseudoaleatorio de ``length`` caracteres con saltos de línea ocasionales."""
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        sep = '\n' if rng.random() < 0.01 else ' '
+        parts.append(word + sep)
+        size += len(word) + 1
+    return ''.join(parts)[:length].strip()
+
+
+def make_photo(size=(4000, 3000), seed=0):
+    """Foto JPEG en data URL con gradiente y ruido, para que pese como una foto de cámara."""
+    key = (size, seed)
+    if key not in _photos:
+        from PIL import Image
+
+        rng = random.Random(seed)
+        base = Image.linear_gradient('L').resize(size)
+        # Ruido generado a un cuarto de la resolución: el JPEG pesa como una foto de teléfono (~5 MB)
+        small = (size[0] // 4, size[1] // 4)
+        noise = Image.frombytes('L', small, rng.randbytes(small[0] * small[1])).resize(size, Image.BICUBIC)
+        img = Image.merge('RGB', (base, noise, Image.blend(base, noise, 0.5)))
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=90)
+        _photos[key] = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+    return _photos[key]
+
+
+def make_experience(rng, description_length):
+    start = rng.randint(1995, 2020)
+    return {
+        'empresa': rng.choice(EMPRESAS),
+        'cargo': rng.choice(CARGOS),
+        'periodo': f'{start} - {start + rng.randint(1, 4)}',
+        'descripcion': make_text(rng, description_length),
+    }
+
+
+def make_cv(size_class, seed=0):
+    """Datos de un CV de la clase ``size_class`` tal como los envía el formulario."""
+    if size_class not in SIZE_CLASSES:
+        raise ValueError(f'Clase de tamaño desconocida: {size_class}')
+    rng = random.Random(f'{size_class}-{seed}')
+    cv = {
+        'nombre': f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}',
+        'dni': str(rng.randint(20000000, 45000000)),
+        'fecha_nacimiento': f'{rng.randint(1960, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'edad': str(rng.randint(20, 64)),
+        'email': f'usuario{seed}@example.com',
+        'telefono': str(rng.randint(1100000000, 1199999999)),
+        'direccion': f'Calle {rng.choice(APELLIDOS).title()} {rng.randint(1, 9999)}',
+        'template_type': 'basico',
+    }
+    if size_class == 'minimo':
+        return cv
+
+    cv.update({
+        'resumen': make_text(rng, 400),
+        'experiencia': [make_experience(rng, 300) for _ in range(3)],
+        'educacion': [{'titulo': 'ingeniería en sistemas', 'institucion': 'universidad nacional', 'año': '2008 - 2014'}],
+        'habilidades': [rng.choice(WORDS).title() for _ in range(8)],
+    })
+    if size_class == 'foto_12mp':
+        cv.update(template_type='profesional', template_color=rng.choice(COLORES), profile_image=make_photo(seed=seed))
+    elif size_class == 'foto_48mp':
+        cv.update(template_type='profesional', template_color=rng.choice(COLORES),
+                  profile_image=make_photo(size=(8000, 6000), seed=seed))
+    elif size_class == 'experiencias_50':
+        cv['experiencia'] = [make_experience(rng, 300) for _ in range(50)]
+    elif size_class == 'descripciones_largas':
+        cv['resumen'] = make_text(rng, 20000)
+        cv['experiencia'] = [make_experience(rng, 10000) for _ in range(5)]
+    return cv
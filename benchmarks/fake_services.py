@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+"""
+Servidores locales que imitan las APIs externas para benchmarks y pruebas de carga.
+
+``FakeOpenRouter`` responde ``POST /v1/chat/completions`` (normal y en
+streaming) con una latencia y una tasa de errores configurables por modelo:
+
+    python benchmarks/fake_services.py openrouter --port 18081 \\
+        --model deepseek/deepseek-r1:free=2.5:0.1 --model otro/modelo=0.3
+
+Cada ``--model`` es ``nombre=latencia[:tasa_de_429]`` (segundos). Los modelos no
+configurados responden con la latencia de ``--default-latency``.
+
+``FakeMercadoPago`` responde las llamadas del SDK que usa la aplicación
+(``POST /checkout/preferences`` y ``GET /v1/payments/<id>``) con latencia y
+tasa de errores 500 configurables. ``POST /checkout/preferences/<id>/pay``
+(solo del servidor falso) simula que el comprador paga la preferencia y
+devuelve el pago aprobado:
+
+    python benchmarks/fake_services.py mercadopago --port 18082 --latency 0.15 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ModelBehavior:
+    """Latencia media (segundos), variación relativa, probabilidad de responder 429 e intervalo de keep-alives.
+
+    Con ``keepalive`` el servidor envía la respuesta de inmediato y, mientras
+    "genera", manda relleno cada esos segundos (espacios antes del JSON o
+    comentarios SSE, como OpenRouter): ninguna lectura supera el timeout de httpx.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, rate_limit=0.0, keepalive=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.keepalive = keepalive
+
+    def delay(self, rng):
+        return max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+
+def parse_model_option(value):
+    name, _, spec = value.partition('=')
+    latency, _, rate_limit = spec.partition(':')
+    return name, ModelBehavior(float(latency or 0.5), rate_limit=float(rate_limit or 0))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Los clientes que cortan por timeout dejan el socket cerrado: no es un error del servidor
+        pass
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _OpenRouterHandler(_JSONHandler):
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+        self.wfile.flush()
+
+    def _wait(self, delay, keepalive, padding):
+        """Espera ``delay`` segundos enviando ``padding`` cada ``keepalive`` segundos (si se configuró)."""
+        if not keepalive:
+            time.sleep(delay)
+            return
+        end = time.monotonic() + delay
+        while (remaining := end - time.monotonic()) > 0:
+            time.sleep(min(keepalive, remaining))
+            self._write_chunk(padding)
+
+    def do_POST(self):
+        service = self.server.service
+        request = self._read_json()
+        model = request.get('model', '')
+        behavior = service.behavior(model)
+        service.count(model)
+
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+        if service.rng.random() < behavior.rate_limit:
+            self._send_json(429, {'error': {'message': 'rate limited'}}, {'Retry-After': '1'})
+            return
+
+        text = service.reply_text(model)
+        delay = behavior.delay(service.rng)
+        if not request.get('stream'):
+            payload = {
+                'id': 'fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            }
+            if not behavior.keepalive:
+                time.sleep(delay)
+                self._send_json(200, payload)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self._wait(delay, behavior.keepalive, b' ')
+            self._write_chunk(json.dumps(payload).encode('utf-8'))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+
+        # Streaming: el primer fragmento llega tras la latencia configurada
+        words = text.split(' ')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._wait(delay, behavior.keepalive, b': OPENROUTER PROCESSING\n\n')
+        for i, word in enumerate(words):
+            chunk = {
+                'id': 'fake', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}, 'finish_reason': None}],
+            }
+            self._write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        self._write_chunk(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class FakeOpenRouter:
+    """Servidor OpenRouter falso en un hilo; ``url`` es la base para ``OPENROUTER_API_URL``."""
+
+    def __init__(self, models=None, default=None, host='127.0.0.1', port=0, seed=1):
+        self.models = dict(models or {})
+        self.default = default or ModelBehavior()
+        self.rng = random.Random(seed)
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.httpd = _Server((host, port), _OpenRouterHandler)
+        self.httpd.service = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def behavior(self, model):
+        return self.models.get(model, self.default)
+
+    def count(self, model):
+        with self._lock:
+            self.calls[model] = self.calls.get(model, 0) + 1
+
+    def reply_text(self, model):
+        return (f'Profesional orientado a resultados con experiencia comprobada ({model}). '
+                'Me destaco por el trabajo en equipo y la mejora continua.')
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _MercadoPagoHandler(_JSONHandler):
+
+    def _respond(self, handler, *args):
+        service = self.server.service
+        service.count(handler.__name__)
+        time.sleep(service.delay())
+        if service.fail():
+            self._send_json(500, {'message': 'internal_error', 'status': 500})
+            return
+        status, payload = handler(*args)
+        self._send_json(status, payload)
+
+    def do_POST(self):
+        service = self.server.service
+        body = self._read_json()
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['checkout', 'preferences']:
+            self._respond(service.create_preference, body)
+        elif len(parts) == 4 and parts[:2] == ['checkout', 'preferences'] and parts[3] == 'pay':
+            # Atajo del servidor falso: sin latencia ni errores simulados
+            status, payload = service._pay(parts[2])
+            self._send_json(status, payload)
+        else:
+            self._send_json(404, {'message': 'not_found', 'status': 404})
+
+    def do_GET(self):
+        service = self.server.service
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 3 and parts[:2] == ['v1', 'payments']:
+            self._respond(service.get_payment, parts[2])
+        else:
+            self._send_json(404, {'message': 'not_found', 'status': 404})
+
+
+class FakeMercadoPago:
+    """API de MercadoPago falsa en un hilo; ``url`` es la base para ``MP_API_URL``.
+
+    Guarda en memoria las preferencias creadas y los pagos simulados con ``pay()``.
+    """
+
+    def __init__(self, latency=0.15, jitter=0.2, error_rate=0.0, host='127.0.0.1', port=0, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = {}
+        self.preferences = {}
+        self.payments = {}
+        self._ids = iter(range(10 ** 9, 2 * 10 ** 9))
+        self._lock = threading.Lock()
+        self.httpd = _Server((host, port), _MercadoPagoHandler)
+        self.httpd.service = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def delay(self):
+        with self._lock:
+            return max(0.0, self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def fail(self):
+        with self._lock:
+            return self.rng.random() < self.error_rate
+
+    def create_preference(self, data):
+        with self._lock:
+            preference_id = f'fake-{next(self._ids)}'
+            self.preferences[preference_id] = data
+        return 201, {
+            'id': preference_id,
+            'external_reference': data.get('external_reference'),
+            'init_point': f'{self.url}/checkout/v1/redirect?pref_id={preference_id}',
+            'sandbox_init_point': f'{self.url}/checkout/v1/redirect?pref_id={preference_id}',
+            'items': data.get('items', []),
+        }
+
+    def _pay(self, preference_id, status='approved'):
+        with self._lock:
+            preference = self.preferences.get(preference_id)
+            if preference is None:
+                return 404, {'message': 'preference_not_found', 'status': 404}
+            payment_id = next(self._ids)
+            now = time.strftime('%Y-%m-%dT%H:%M:%S.000-03:00')
+            payment = self.payments[str(payment_id)] = {
+                'id': payment_id,
+                'status': status,
+                'status_detail': 'accredited' if status == 'approved' else status,
+                'external_reference': preference.get('external_reference'),
+                'transaction_amount': sum(item.get('unit_price', 0) for item in preference.get('items', [])),
+                'currency_id': 'ARS',
+                'date_created': now,
+                'date_approved': now if status == 'approved' else None,
+                'date_last_updated': now,
+            }
+        return 201, payment
+
+    def pay(self, preference_id, status='approved'):
+        """Simula el pago de una preferencia y devuelve el pago creado (o None si no existe)."""
+        code, payment = self._pay(preference_id, status)
+        return payment if code == 201 else None
+
+    def get_payment(self, payment_id):
+        with self._lock:
+            payment = self.payments.get(payment_id)
+        if payment is None:
+            return 404, {'message': 'Payment not found', 'status': 404}
+        return 200, payment
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='service', required=True)
+    openrouter = sub.add_parser('openrouter')
+    openrouter.add_argument('--host', default='127.0.0.1')
+    openrouter.add_argument('--port', type=int, default=18081)
+    openrouter.add_argument('--model', action='append', default=[], type=parse_model_option)
+    openrouter.add_argument('--default-latency', type=float, default=0.5)
+    mercadopago = sub.add_parser('mercadopago')
+    mercadopago.add_argument('--host', default='127.0.0.1')
+    mercadopago.add_argument('--port', type=int, default=18082)
+    mercadopago.add_argument('--latency', type=float, default=0.15)
+    mercadopago.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.service == 'mercadopago':
+        server = FakeMercadoPago(args.latency, error_rate=args.error_rate, host=args.host, port=args.port)
+        print(f'MercadoPago falso en {server.url}')
+    else:
+        server = FakeOpenRouter(dict(args.model), ModelBehavior(args.default_latency), args.host, args.port)
+        print(f'OpenRouter falso en {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
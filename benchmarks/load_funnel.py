@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+"""
+Prueba de carga de punta a punta del flujo de compra, bajo gunicorn.
+
+Levanta un MercadoPago y un OpenRouter falsos (``fake_services``), arranca la
+aplicación con gunicorn apuntando a ellos (``MP_API_URL`` y
+``OPENROUTER_API_URL``) en una carpeta temporal, y simula usuarios
+concurrentes que recorren el flujo completo:
+
+    [/generar_resumen_ia] -> [/upload_image] -> /save_form_data -> /create_preference
+    -> pago -> [/webhook] -> /success -> /download_pdf
+
+El pago lo simula el MercadoPago falso; el webhook se envía como lo haría
+MercadoPago (con probabilidad ``--webhook-ratio``) antes de que el usuario
+vuelva a ``/success``. Al terminar informa, por ruta, peticiones por segundo,
+errores y latencia p50/p95/p99, además de los flujos completados.
+
+Como el formulario, los CVs con foto la suben en binario a ``/upload_image`` y
+envían solo el token; ``--base64-images`` la envía en base64 dentro del JSON
+(el comportamiento anterior) para comparar.
+
+Ejecutar con:
+    python benchmarks/load_funnel.py [--users 10] [--duration 30] [--workers 2] \\
+        [--classes minimo,experiencias_50] [--env RENDER_WORKERS=2]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from cv_corpus import SIZE_CLASSES, make_cv
+from fake_services import FakeMercadoPago, FakeOpenRouter, ModelBehavior
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ('/generar_resumen_ia', '/upload_image', '/save_form_data', '/create_preference', '/webhook', '/success', '/download_pdf')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_env(values):
+    env = {}
+    for value in values:
+        name, _, setting = value.partition('=')
+        env[name] = setting
+    return env
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Latencias y estados por ruta, compartidos entre los usuarios simulados."""
+
+    def __init__(self):
+        self.samples = {route: [] for route in ROUTES}
+        self.errors = {route: 0 for route in ROUTES}
+        self.flows = 0
+        self.failed_flows = 0
+        self._lock = threading.Lock()
+
+    def record(self, route, elapsed, ok):
+        with self._lock:
+            self.samples[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+
+    def flow(self, ok):
+        with self._lock:
+            if ok:
+                self.flows += 1
+            else:
+                self.failed_flows += 1
+
+
+class SimulatedUser:
+    """Un comprador que recorre el flujo una y otra vez con su propia sesión HTTP."""
+
+    def __init__(self, index, base_url, mp, recorder, corpus, args):
+        self.index = index
+        self.base_url = base_url
+        self.mp = mp
+        self.recorder = recorder
+        self.corpus = corpus
+        self.args = args
+        self.rng = random.Random(args.seed + index)
+        self.session = requests.Session()
+
+    def call(self, method, route, expected=200, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + route, timeout=self.args.timeout, **kwargs)
+            ok = response.status_code == expected
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(route, time.perf_counter() - started, ok)
+        if not ok:
+            raise FlowFailed(route)
+        return response
+
+    def run_flow(self, flow_number):
+        cv = dict(self.corpus[flow_number % len(self.corpus)])
+        # Un nombre distinto por flujo: cada CV es nuevo para la caché de PDFs
+        cv['nombre'] = f"{cv['nombre']} {self.index} {flow_number}"
+
+        if self.rng.random() < self.args.ai_ratio:
+            prompt = f"Resumen profesional para {cv['nombre']} con experiencia en {cv.get('habilidades', ['ventas'])[0]}"
+            self.call('POST', '/generar_resumen_ia', json={'prompt': prompt})
+
+        if cv.get('profile_image') and not self.args.base64_images:
+            # main.js sube la foto al elegirla y guarda solo el token
+            header, _, payload = cv['profile_image'].partition(',')
+            cv['profile_image'] = self.call('POST', '/upload_image', data=base64.b64decode(payload), headers={
+                'Content-Type': header[len('data:'):].split(';')[0],
+            }).json()['image_token']
+
+        form_id = self.call('POST', '/save_form_data', json=cv).json()['form_id']
+        preference = self.call('POST', '/create_preference', json={
+            'template_type': cv.get('template_type', 'basico'),
+            'template_color': cv.get('template_color', 'azul-marino'),
+            'external_reference': form_id,
+        }).json()
+
+        # El comprador paga en MercadoPago
+        payment = self.mp.pay(preference['id'])
+        if self.rng.random() < self.args.webhook_ratio:
+            self.call('POST', '/webhook', json={
+                'type': 'payment', 'action': 'payment.updated', 'data': {'id': str(payment['id'])},
+            })
+        self.call('GET', '/success', params={
+            'payment_id': payment['id'], 'status': 'approved', 'external_reference': form_id,
+        })
+
+        # success.html pide el PDF con el form_id y la foto (o su token) guardada en el navegador
+        download = {
+            'form_id': form_id,
+            'template_type': cv.get('template_type', 'basico'),
+            'template_color': cv.get('template_color', 'azul-marino'),
+        }
+        if cv.get('profile_image'):
+            download['profile_image'] = cv['profile_image']
+        response = self.call('POST', '/download_pdf', json=download)
+        if not response.content.startswith(b'%PDF'):
+            raise FlowFailed('/download_pdf')
+
+    def run(self, deadline):
+        flow_number = 0
+        while time.monotonic() < deadline:
+            try:
+                self.run_flow(flow_number)
+                self.recorder.flow(True)
+            except FlowFailed:
+                self.recorder.flow(False)
+            flow_number += 1
+
+
+def start_app(args, env, workdir):
+    """Arranca gunicorn en ``workdir`` y espera a que responda; devuelve el proceso y su URL."""
+    port = args.port or free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--config', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '--pythonpath', ROOT,
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        '--timeout', str(int(args.timeout)),
+    ]
+    log_file = open(os.path.join(workdir, 'gunicorn.log'), 'wb')
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    limit = time.monotonic() + 30
+    while time.monotonic() < limit:
+        if process.poll() is not None:
+            break
+        try:
+            if requests.get(base_url + '/get_mp_public_key', timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn no respondió; ver {log_file.name}')
+
+
+def report(recorder, elapsed, mp, openrouter):
+    print(f'\n{"ruta":<22} {"peticiones":>10} {"errores":>8} {"req/s":>8} {"p50 (ms)":>9} {"p95 (ms)":>9} '
+          f'{"p99 (ms)":>9} {"máx (ms)":>9}')
+    result = {'duration_s': round(elapsed, 2), 'routes': {}}
+    for route in ROUTES:
+        samples = recorder.samples[route]
+        if not samples:
+            continue
+        values = {
+            'requests': len(samples),
+            'errors': recorder.errors[route],
+            'rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(samples, 0.5) * 1000, 1),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 1),
+            'max_ms': round(max(samples) * 1000, 1),
+        }
+        result['routes'][route] = values
+        print(f'{route:<22} {values["requests"]:>10} {values["errors"]:>8} {values["rps"]:>8.2f} '
+              f'{values["p50_ms"]:>9.1f} {values["p95_ms"]:>9.1f} {values["p99_ms"]:>9.1f} {values["max_ms"]:>9.1f}')
+    result['flows'] = recorder.flows
+    result['failed_flows'] = recorder.failed_flows
+    result['flows_per_s'] = round(recorder.flows / elapsed, 2)
+    print(f'\nflujos completos: {recorder.flows} ({result["flows_per_s"]:.2f}/s), fallidos: {recorder.failed_flows}')
+    print('llamadas a MercadoPago:', mp.calls)
+    print('llamadas a OpenRouter:', openrouter.calls)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10, help='usuarios simulados concurrentes')
+    parser.add_argument('--duration', type=float, default=30, help='duración de la prueba (segundos)')
+    parser.add_argument('--workers', type=int, default=2, help='workers de gunicorn')
+    parser.add_argument('--threads', type=int, default=8, help='hilos por worker de gunicorn (gthread)')
+    parser.add_argument('--port', type=int, default=0, help='puerto de la aplicación (0 = uno libre)')
+    parser.add_argument('--classes', default='minimo,experiencias_50',
+                        help=f'clases de CV del corpus, en rotación ({", ".join(SIZE_CLASSES)})')
+    parser.add_argument('--ai-ratio', type=float, default=0.3, help='fracción de flujos que piden un resumen con IA')
+    parser.add_argument('--webhook-ratio', type=float, default=1.0,
+                        help='fracción de pagos notificados por webhook antes de /success')
+    parser.add_argument('--mp-latency', type=float, default=0.15, help='latencia de MercadoPago (segundos)')
+    parser.add_argument('--mp-error-rate', type=float, default=0.0, help='fracción de respuestas 500 de MercadoPago')
+    parser.add_argument('--ai-latency', type=float, default=1.0, help='latencia de OpenRouter (segundos)')
+    parser.add_argument('--ai-rate-limit', type=float, default=0.0, help='fracción de respuestas 429 de OpenRouter')
+    parser.add_argument('--base64-images', action='store_true',
+                        help='enviar la foto en base64 dentro del JSON en lugar de subirla a /upload_image')
+    parser.add_argument('--timeout', type=float, default=60, help='timeout de cada petición (segundos)')
+    parser.add_argument('--env', action='append', default=[], metavar='VARIABLE=VALOR',
+                        help='variable de entorno adicional para la aplicación (repetible)')
+    parser.add_argument('--json', metavar='RUTA', help='guardar el informe en JSON')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    classes = [name.strip() for name in args.classes.split(',') if name.strip()]
+    corpus = [make_cv(name) for name in classes]
+
+    mp = FakeMercadoPago(args.mp_latency, error_rate=args.mp_error_rate, seed=args.seed).start()
+    openrouter = FakeOpenRouter(default=ModelBehavior(args.ai_latency, rate_limit=args.ai_rate_limit),
+                                seed=args.seed).start()
+    env = dict(os.environ)
+    env.update({
+        'MP_ACCESS_TOKEN': 'TEST-carga',
+        'MP_PUBLIC_KEY': 'TEST-carga',
+        'MP_API_URL': mp.url,
+        'OPENROUTER_API_KEY': 'sk-carga',
+        'OPENROUTER_API_URL': openrouter.url,
+        'LOG_LEVEL': 'WARNING',
+    })
+    env.update(parse_env(args.env))
+
+    workdir = tempfile.mkdtemp(prefix='cv-carga-')
+    process, base_url = start_app(args, env, workdir)
+    print(f'Aplicación en {base_url} ({args.workers} workers x {args.threads} hilos), datos en {workdir}')
+    print(f'{args.users} usuarios durante {args.duration:.0f}s, CVs: {", ".join(classes)}')
+
+    recorder = Recorder()
+    users = [SimulatedUser(i, base_url, mp, recorder, corpus, args) for i in range(args.users)]
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=user.run, args=(deadline,)) for user in users]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        mp.stop()
+        openrouter.stop()
+
+    result = report(recorder, time.monotonic() - started, mp, openrouter)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+    return 1 if recorder.flows == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
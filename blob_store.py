@@ -0,0 +1,156 @@
+"""
+Almacén de blobs direccionado por contenido.
+
+Las fotos de perfil se guardan una sola vez, identificadas por el SHA-256 de
+sus bytes, y los registros de formulario solo guardan la referencia
+``blob:<digest>``. Los archivos se reparten en subcarpetas por prefijo del
+digest para no acumular miles de archivos en un mismo directorio.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+BLOB_REF_PREFIX = 'blob:'
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Tamaño de los bloques leídos al guardar un blob desde un stream
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobTooLarge(ValueError):
+    """El contenido recibido supera el tamaño máximo permitido."""
+
+
+def is_blob_ref(value):
+    """Indica si el valor es una referencia ``blob:<digest>``."""
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+
+def blob_ref(digest):
+    return BLOB_REF_PREFIX + digest
+
+
+def ref_digest(ref):
+    """Digest de una referencia ``blob:<digest>`` (ValueError si no es válida)."""
+    digest = ref[len(BLOB_REF_PREFIX):] if is_blob_ref(ref) else ref
+    if not _DIGEST_RE.match(digest):
+        raise ValueError('Referencia de blob inválida')
+    return digest
+
+
+class FileBlobStore:
+    """Blobs en disco, compartidos entre procesos, en ``<root>/<ab>/<cd>/<digest>``."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, data):
+        """Guarda los bytes (si no existían) y devuelve su digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            # Renovar la fecha de uso para la limpieza por antigüedad
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return digest
+
+    def put_stream(self, stream, max_bytes=None, head=b'', validate=None):
+        """Guarda el contenido de un stream (precedido por ``head``) sin cargarlo entero en memoria.
+
+        Escribe en un archivo temporal mientras calcula el digest; si se supera
+        ``max_bytes`` descarta lo escrito y lanza ``BlobTooLarge``. ``validate``
+        recibe el archivo temporal abierto antes de guardarlo: si lanza una
+        excepción, no queda nada en el almacén.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.root, f'upload.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                chunk = head or stream.read(CHUNK_SIZE)
+                while chunk:
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BlobTooLarge(f'El archivo supera el máximo de {max_bytes} bytes')
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    chunk = stream.read(CHUNK_SIZE)
+            if validate is not None:
+                with open(tmp_path, 'rb') as f:
+                    validate(f)
+            digest = hasher.hexdigest()
+            path = self._path(digest)
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            return digest, size
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def get(self, digest):
+        """Devuelve los bytes del blob o None si no existe."""
+        try:
+            with open(self._path(ref_digest(digest)), 'rb') as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def open(self, digest):
+        """Abre el blob para lectura (OSError si no existe)."""
+        return open(self._path(ref_digest(digest)), 'rb')
+
+    def exists(self, digest):
+        try:
+            return os.path.exists(self._path(ref_digest(digest)))
+        except ValueError:
+            return False
+
+    def touch(self, digest):
+        """Renueva la fecha de uso del blob (lo referencia un formulario nuevo); devuelve si existe."""
+        try:
+            os.utime(self._path(ref_digest(digest)))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def sweep(self, max_age):
+        """Elimina los blobs que no se usan hace más de ``max_age`` segundos.
+
+        La fecha de uso se renueva al guardar el blob y cada vez que un
+        formulario lo referencia (``touch``), así que con ``max_age`` igual al
+        TTL de los formularios no se borra la foto de un formulario vigente.
+        """
+        limit = time.time() - max_age
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
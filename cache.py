@@ -0,0 +1,88 @@
+"""
+Cachés en memoria para los PDFs generados.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Caché LRU segura entre hilos, acotada por cantidad de entradas y por bytes."""
+
+    def __init__(self, max_entries=128, max_bytes=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        # Un valor más grande que toda la caché no se guarda
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= self.sizeof(old)
+            self._data[key] = value
+            self.current_bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self.current_bytes -= self.sizeof(evicted)
+
+    def pop(self, key):
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is not None:
+                self.current_bytes -= self.sizeof(value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+def cv_digest(cv):
+    """Calcula el digest SHA-256 del CV compilado (``cv_model.CV``), con su plantilla y perfil de salida."""
+    payload = json.dumps(cv.as_dict(), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PDFCache:
+    """Caché de PDFs direccionada por contenido en memoria (LRU); el nivel en disco es ``pdf_archive``."""
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+
+    def get(self, digest):
+        return self.memory.get(digest)
+
+    def put(self, digest, pdf_bytes):
+        self.memory.put(digest, pdf_bytes)
@@ -0,0 +1,177 @@
+"""
+Modelo compilado del CV.
+
+``compile_cv`` recorre una sola vez los datos recibidos (JSON de la petición o
+formulario guardado), valida sus tipos y los convierte en registros con
+``__slots__`` con los textos ya normalizados: el nombre, las empresas, los
+cargos, los títulos y las instituciones se capitalizan aquí y no al generar el
+PDF. Los datos mal formados se rechazan con ``InvalidCV`` antes de buscar en la
+caché o de encolar el render. Los planes de render leen los atributos del
+modelo directamente.
+"""
+
+from blob_store import blob_ref
+from cv_templates import template_registry
+from images import image_digest
+from pdf_profiles import get_profile
+from template_engine import capitalize_text
+
+
+class InvalidCV(ValueError):
+    """Los datos del CV no tienen la forma esperada."""
+
+
+class Record:
+    """Registro con ``__slots__``; ``as_dict`` omite los campos vacíos (para el digest)."""
+
+    __slots__ = ()
+
+    def as_dict(self):
+        return {name: value for name in self.__slots__ if (value := getattr(self, name))}
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.as_dict()!r})'
+
+
+class Experience(Record):
+    __slots__ = ('empresa', 'cargo', 'periodo', 'descripcion')
+
+    def __init__(self, empresa, cargo, periodo, descripcion):
+        self.empresa = empresa
+        self.cargo = cargo
+        self.periodo = periodo
+        self.descripcion = descripcion
+
+
+class Education(Record):
+    __slots__ = ('titulo', 'institucion', 'año')
+
+    def __init__(self, titulo, institucion, año):
+        self.titulo = titulo
+        self.institucion = institucion
+        self.año = año
+
+
+class CV(Record):
+    """CV listo para generar: textos normalizados, plantilla y color resueltos y perfil de salida validado."""
+
+    __slots__ = (
+        'nombre', 'dni', 'fecha_nacimiento', 'edad', 'email', 'telefono', 'direccion', 'resumen',
+        'experiencia', 'educacion', 'habilidades', 'profile_image',
+        'template_type', 'template_color', 'output_profile', 'profile_image_key',
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self):
+        data = super().as_dict()
+        for name in ('experiencia', 'educacion'):
+            if name in data:
+                data[name] = [item.as_dict() for item in data[name]]
+        if 'habilidades' in data:
+            data['habilidades'] = list(data['habilidades'])
+        # La foto entra al digest como referencia blob:<digest>, venga en base64 o ya guardada
+        if 'profile_image' in data:
+            data['profile_image'] = data.pop('profile_image_key')
+        return data
+
+
+# Campos de texto simples del CV (None si faltan)
+TEXT_FIELDS = ('dni', 'fecha_nacimiento', 'edad', 'email', 'telefono', 'direccion', 'resumen')
+
+
+def _text(value, name):
+    """Texto del campo: los números se aceptan y se convierten; None se conserva."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise InvalidCV(f'El campo {name} debe ser texto')
+
+
+def _items(data, name):
+    items = data.get(name)
+    if items is None:
+        return ()
+    if not isinstance(items, list):
+        raise InvalidCV(f'El campo {name} debe ser una lista')
+    return items
+
+
+def _entry(item, name):
+    if not isinstance(item, dict):
+        raise InvalidCV(f'Cada elemento de {name} debe ser un objeto')
+    return item
+
+
+def compile_cv(data, default_profile):
+    """Valida y normaliza los datos del CV en un ``CV`` (InvalidCV si están mal formados).
+
+    ``default_profile`` es el perfil de salida cuando los datos no indican ``output_profile``.
+    """
+    if not isinstance(data, dict):
+        raise InvalidCV('Los datos del CV deben ser un objeto JSON')
+
+    nombre = _text(data.get('nombre'), 'nombre')
+    fields = {name: _text(data.get(name), name) for name in TEXT_FIELDS}
+
+    experiencia = []
+    for item in _items(data, 'experiencia'):
+        item = _entry(item, 'experiencia')
+        experiencia.append(Experience(
+            capitalize_text(_text(item.get('empresa'), 'empresa')),
+            capitalize_text(_text(item.get('cargo'), 'cargo')),
+            _text(item.get('periodo'), 'periodo'),
+            _text(item.get('descripcion'), 'descripcion'),
+        ))
+
+    educacion = []
+    for item in _items(data, 'educacion'):
+        item = _entry(item, 'educacion')
+        educacion.append(Education(
+            capitalize_text(_text(item.get('titulo'), 'titulo')),
+            capitalize_text(_text(item.get('institucion'), 'institucion')),
+            _text(item.get('año'), 'año'),
+        ))
+
+    habilidades = tuple(_text(item, 'habilidades') for item in _items(data, 'habilidades'))
+    if None in habilidades:
+        raise InvalidCV('El campo habilidades no admite valores nulos')
+
+    profile_image = data.get('profile_image')
+    if profile_image is not None and not isinstance(profile_image, str):
+        raise InvalidCV('El campo profile_image debe ser texto')
+    profile_image_key = None
+    if profile_image:
+        try:
+            profile_image_key = blob_ref(image_digest(profile_image))
+        except ValueError:
+            # Referencia inválida: no se encuentra al generar el PDF, pero el digest sigue siendo estable
+            profile_image_key = profile_image
+
+    template_type = data.get('template_type')
+    template_color = data.get('template_color')
+    if not isinstance(template_type, (str, type(None))) or not isinstance(template_color, (str, type(None))):
+        raise InvalidCV('La plantilla y el color deben ser texto')
+    template_type, template_color = template_registry.resolve(template_type, template_color)
+
+    try:
+        output_profile = get_profile(data.get('output_profile') or default_profile).name
+    except ValueError as e:
+        raise InvalidCV(str(e)) from None
+
+    return CV(
+        # Sin nombre se usa el valor por defecto de la plantilla
+        nombre=capitalize_text(nombre) if nombre is not None else None,
+        experiencia=tuple(experiencia),
+        educacion=tuple(educacion),
+        habilidades=habilidades,
+        profile_image=profile_image,
+        profile_image_key=profile_image_key,
+        template_type=template_type,
+        template_color=template_color,
+        output_profile=output_profile,
+        **fields,
+    )
@@ -0,0 +1,133 @@
+"""
+Plantillas de CV definidas como datos: paletas de colores y layout.
+
+Para agregar un color basta con sumarlo a la paleta de la plantilla; para
+agregar una plantilla, una entrada en ``TEMPLATES``. Los planes de render se
+compilan una sola vez al importar el módulo.
+"""
+
+from template_engine import TemplateRegistry, TemplateSpec, field, fmt, join, literal
+
+WHITE = (255, 255, 255)
+GRAY_TEXT = (68, 68, 68)  # #444444
+
+# Colores por rol: encabezado, texto y acento (títulos de sección y destacados)
+PALETTES = {
+    'basico': {
+        'default': {
+            'header': (100, 100, 100),  # Cambiado de #4a4a4a a un gris más claro
+            'text': (0, 0, 0),  # #000000
+            'accent': (74, 74, 74),  # #4a4a4a
+            'inverse': WHITE,
+        },
+    },
+    'profesional': {
+        'azul-marino': {'header': (26, 73, 113), 'text': GRAY_TEXT, 'accent': (26, 73, 113), 'inverse': WHITE},  # #1a4971
+        'amarillo-claro': {'header': (242, 201, 76), 'text': GRAY_TEXT, 'accent': (242, 201, 76), 'inverse': WHITE},  # #F2C94C
+        'rosado-pastel': {'header': (242, 166, 166), 'text': GRAY_TEXT, 'accent': (242, 166, 166), 'inverse': WHITE},  # #F2A6A6
+        'morado': {'header': (149, 91, 165), 'text': GRAY_TEXT, 'accent': (149, 91, 165), 'inverse': WHITE},  # #955BA5
+    },
+}
+
+
+def section_title(title):
+    """Título de sección con línea divisoria."""
+    return (
+        ('font', 'Arial', 'B', 16),
+        ('text_color', 'accent'),
+        ('cell', 0, 10, literal(title), True, 'L'),
+        ('rule', 10, 200),
+        ('ln', 5),
+    )
+
+
+CV_LAYOUT = (
+    # Encabezado con datos personales
+    ('fill_color', 'header'),
+    ('rect', 0, 0, 210, 50, 'F'),
+    ('option', 'photo', (
+        ('image', 'profile_image', 170, 5, 30, 30),
+    )),
+
+    # Nombre
+    ('font', 'Arial', 'B', 24),
+    ('text_color', 'inverse'),
+    ('xy', 10, 10),
+    ('cell', 160, 10, field('nombre', default='Sin Nombre'), True, 'L'),
+
+    # Información de contacto secundaria (uno debajo del otro)
+    ('font', 'Arial', '', 11),
+    ('xy', 10, 25),
+    ('if', 'dni', (('cell', 160, 5, fmt('DNI: {}', 'dni'), True, 'L'),)),
+    ('if', 'fecha_nacimiento', (('cell', 160, 5, fmt('Fecha de Nacimiento: {}', 'fecha_nacimiento'), True, 'L'),)),
+    ('if', 'edad', (('cell', 160, 5, fmt('Edad: {}', 'edad'), True, 'L'),)),
+
+    # Información de contacto primaria (en línea)
+    ('xy', 10, None),
+    ('cell', 160, 6, join(' | ', ('Email: {}', 'email'), ('Tel: {}', 'telefono'), ('Dirección: {}', 'direccion')), True, 'L'),
+    ('text_color', 'text'),
+    ('ln', 5),
+
+    # Resumen Profesional (si existe)
+    ('if', 'resumen', section_title('Resumen Profesional') + (
+        ('font', 'Arial', '', 11),
+        ('text_color', 'text'),
+        ('multi_cell', 0, 6, field('resumen')),
+        ('ln', 5),
+    )),
+
+    # Experiencia Laboral: empresa y periodo en la misma línea, cargo y descripción
+    *section_title('Experiencia Laboral'),
+    ('each', 'experiencia', (
+        ('font', 'Arial', 'B', 12),
+        ('text_color', 'accent'),
+        ('measured_cell', 5, 8, field('empresa'), 'L'),
+        ('font', 'Arial', '', 10),
+        ('text_color', 'text'),
+        ('cell', 0, 8, field('periodo'), True, 'R'),
+        ('font', 'Arial', 'I', 11),
+        ('text_color', 'text'),
+        ('cell', 0, 6, field('cargo'), True, 'L'),
+        ('if', 'descripcion', (
+            ('font', 'Arial', '', 10),
+            ('multi_cell', 0, 6, field('descripcion')),
+        )),
+        ('ln', 3),
+    )),
+
+    # Educación: título y año en la misma línea, institución debajo
+    ('ln', 2),
+    *section_title('Educación'),
+    ('each', 'educacion', (
+        ('font', 'Arial', 'B', 12),
+        ('text_color', 'accent'),
+        ('measured_cell', 5, 8, field('titulo'), 'L'),
+        ('font', 'Arial', '', 10),
+        ('text_color', 'text'),
+        ('cell', 0, 8, field('año'), True, 'R'),
+        ('font', 'Arial', 'I', 11),
+        ('text_color', 'text'),
+        ('cell', 0, 6, field('institucion'), True, 'L'),
+        ('ln', 3),
+    )),
+
+    # Habilidades
+    ('ln', 2),
+    *section_title('Habilidades'),
+    ('font', 'Arial', '', 11),
+    ('text_color', 'text'),
+    ('each', 'habilidades', (
+        ('cell', 0, 6, fmt('- {}', None), True, 'L'),
+    )),
+)
+
+TEMPLATES = {
+    'basico': TemplateSpec(layout=CV_LAYOUT, palettes=PALETTES['basico'], default_color='default', options=()),
+    'profesional': TemplateSpec(layout=CV_LAYOUT, palettes=PALETTES['profesional'], default_color='azul-marino',
+                                options=('photo',)),
+}
+
+DEFAULT_TEMPLATE = 'basico'
+
+# Planes de render compilados una sola vez al iniciar
+template_registry = TemplateRegistry(TEMPLATES, DEFAULT_TEMPLATE)
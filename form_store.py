@@ -0,0 +1,298 @@
+"""
+Almacenamiento de los datos de formulario guardados antes del pago.
+
+Reemplaza los archivos ``form_<uuid>.json`` por un almacén con expiración:
+
+- ``MemoryFormStore``: diccionario en memoria del proceso (desarrollo y pruebas).
+- ``SQLiteFormStore``: base SQLite en modo WAL, compartida entre procesos del
+  mismo host, con búsqueda indexada por ``form_id`` y actualizaciones
+  parciales atómicas.
+
+Ambos guardan el JSON en forma compacta y eliminan los registros vencidos con
+un hilo de limpieza en segundo plano.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def dumps_compact(data):
+    """Serializa a JSON compacto (sin espacios ni indentación)."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class FormStore:
+    """Interfaz común de los almacenes de formularios."""
+
+    def __init__(self, ttl=48 * 3600, sweep_interval=600, legacy_dir=None):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # Carpeta con archivos form_<uuid>.json de versiones anteriores
+        self.legacy_dir = legacy_dir
+        # Tareas adicionales que se ejecutan en cada limpieza (p. ej. blobs huérfanos)
+        self.sweep_hooks = []
+        self._sweeper = None
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    # --- Operaciones a implementar por cada backend ---
+
+    def _get(self, form_id):
+        raise NotImplementedError
+
+    def _put(self, form_id, data, expires_at):
+        raise NotImplementedError
+
+    def _update(self, form_id, fields):
+        raise NotImplementedError
+
+    def _pop(self, form_id):
+        raise NotImplementedError
+
+    def _delete(self, form_id):
+        raise NotImplementedError
+
+    def sweep(self):
+        """Elimina los registros vencidos y devuelve cuántos se eliminaron."""
+        raise NotImplementedError
+
+    # --- API pública ---
+
+    def get(self, form_id):
+        """Devuelve los datos del formulario o None si no existe o venció."""
+        self._ensure_sweeper()
+        data = self._get(form_id)
+        if data is None:
+            data = self._import_legacy(form_id)
+        return data
+
+    def put(self, form_id, data):
+        self._ensure_sweeper()
+        self._put(form_id, data, time.time() + self.ttl)
+
+    def update(self, form_id, fields):
+        """Actualiza atómicamente algunos campos; devuelve los datos resultantes o None si no existe."""
+        self._ensure_sweeper()
+        data = self._update(form_id, fields)
+        if data is None and self._import_legacy(form_id) is not None:
+            data = self._update(form_id, fields)
+        return data
+
+    def pop(self, form_id):
+        """Obtiene y elimina el formulario en una sola operación."""
+        self._ensure_sweeper()
+        data = self._pop(form_id)
+        if data is None and self._import_legacy(form_id) is not None:
+            data = self._pop(form_id)
+        return data
+
+    def delete(self, form_id):
+        self._delete(form_id)
+
+    def close(self):
+        pass
+
+    # --- Compatibilidad con archivos form_<uuid>.json ---
+
+    def _import_legacy(self, form_id):
+        if not self.legacy_dir:
+            return None
+        path = os.path.join(self.legacy_dir, f'form_{form_id}.json')
+        # El form_id forma parte de la ruta: no aceptar separadores
+        if os.path.basename(path) != f'form_{form_id}.json' or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._put(form_id, data, time.time() + self.ttl)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return data
+
+    # --- Limpieza en segundo plano ---
+
+    def _ensure_sweeper(self):
+        if not self.sweep_interval:
+            return
+        # Los hilos no sobreviven a un fork: cada proceso arranca el suyo
+        if self._sweeper is not None and self._sweeper_pid == os.getpid() and self._sweeper.is_alive():
+            return
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper_pid == os.getpid() and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='form-store-sweeper', daemon=True)
+            self._sweeper_pid = os.getpid()
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            for task in [self.sweep] + self.sweep_hooks:
+                try:
+                    task()
+                except Exception:
+                    pass
+
+
+class MemoryFormStore(FormStore):
+    """Almacén en memoria del proceso con expiración por TTL."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _get(self, form_id):
+        with self._lock:
+            record = self._records.get(form_id)
+            if record is None:
+                return None
+            payload, expires_at = record
+            if expires_at <= time.time():
+                del self._records[form_id]
+                return None
+        return json.loads(payload)
+
+    def _put(self, form_id, data, expires_at):
+        payload = dumps_compact(data)
+        with self._lock:
+            self._records[form_id] = (payload, expires_at)
+
+    def _update(self, form_id, fields):
+        with self._lock:
+            record = self._records.get(form_id)
+            if record is None:
+                return None
+            data = json.loads(record[0])
+            data.update(fields)
+            self._records[form_id] = (dumps_compact(data), record[1])
+        return data
+
+    def _pop(self, form_id):
+        with self._lock:
+            record = self._records.pop(form_id, None)
+        if record is None or record[1] <= time.time():
+            return None
+        return json.loads(record[0])
+
+    def _delete(self, form_id):
+        with self._lock:
+            self._records.pop(form_id, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [form_id for form_id, (_, expires_at) in self._records.items() if expires_at <= now]
+            for form_id in expired:
+                del self._records[form_id]
+        return len(expired)
+
+
+class SQLiteFormStore(FormStore):
+    """Almacén SQLite (WAL) compartido entre procesos, con una conexión por hilo."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS forms ('
+        ' form_id TEXT PRIMARY KEY,'
+        ' data TEXT NOT NULL,'
+        ' expires_at REAL NOT NULL'
+        ') WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS forms_expires_at ON forms (expires_at)',
+    )
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, form_id):
+        row = self._connect().execute(
+            'SELECT data FROM forms WHERE form_id = ? AND expires_at > ?', (form_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, form_id, data, expires_at):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO forms (form_id, data, expires_at) VALUES (?, ?, ?)',
+            (form_id, dumps_compact(data), expires_at)
+        )
+
+    def _update(self, form_id, fields):
+        conn = self._connect()
+        # BEGIN IMMEDIATE toma el lock de escritura antes de leer: sin carreras entre procesos
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT data FROM forms WHERE form_id = ? AND expires_at > ?', (form_id, time.time())
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            data = json.loads(row[0])
+            data.update(fields)
+            conn.execute('UPDATE forms SET data = ? WHERE form_id = ?', (dumps_compact(data), form_id))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return data
+
+    def _pop(self, form_id):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT data FROM forms WHERE form_id = ? AND expires_at > ?', (form_id, time.time())
+            ).fetchone()
+            conn.execute('DELETE FROM forms WHERE form_id = ?', (form_id,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return json.loads(row[0]) if row else None
+
+    def _delete(self, form_id):
+        self._connect().execute('DELETE FROM forms WHERE form_id = ?', (form_id,))
+
+    def sweep(self):
+        cursor = self._connect().execute('DELETE FROM forms WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_form_store(backend, path=None, **kwargs):
+    """Crea el almacén de formularios configurado (``sqlite`` o ``memory``)."""
+    if backend == 'memory':
+        return MemoryFormStore(**kwargs)
+    if backend == 'sqlite':
+        return SQLiteFormStore(path, **kwargs)
+    raise ValueError(f'Backend de formularios desconocido: {backend}')
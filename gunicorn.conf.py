@@ -0,0 +1,15 @@
+"""
+Configuración de gunicorn (se carga sola al ejecutar ``gunicorn app:app`` desde esta carpeta).
+
+Los workers atienden las peticiones con hilos (``gthread``): un resumen en
+streaming de ``/generar_resumen_ia/stream`` ocupa un hilo mientras dura la
+generación y no el worker entero, así que un OpenRouter lento no deja sin
+atender al resto de las rutas. La cantidad de workers sigue saliendo de
+``WEB_CONCURRENCY`` (o de ``--workers``).
+"""
+
+import os
+
+worker_class = 'gthread'
+# Peticiones simultáneas por worker (incluidos los streams de resúmenes abiertos)
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
@@ -0,0 +1,247 @@
+"""
+Procesamiento de la foto de perfil para incrustarla en el PDF.
+"""
+
+import base64
+import hashlib
+import importlib.util
+import io
+from collections import namedtuple
+
+from blob_store import blob_ref, is_blob_ref, ref_digest
+from cache import LRUCache
+from metrics import STAGE_SECONDS
+
+# PIL se importa recién al procesar la primera foto, no en el arranque
+HAS_PIL = importlib.util.find_spec('PIL') is not None
+
+# Tamaño máximo (en píxeles) de la foto incrustada en el PDF cuando no se indica el recuadro
+MAX_IMAGE_SIZE = (300, 300)
+JPEG_QUALITY = 95
+
+# Resolución con que se prepara la foto para el tamaño que ocupa en el PDF
+# (254 ppp son 300 px en el recuadro de 30 mm de la plantilla profesional)
+DEFAULT_IMAGE_DPI = 254
+
+# Máximo de píxeles de la foto original: por encima se rechaza sin decodificarla
+MAX_IMAGE_PIXELS = 64 * 1000 * 1000
+
+# Firmas de los formatos de foto aceptados en la subida binaria
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+# Imagen lista para incrustar: bytes JPEG y sus dimensiones
+ProcessedImage = namedtuple('ProcessedImage', ['jpeg_bytes', 'width', 'height'])
+
+
+class ImageTooLarge(ValueError):
+    """La imagen tiene más píxeles que el máximo permitido."""
+
+
+class InvalidImage(ValueError):
+    """El archivo no es una imagen que Pillow pueda leer."""
+
+
+def target_size(box_mm, dpi=DEFAULT_IMAGE_DPI):
+    """Píxeles necesarios para mostrar la foto en un recuadro de ``box_mm`` (ancho, alto en mm) a ``dpi``."""
+    return tuple(max(1, round(mm / 25.4 * dpi)) for mm in box_mm)
+
+
+def image_digest(image_data):
+    """Digest SHA-256 de los bytes de la foto (base64 o referencia ``blob:<digest>``).
+
+    Es el mismo digest con el que se guardaría en el almacén de blobs, pero se
+    calcula en memoria. Un base64 inválido se identifica por el texto recibido.
+    """
+    if is_blob_ref(image_data):
+        return ref_digest(image_data)
+    try:
+        data = decode_image_payload(image_data)
+    except ValueError:
+        data = image_data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def decode_image_payload(image_data):
+    """Decodifica una imagen en base64 (con o sin prefijo ``data:image/...;base64,``)."""
+    # Quitar el prefijo "data:image/...;base64," si existe
+    if ',' in image_data:
+        image_data = image_data.split(',')[1]
+    return base64.b64decode(image_data)
+
+
+def sniff_image_type(head):
+    """Tipo MIME de la imagen según sus primeros bytes, o None si no es un formato aceptado."""
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def check_image_pixels(fileobj, max_pixels=MAX_IMAGE_PIXELS):
+    """Lee solo el encabezado de la imagen y lanza ``ImageTooLarge`` si supera ``max_pixels``.
+
+    Lanza ``InvalidImage`` si el archivo no es una imagen legible.
+    """
+    if not HAS_PIL:
+        return None
+    try:
+        img = _open_image(fileobj)
+    except (OSError, SyntaxError) as e:
+        raise InvalidImage(str(e)) from None
+    with img:
+        _check_pixels(img, max_pixels)
+        return img.size
+
+
+def _open_image(fileobj):
+    """``Image.open``, con las "bombas de descompresión" de Pillow como ``ImageTooLarge``."""
+    from PIL import Image
+    try:
+        return Image.open(fileobj)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from None
+
+
+def _check_pixels(img, max_pixels):
+    if img.width * img.height > max_pixels:
+        raise ImageTooLarge(f'La imagen tiene {img.width}x{img.height} píxeles (máximo {max_pixels})')
+
+
+def store_profile_image(blob_store, image_data):
+    """Guarda la imagen en el almacén de blobs y devuelve su referencia ``blob:<digest>``."""
+    if is_blob_ref(image_data):
+        return image_data
+    return blob_ref(blob_store.put(decode_image_payload(image_data)))
+
+
+def process_profile_image(image, max_size=MAX_IMAGE_SIZE, max_pixels=MAX_IMAGE_PIXELS, quality=JPEG_QUALITY):
+    """Lleva la imagen (bytes o base64) a ``max_size`` como máximo y la devuelve como JPEG de calidad ``quality``.
+
+    Los JPEG se decodifican directamente a escala reducida (``draft``) y uno
+    que ya entra en ``max_size`` se incrusta sin recodificarlo, quitándole solo
+    los metadatos.
+    """
+    if not HAS_PIL:
+        raise RuntimeError('Pillow no está instalado')
+
+    if isinstance(image, bytes):
+        image_bytes = image
+    else:
+        with STAGE_SECONDS.time(stage='base64_decode'):
+            image_bytes = decode_image_payload(image)
+    with STAGE_SECONDS.time(stage='image_process'):
+        # Image.open solo lee el encabezado: el tamaño se valida antes de decodificar
+        img = _open_image(io.BytesIO(image_bytes))
+        _check_pixels(img, max_pixels)
+        if _embeddable_as_is(img, max_size):
+            # Sin recodificar, pero sin los metadatos del archivo original (EXIF con GPS, etc.)
+            return ProcessedImage(strip_jpeg_metadata(image_bytes), img.width, img.height)
+        # En JPEG decodifica a 1/2, 1/4 o 1/8 de la escala, lo más cerca posible de max_size
+        img.draft(None, max_size)
+        return _resize_to_jpeg(img, max_size, quality)
+
+
+# Segmentos de metadatos que no se copian al PDF: APP1-APP13 y APP15 (EXIF con GPS y datos del
+# dispositivo, XMP, ICC, etc.) y comentarios. Se conservan JFIF (APP0) y Adobe (APP14), que
+# indican cómo decodificar los colores.
+_JPEG_METADATA_MARKERS = frozenset(range(0xE1, 0xEE)) | {0xEF, 0xFE}
+
+
+def strip_jpeg_metadata(data):
+    """Quita de un JPEG los segmentos de metadatos (EXIF, XMP, comentarios) sin tocar los datos de la imagen."""
+    if data[:2] != b'\xff\xd8':
+        raise ValueError('Imagen JPEG inválida')
+    parts = [data[:2]]
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError('Imagen JPEG inválida: marcador esperado')
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Bytes de relleno entre marcadores
+            pos += 1
+            continue
+        if marker == 0xDA:
+            # Desde el inicio del scan el resto son datos de la imagen
+            break
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            parts.append(data[pos:pos + 2])
+            pos += 2
+            continue
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker not in _JPEG_METADATA_MARKERS:
+            parts.append(data[pos:end])
+        pos = end
+    parts.append(data[pos:])
+    return b''.join(parts)
+
+
+def _embeddable_as_is(img, max_size):
+    """Indica si el archivo original ya es un JPEG que el PDF puede incrustar sin cambios."""
+    return (img.format == 'JPEG' and img.mode in ('RGB', 'L') and not img.info.get('progressive')
+            and img.width <= max_size[0] and img.height <= max_size[1])
+
+
+def _resize_to_jpeg(img, max_size=MAX_IMAGE_SIZE, quality=JPEG_QUALITY):
+    from PIL import Image
+
+    # Redimensionar la imagen si es necesario
+    if img.width > max_size[0] or img.height > max_size[1]:
+        img.thumbnail(max_size, Image.LANCZOS)
+
+    # Convertir a RGB si tiene transparencia (modo RGBA)
+    if img.mode == 'RGBA':
+        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+        rgb_img.paste(img, mask=img.split()[3])  # Usar el canal alfa como máscara
+        img = rgb_img
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    buffer = io.BytesIO()
+    # optimize calcula tablas de Huffman propias: el archivo es más chico sin perder calidad
+    img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return ProcessedImage(buffer.getvalue(), img.width, img.height)
+
+
+class ProfileImageCache:
+    """Caché de fotos ya procesadas, indexada por el digest de la imagen original, el tamaño y la calidad.
+
+    Acepta imágenes en base64 o referencias ``blob:<digest>``; en el segundo caso
+    el blob solo se lee del almacén si la foto no está en caché. Con ``box_mm``
+    la foto se prepara para ese recuadro a ``dpi`` (o a la resolución configurada).
+    """
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024, blob_store=None,
+                 dpi=DEFAULT_IMAGE_DPI, max_pixels=MAX_IMAGE_PIXELS):
+        self.blob_store = blob_store
+        self.dpi = dpi
+        self.max_pixels = max_pixels
+        self.cache = LRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            sizeof=lambda processed: len(processed.jpeg_bytes)
+        )
+
+    def get_or_process(self, image_data, box_mm=None, dpi=None, quality=JPEG_QUALITY):
+        """Devuelve (imagen procesada, clave, acierto de caché) sin tocar PIL si ya estaba en caché."""
+        digest = image_digest(image_data)
+        max_size = target_size(box_mm, dpi or self.dpi) if box_mm else MAX_IMAGE_SIZE
+        key = f'{digest}-{max_size[0]}x{max_size[1]}-q{quality}'
+        processed = self.cache.get(key)
+        if processed is not None:
+            return processed, key, True
+        if is_blob_ref(image_data):
+            image_data = self.blob_store.get(digest) if self.blob_store else None
+            if image_data is None:
+                raise ValueError(f'No se encontró la imagen {digest}')
+        processed = process_profile_image(image_data, max_size, self.max_pixels, quality)
+        self.cache.put(key, processed)
+        return processed, key, False
@@ -0,0 +1,254 @@
+"""
+Métricas de la aplicación en formato Prometheus.
+
+Cada proceso (workers de gunicorn y procesos de render) acumula sus contadores
+e histogramas en memoria y los vuelca periódicamente a un archivo propio en
+``directory``. ``/metrics`` suma los archivos de todos los procesos, de modo
+que el resultado es el mismo sin importar qué worker atienda la petición.
+El directorio debe vaciarse al desplegar, igual que con el modo multiproceso
+de ``prometheus_client``.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Límites para tamaños de archivo (bytes)
+BYTES_BUCKETS = (2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000, 2000000)
+
+
+def _label_key(labelnames, labels):
+    return json.dumps([str(labels.get(name, '')) for name in labelnames], ensure_ascii=False)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, json.loads(key))) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self.registry.ensure_process()
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+            self.registry._dirty = True
+
+
+class Histogram:
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Por combinación de etiquetas: [conteos por bucket (no acumulados) + inf, suma, cantidad]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        self.registry.ensure_process()
+        with self.registry.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+            self.registry._dirty = True
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    """Conjunto de métricas de un proceso, con volcado a archivo para combinar procesos."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = 5.0
+        self._pid = None
+        self._file_id = None
+        self._dirty = False
+
+    def configure(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+            # Reinicia el estado del proceso para abrir su archivo y arrancar el hilo de volcado
+            self._pid = None
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.metrics.setdefault(name, Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(self, name, documentation, labelnames, buckets))
+
+    # --- Volcado por proceso ---
+
+    def _path(self):
+        return os.path.join(self.directory, f'{self._file_id}.json')
+
+    def ensure_process(self):
+        """Prepara el proceso actual antes de registrar un valor (tras un fork empieza de cero)."""
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            # Los valores heredados del proceso padre ya están en el archivo del padre
+            if self._pid is not None:
+                for metric in self.metrics.values():
+                    metric.values.clear()
+            self._pid = os.getpid()
+            # Un archivo por proceso; el sufijo evita pisar datos si se reutiliza un pid
+            self._file_id = f'{self._pid}-{uuid.uuid4().hex[:8]}'
+            if self.directory:
+                # Los hilos no sobreviven a un fork: cada proceso arranca su hilo de volcado
+                threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not self._dirty:
+                continue
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def snapshot(self):
+        with self.lock:
+            self._dirty = False
+            return {name: json.loads(json.dumps(metric.values)) for name, metric in self.metrics.items()}
+
+    def flush(self):
+        """Escribe los valores del proceso en su archivo (escritura atómica)."""
+        if not self.directory or self._pid != os.getpid():
+            return
+        path = self._path()
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    # --- Exposición ---
+
+    def collect(self):
+        """Valores combinados de todos los procesos (o solo del actual sin directorio)."""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric_name, values in snapshot.items():
+                target = merged.setdefault(metric_name, {})
+                for key, value in values.items():
+                    current = target.get(key)
+                    if current is None:
+                        target[key] = value
+                    elif isinstance(value, list):
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                    else:
+                        target[key] = current + value
+        return merged
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        values = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in sorted(values.get(name, {}).items()):
+                if kind == 'counter':
+                    lines.append(f'{name}{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(metric.labelnames, key, [('le', _format_value(bound))])
+                    lines.append(f'{name}_bucket{labels} {cumulative}')
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f'{name}_sum{labels} {_format_value(float(total))}')
+                lines.append(f'{name}_count{labels} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'cv_stage_seconds', 'Duración de cada etapa de la generación del CV', ('stage',))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'cv_http_request_seconds', 'Duración de las peticiones HTTP por ruta', ('route', 'method'))
+HTTP_REQUESTS = registry.counter(
+    'cv_http_requests_total', 'Peticiones HTTP por ruta y estado', ('route', 'method', 'status'))
+RENDERS = registry.counter(
+    'cv_renders_total', 'PDFs generados por plantilla y color', ('template_type', 'template_color'))
+PDF_CACHE = registry.counter(
+    'cv_pdf_cache_total', 'Resultado de la búsqueda del PDF en caché', ('result',))
+IMAGE_CACHE = registry.counter(
+    'cv_image_cache_total', 'Resultado de la búsqueda de la foto procesada en caché', ('result',))
+PREVIEW_CACHE = registry.counter(
+    'cv_preview_cache_total', 'Resultado de la búsqueda de la vista previa en caché', ('result',))
+SUMMARY_CACHE = registry.counter(
+    'cv_summary_cache_total', 'Resultado de la búsqueda del resumen de IA en caché', ('result',))
+ERRORS = registry.counter(
+    'cv_errors_total', 'Errores por etapa', ('stage',))
+PDF_BYTES = registry.histogram(
+    'cv_pdf_bytes', 'Tamaño de los PDFs entregados por perfil de salida', ('output_profile',), BYTES_BUCKETS)
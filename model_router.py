@@ -0,0 +1,275 @@
+"""
+Selección de modelo para los resúmenes con IA.
+
+Los modelos se prueban en el orden configurado, con un límite de peticiones
+simultáneas por modelo y estadísticas móviles de latencia y errores. Cada
+petición tiene un plazo total: un modelo cuya latencia reciente no entra en el
+tiempo restante, saturado o limitado por la API se salta y se pasa al
+siguiente. Si se agota el plazo sin respuesta se lanza ``SummaryUnavailable``
+y la ruta devuelve el resumen genérico.
+
+El plazo se controla con el reloj y no solo con los timeouts de httpx (que
+valen por cada lectura): cada intento corre en un hilo aparte y, si no termina
+a tiempo, se abandona. Las estadísticas vencen con el tiempo, así que un modelo
+que se saltó por lento se vuelve a probar más adelante.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from ai_client import AIConfigurationError, generate_summary, is_rate_limited, stream_summary
+
+
+class SummaryUnavailable(Exception):
+    """Ningún modelo pudo generar el resumen dentro del plazo."""
+
+
+class AttemptTimeout(Exception):
+    """El intento con un modelo no terminó dentro de su tiempo (medido con el reloj)."""
+
+
+class ModelStats:
+    """Latencias y errores de las últimas ``window`` llamadas a un modelo, de hasta ``max_age`` segundos."""
+
+    def __init__(self, window=20, max_age=300.0):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.max_age = max_age
+        self.blocked_until = 0.0
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._samples.append((time.time(), latency, ok))
+
+    def _recent(self):
+        # Sin muestras nuevas las viejas vencen: un modelo salteado por lento vuelve a probarse
+        limit = time.time() - self.max_age
+        with self._lock:
+            return [(latency, ok) for recorded_at, latency, ok in self._samples if recorded_at > limit]
+
+    def expected_latency(self, min_samples=3, quantile=0.9):
+        """Latencia (percentil ``quantile``) de las llamadas exitosas recientes, o None sin datos suficientes."""
+        latencies = sorted(latency for latency, ok in self._recent() if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+    def error_rate(self):
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        return sum(1 for _, ok in samples if not ok) / len(samples)
+
+    def snapshot(self):
+        samples = self._recent()
+        return {
+            'calls': len(samples),
+            'errors': sum(1 for _, ok in samples if not ok),
+            'p90_latency': self.expected_latency(),
+            'blocked_until': self.blocked_until,
+        }
+
+
+class ModelRoute:
+    """Un modelo con su límite de concurrencia y sus estadísticas."""
+
+    def __init__(self, name, max_concurrency=8, window=20, max_age=300.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.stats = ModelStats(window, max_age)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def try_acquire(self):
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        self._slots.release()
+
+
+def parse_models(value, default_concurrency=8):
+    """Interpreta ``modelo[=concurrencia],modelo[=concurrencia],...``."""
+    models = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, limit = item.partition('=')
+        models.append((name.strip(), int(limit) if limit.strip() else default_concurrency))
+    return models
+
+
+class ModelRouter:
+    """Genera resúmenes probando los modelos en orden dentro de un plazo por petición."""
+
+    def __init__(self, models, deadline=20.0, attempt_timeout=None, cooldown=30.0,
+                 max_error_rate=0.5, window=20, stats_max_age=300.0):
+        if not models:
+            raise ValueError('Se necesita al menos un modelo')
+        self.routes = [ModelRoute(name, limit, window, stats_max_age) for name, limit in models]
+        self.deadline = deadline
+        # Tiempo máximo de cada intento, para dejar margen a los modelos siguientes (None: el resto del plazo)
+        self.attempt_timeout = attempt_timeout
+        # Pausa de un modelo tras un error 429 si la API no indica otra (0 desactiva la pausa)
+        self.cooldown = cooldown
+        self.max_error_rate = max_error_rate
+
+    def _candidates(self, remaining):
+        """Modelos utilizables con el tiempo restante; los que fallan mucho van al final."""
+        now = time.time()
+        healthy, degraded = [], []
+        for route in self.routes:
+            if route.stats.blocked_until > now:
+                continue
+            expected = route.stats.expected_latency()
+            if expected is not None and expected > remaining:
+                continue
+            if route.stats.error_rate() > self.max_error_rate:
+                degraded.append(route)
+            else:
+                healthy.append(route)
+        return healthy + degraded
+
+    def _record_error(self, route, error, latency):
+        route.stats.record(latency, False)
+        if is_rate_limited(error) and self.cooldown:
+            retry_after = error.response.headers.get('retry-after') if error.response is not None else None
+            try:
+                pause = float(retry_after) if retry_after else self.cooldown
+            except ValueError:
+                pause = self.cooldown
+            route.stats.blocked_until = time.time() + pause
+
+    def _attempts(self, deadline_at):
+        """Recorre los modelos disponibles con la hora límite de cada intento, reservando su lugar.
+
+        El lugar lo libera el hilo del intento al terminar, aunque el intento se haya abandonado.
+        """
+        tried = set()
+        while True:
+            now = time.time()
+            remaining = deadline_at - now
+            if remaining <= 0:
+                return
+            route = next((r for r in self._candidates(remaining) if r.name not in tried and r.try_acquire()), None)
+            if route is None:
+                return
+            tried.add(route.name)
+            limit_at = deadline_at if self.attempt_timeout is None else min(deadline_at, now + self.attempt_timeout)
+            yield route, limit_at
+
+    def _generate_attempt(self, route, prompt, limit_at):
+        """Llama al modelo en otro hilo y espera hasta ``limit_at``; AttemptTimeout si no respondió."""
+        future = Future()
+
+        def call():
+            try:
+                future.set_result(generate_summary(prompt, model=route.name, timeout=max(0.001, limit_at - time.time())))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                route.release()
+
+        threading.Thread(target=call, name=f'resumen-{route.name}', daemon=True).start()
+        try:
+            return future.result(timeout=max(0.0, limit_at - time.time()))
+        except FuturesTimeoutError:
+            raise AttemptTimeout(f'{route.name} no respondió a tiempo') from None
+
+    def _stream_attempt(self, route, prompt, limit_at, deadline_at):
+        """Fragmentos del modelo leídos en otro hilo; AttemptTimeout si el siguiente no llega a tiempo.
+
+        Hasta el primer fragmento rige ``limit_at``; después, el plazo de la petición.
+        """
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                stream = stream_summary(prompt, model=route.name, timeout=max(0.001, limit_at - time.time()))
+                try:
+                    for delta in stream:
+                        if stop.is_set():
+                            return
+                        chunks.put((True, delta))
+                finally:
+                    stream.close()
+                chunks.put((False, None))
+            except Exception as e:
+                chunks.put((False, e))
+            finally:
+                route.release()
+
+        threading.Thread(target=produce, name=f'resumen-{route.name}', daemon=True).start()
+        try:
+            while True:
+                try:
+                    more, value = chunks.get(timeout=max(0.0, limit_at - time.time()))
+                except queue.Empty:
+                    raise AttemptTimeout(f'{route.name} no respondió a tiempo') from None
+                if not more:
+                    if value is not None:
+                        raise value
+                    return
+                limit_at = deadline_at
+                yield value
+        finally:
+            # El hilo deja de leer con el siguiente fragmento que llegue
+            stop.set()
+
+    def generate(self, prompt, deadline=None):
+        """Devuelve el resumen del primer modelo que responda a tiempo."""
+        deadline_at = time.time() + (deadline or self.deadline)
+        last_error = None
+        attempts = self._attempts(deadline_at)
+        try:
+            for route, limit_at in attempts:
+                started = time.time()
+                try:
+                    summary = self._generate_attempt(route, prompt, limit_at)
+                except AIConfigurationError:
+                    raise
+                except Exception as e:
+                    self._record_error(route, e, time.time() - started)
+                    last_error = e
+                    continue
+                route.stats.record(time.time() - started, True)
+                if summary:
+                    return summary
+        finally:
+            attempts.close()
+        raise SummaryUnavailable(f'Ningún modelo respondió dentro del plazo: {last_error}')
+
+    def stream(self, prompt, deadline=None):
+        """Como ``generate`` pero en streaming; solo se cambia de modelo antes del primer fragmento."""
+        deadline_at = time.time() + (deadline or self.deadline)
+        last_error = None
+        attempts = self._attempts(deadline_at)
+        try:
+            for route, limit_at in attempts:
+                started = time.time()
+                sent = False
+                try:
+                    for delta in self._stream_attempt(route, prompt, limit_at, deadline_at):
+                        sent = True
+                        yield delta
+                except AIConfigurationError:
+                    raise
+                except Exception as e:
+                    self._record_error(route, e, time.time() - started)
+                    last_error = e
+                    if sent:
+                        raise
+                    continue
+                route.stats.record(time.time() - started, True)
+                if sent:
+                    return
+        finally:
+            attempts.close()
+        raise SummaryUnavailable(f'Ningún modelo respondió dentro del plazo: {last_error}')
+
+    def snapshot(self):
+        return {route.name: route.stats.snapshot() for route in self.routes}
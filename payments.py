@@ -0,0 +1,250 @@
+"""
+Estado de los pagos de MercadoPago y cliente HTTP del SDK.
+
+``/webhook`` guarda cada pago notificado en un almacén local indexado por
+``payment_id`` y por ``external_reference`` (el ``form_id``), de modo que
+``/success`` y las descargas lo consultan sin esperar a la API de
+MercadoPago; solo se llama a la API cuando el pago todavía no está guardado.
+
+El SDK de MercadoPago abre una sesión HTTP nueva (con su handshake TLS) en
+cada llamada; ``KeepAliveHttpClient`` reutiliza una sesión por hilo.
+``mercadopago`` y ``requests`` se importan recién en la primera llamada a la
+API (``LazyMPSDK``), no en cada arranque en frío.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from form_store import dumps_compact
+
+MP_API_URL = 'https://api.mercadopago.com'
+
+# Campos del pago que se guardan localmente
+PAYMENT_FIELDS = (
+    'id', 'status', 'status_detail', 'external_reference', 'transaction_amount',
+    'currency_id', 'date_created', 'date_approved', 'date_last_updated',
+)
+
+
+class KeepAliveHttpClient:
+    """Cliente HTTP del SDK que mantiene abiertas las conexiones entre llamadas.
+
+    Reemplaza ``request`` de ``mercadopago.http.HttpClient``; ``create_mp_sdk``
+    combina ambas clases al crear el SDK, para no importar ``mercadopago`` antes.
+    """
+
+    def __init__(self, base_url=None, pool_size=10):
+        # Permite apuntar el SDK a otro servidor (p. ej. uno falso en pruebas de carga)
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    def _session(self, maxretries):
+        sessions = getattr(self._local, 'sessions', None)
+        # Las conexiones abiertas no se comparten entre procesos (fork de gunicorn)
+        if sessions is None or self._local.pid != os.getpid():
+            sessions = self._local.sessions = {}
+            self._local.pid = os.getpid()
+        session = sessions.get(maxretries)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util import Retry
+            adapter = HTTPAdapter(
+                max_retries=Retry(total=maxretries, status_forcelist=[429, 500, 502, 503, 504]),
+                pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            sessions[maxretries] = session
+        return session
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if self.base_url and url.startswith(MP_API_URL):
+            url = self.base_url + url[len(MP_API_URL):]
+        api_result = self._session(maxretries).request(method, url, **kwargs)
+        return {
+            'status': api_result.status_code,
+            'response': api_result.json()
+        }
+
+
+def create_mp_sdk(access_token, timeout=10.0, max_retries=2, base_url=None):
+    """Crea el SDK de MercadoPago con conexiones reutilizables y un timeout explícito."""
+    import mercadopago
+    from mercadopago.config import RequestOptions
+    from mercadopago.http import HttpClient
+    # El SDK exige una subclase de su HttpClient
+    http_client_class = type('KeepAliveHttpClient', (KeepAliveHttpClient, HttpClient), {})
+    return mercadopago.SDK(
+        access_token,
+        http_client=http_client_class(base_url=base_url),
+        request_options=RequestOptions(connection_timeout=timeout, max_retries=max_retries)
+    )
+
+
+class LazyMPSDK:
+    """SDK de MercadoPago que se crea en la primera llamada a la API (con ``create_mp_sdk``)."""
+
+    def __init__(self, access_token, **options):
+        self.access_token = access_token
+        self.options = options
+        self._sdk = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._sdk is None:
+            with self._lock:
+                if self._sdk is None:
+                    self._sdk = create_mp_sdk(self.access_token, **self.options)
+        return self._sdk
+
+    def preference(self):
+        return self.get().preference()
+
+    def payment(self):
+        return self.get().payment()
+
+
+def payment_summary(payment):
+    """Reduce la respuesta de la API a los campos que se guardan localmente."""
+    return {field: payment.get(field) for field in PAYMENT_FIELDS if field in payment}
+
+
+class PaymentStore:
+    """Interfaz común de los almacenes de pagos."""
+
+    def __init__(self, ttl=7 * 24 * 3600):
+        self.ttl = ttl
+
+    def get(self, payment_id):
+        """Devuelve el pago guardado o None."""
+        raise NotImplementedError
+
+    def get_by_reference(self, external_reference, status=None):
+        """Devuelve el último pago de una referencia externa (opcionalmente con un estado dado)."""
+        raise NotImplementedError
+
+    def put(self, payment):
+        """Guarda (o actualiza) un pago tal como lo devuelve la API de MercadoPago."""
+        raise NotImplementedError
+
+    def sweep(self):
+        raise NotImplementedError
+
+
+class MemoryPaymentStore(PaymentStore):
+    """Almacén de pagos en memoria del proceso."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._payments = {}
+        self._lock = threading.Lock()
+
+    def get(self, payment_id):
+        with self._lock:
+            record = self._payments.get(str(payment_id))
+        return dict(record[0]) if record else None
+
+    def get_by_reference(self, external_reference, status=None):
+        with self._lock:
+            records = [
+                record for record in self._payments.values()
+                if record[0].get('external_reference') == external_reference
+                and (status is None or record[0].get('status') == status)
+            ]
+        if not records:
+            return None
+        return dict(max(records, key=lambda record: record[1])[0])
+
+    def put(self, payment):
+        summary = payment_summary(payment)
+        with self._lock:
+            self._payments[str(summary['id'])] = (summary, time.time())
+
+    def sweep(self):
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [payment_id for payment_id, (_, updated_at) in self._payments.items() if updated_at < limit]
+            for payment_id in expired:
+                del self._payments[payment_id]
+        return len(expired)
+
+
+class SQLitePaymentStore(PaymentStore):
+    """Almacén de pagos SQLite (WAL) compartido entre procesos, con una conexión por hilo."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS payments ('
+        ' payment_id TEXT PRIMARY KEY,'
+        ' external_reference TEXT,'
+        ' status TEXT,'
+        ' data TEXT NOT NULL,'
+        ' updated_at REAL NOT NULL'
+        ') WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS payments_external_reference ON payments (external_reference, updated_at)',
+        'CREATE INDEX IF NOT EXISTS payments_updated_at ON payments (updated_at)',
+    )
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, payment_id):
+        row = self._connect().execute(
+            'SELECT data FROM payments WHERE payment_id = ?', (str(payment_id),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_by_reference(self, external_reference, status=None):
+        query = 'SELECT data FROM payments WHERE external_reference = ?'
+        params = [external_reference]
+        if status is not None:
+            query += ' AND status = ?'
+            params.append(status)
+        row = self._connect().execute(query + ' ORDER BY updated_at DESC LIMIT 1', params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, payment):
+        summary = payment_summary(payment)
+        self._connect().execute(
+            'INSERT OR REPLACE INTO payments (payment_id, external_reference, status, data, updated_at)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            (str(summary['id']), summary.get('external_reference'), summary.get('status'),
+             dumps_compact(summary), time.time())
+        )
+
+    def sweep(self):
+        cursor = self._connect().execute('DELETE FROM payments WHERE updated_at < ?', (time.time() - self.ttl,))
+        return cursor.rowcount
+
+
+def create_payment_store(backend, path=None, **kwargs):
+    """Crea el almacén de pagos configurado (``sqlite`` o ``memory``)."""
+    if backend == 'memory':
+        return MemoryPaymentStore(**kwargs)
+    if backend == 'sqlite':
+        return SQLitePaymentStore(path, **kwargs)
+    raise ValueError(f'Backend de pagos desconocido: {backend}')
@@ -0,0 +1,155 @@
+"""
+Archivo de los PDFs generados.
+
+Cada PDF se guarda una sola vez, con el digest del CV como identificador, en
+subcarpetas por prefijo (``<root>/<ab>/<cd>/<digest>.pdf``) y se registra en
+un índice SQLite con el formulario, el tamaño, la fecha y la plantilla. Las
+descargas repetidas se sirven desde el archivo en lugar de volver a generar el
+PDF. La limpieza elimina los PDFs más viejos que ``ttl`` y, si el archivo
+supera ``max_bytes``, los más antiguos hasta volver a la cuota.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+ArchivedPDF = namedtuple('ArchivedPDF', [
+    'id', 'form_id', 'size', 'created_at', 'template_type', 'template_color', 'output_profile', 'path',
+])
+
+_COLUMNS = 'id, form_id, size, created_at, template_type, template_color, output_profile'
+
+
+class PDFArchive:
+    """PDFs en disco compartidos entre procesos, con índice SQLite (WAL) y retención por TTL y cuota."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS pdfs ('
+        ' id TEXT PRIMARY KEY,'
+        ' form_id TEXT,'
+        ' size INTEGER NOT NULL,'
+        ' created_at REAL NOT NULL,'
+        ' template_type TEXT,'
+        ' template_color TEXT,'
+        ' output_profile TEXT'
+        ') WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS pdfs_form_id ON pdfs (form_id)',
+        'CREATE INDEX IF NOT EXISTS pdfs_created_at ON pdfs (created_at)',
+    )
+
+    def __init__(self, root, index_path=None, ttl=7 * 24 * 3600, max_bytes=512 * 1024 * 1024):
+        # Ruta absoluta: X-Sendfile la entrega tal cual al servidor web
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or os.path.join(self.root, 'index.db')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _path(self, pdf_id):
+        return os.path.join(self.root, pdf_id[:2], pdf_id[2:4], f'{pdf_id}.pdf')
+
+    def _record(self, row):
+        return ArchivedPDF(*row, path=self._path(row[0]))
+
+    def put(self, pdf_id, pdf_bytes, form_id=None, template_type=None, template_color=None, output_profile=None):
+        """Guarda el PDF (si no estaba o el archivo no coincide) y lo registra en el índice."""
+        path = self._path(pdf_id)
+        try:
+            current = os.path.getsize(path) == len(pdf_bytes)
+        except OSError:
+            current = False
+        if not current:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escritura atómica: archivo temporal + rename
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(pdf_bytes)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        # Un PDF que se vuelve a generar (p. ej. ya vencido pero sin limpiar) renueva su fecha y su
+        # tamaño; el formulario solo se completa si faltaba
+        self._connect().execute(
+            f'INSERT INTO pdfs ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)'
+            ' ON CONFLICT (id) DO UPDATE SET form_id = COALESCE(pdfs.form_id, excluded.form_id),'
+            ' size = excluded.size, created_at = excluded.created_at',
+            (pdf_id, form_id, len(pdf_bytes), time.time(), template_type, template_color, output_profile)
+        )
+
+    def get(self, pdf_id):
+        """Devuelve el ``ArchivedPDF`` vigente o None si no está archivado, venció o falta el archivo."""
+        row = self._connect().execute(
+            f'SELECT {_COLUMNS} FROM pdfs WHERE id = ? AND created_at > ?', (pdf_id, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        record = self._record(row)
+        if not os.path.exists(record.path):
+            self.delete(pdf_id)
+            return None
+        return record
+
+    def find_by_form(self, form_id):
+        """PDFs vigentes de un formulario, del más reciente al más antiguo."""
+        rows = self._connect().execute(
+            f'SELECT {_COLUMNS} FROM pdfs WHERE form_id = ? AND created_at > ? ORDER BY created_at DESC',
+            (form_id, time.time() - self.ttl)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def delete(self, pdf_id):
+        self._connect().execute('DELETE FROM pdfs WHERE id = ?', (pdf_id,))
+        try:
+            os.unlink(self._path(pdf_id))
+        except OSError:
+            pass
+
+    def total_bytes(self):
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM pdfs').fetchone()[0]
+
+    def sweep(self):
+        """Elimina los PDFs vencidos y, si se supera la cuota, los más antiguos; devuelve cuántos eliminó."""
+        conn = self._connect()
+        expired = [row[0] for row in conn.execute(
+            'SELECT id FROM pdfs WHERE created_at <= ?', (time.time() - self.ttl,)
+        )]
+        for pdf_id in expired:
+            self.delete(pdf_id)
+        removed = len(expired)
+
+        if self.max_bytes is not None:
+            excess = self.total_bytes() - self.max_bytes
+            if excess > 0:
+                for pdf_id, size in conn.execute('SELECT id, size FROM pdfs ORDER BY created_at').fetchall():
+                    if excess <= 0:
+                        break
+                    self.delete(pdf_id)
+                    excess -= size
+                    removed += 1
+        return removed
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
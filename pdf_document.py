@@ -0,0 +1,70 @@
+"""
+Documento PDF generado completamente en memoria.
+
+``fpdf`` se importa junto con este módulo, que la aplicación carga recién al
+generar el primer PDF (no en el arranque).
+"""
+
+import hashlib
+import struct
+
+from fpdf import FPDF
+
+
+class MemoryFPDF(FPDF):
+    """FPDF que incrusta imágenes JPEG desde memoria y exporta el documento como bytes.
+
+    ``output_profile`` es el perfil de salida (``pdf_profiles``) con que se genera el documento.
+    """
+
+    def __init__(self, *args, output_profile=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.output_profile = output_profile
+        self.memory_images = {}
+        self.image_names = {}
+
+    def image_from_bytes(self, name, jpeg_bytes, x=None, y=None, w=0, h=0):
+        """Agrega al PDF una imagen JPEG ya codificada en memoria.
+
+        Los mismos bytes agregados con otro nombre reutilizan el objeto ya incrustado.
+        """
+        name = self.image_names.setdefault(hashlib.sha256(jpeg_bytes).hexdigest(), name)
+        if name not in self.images:
+            self.memory_images[name] = jpeg_bytes
+        self.image(name, x=x, y=y, w=w, h=h, type='jpg')
+
+    def _parsejpg(self, filename):
+        # Las imágenes registradas en memoria se leen del buffer en lugar del disco
+        if filename not in self.memory_images:
+            return super()._parsejpg(filename)
+        data = self.memory_images.pop(filename)
+        width, height, colspace, bpc = parse_jpeg_header(data)
+        return {'w': width, 'h': height, 'cs': colspace, 'bpc': bpc, 'f': 'DCTDecode', 'data': data}
+
+    def output_bytes(self):
+        """Devuelve el documento terminado como bytes."""
+        # FPDF 1.7.2 maneja el buffer como texto latin-1
+        return self.output(dest='S').encode('latin1')
+
+
+def parse_jpeg_header(data):
+    """Obtiene ancho, alto, espacio de color y bits por componente de un JPEG en memoria."""
+    pos = 0
+    while pos + 4 <= len(data):
+        marker_high, marker_low = data[pos], data[pos + 1]
+        if marker_high == 0xFF and marker_low == 0xFF:
+            # Bytes de relleno 0xFF entre marcadores (los admite el estándar)
+            pos += 1
+            continue
+        if marker_high != 0xFF or marker_low < 0xC0 or marker_low == 0xDA:
+            break
+        if marker_low == 0xC8 or 0xD0 <= marker_low <= 0xD9 or 0xF0 <= marker_low <= 0xFD:
+            pos += 2
+            continue
+        (size,) = struct.unpack_from('>H', data, pos + 2)
+        if marker_low in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            bpc, height, width, layers = struct.unpack_from('>BHHB', data, pos + 4)
+            colspace = 'DeviceRGB' if layers == 3 else ('DeviceCMYK' if layers == 4 else 'DeviceGray')
+            return width, height, colspace, bpc
+        pos += 2 + size
+    raise ValueError('Imagen JPEG inválida: no se encontró el marcador SOF')
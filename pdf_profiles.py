@@ -0,0 +1,29 @@
+"""
+Perfiles de salida de los PDFs generados.
+
+Cada perfil define cuánto pesa la foto de perfil en el PDF según el uso del
+archivo: ``screen`` (predeterminado) para verlo en pantalla o mandarlo por
+correo y ``print`` para imprimirlo. El texto y las formas son vectoriales y
+no cambian entre perfiles; los streams de las páginas siempre se comprimen con
+Flate y cada foto se incrusta una sola vez aunque se use en varios lugares.
+"""
+
+from collections import namedtuple
+
+# Resolución (ppp) y calidad JPEG de la foto; image_dpi None usa la resolución configurada (IMAGE_DPI)
+OutputProfile = namedtuple('OutputProfile', ['name', 'image_dpi', 'jpeg_quality'])
+
+PROFILES = {
+    'screen': OutputProfile('screen', image_dpi=150, jpeg_quality=80),
+    'print': OutputProfile('print', image_dpi=None, jpeg_quality=95),
+}
+
+DEFAULT_PROFILE = 'screen'
+
+
+def get_profile(name):
+    """Devuelve el perfil ``name`` (ValueError si no existe)."""
+    try:
+        return PROFILES[name]
+    except (KeyError, TypeError):
+        raise ValueError(f'Perfil de salida desconocido: {name} (opciones: {", ".join(PROFILES)})') from None
@@ -0,0 +1,71 @@
+"""
+Pre-render de PDFs en segundo plano.
+
+Cuando se aprueba un pago, el PDF del formulario se genera antes de que el
+navegador lo pida. ``PrerenderStore`` solo lleva los renders en curso de este
+proceso, indexados por el digest del CV: el PDF terminado queda en la caché en
+memoria y en el archivo en disco (``pdf_archive``), que es donde lo encuentran
+las descargas de cualquier proceso. Una descarga que llega mientras el render
+se ejecuta lo espera poco; si seguía en cola se cancela y la descarga genera el
+PDF en el momento como siempre.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PrerenderStore:
+    """Renders en segundo plano de este proceso, indexados por digest."""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def _get_executor(self):
+        # Los hilos no sobreviven a un fork: cada proceso crea su propio executor
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prerender')
+            self._executor_pid = os.getpid()
+            self._futures = {}
+        return self._executor
+
+    def _run(self, key, render):
+        try:
+            return render()
+        finally:
+            with self._lock:
+                self._futures.pop(key, None)
+
+    def submit(self, key, render):
+        """Programa ``render()`` para el digest ``key`` si no está en curso; devuelve si se programó.
+
+        ``render`` es responsable de guardar el PDF (caché y archivo).
+        """
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._futures:
+                return False
+            self._futures[key] = executor.submit(self._run, key, render)
+        return True
+
+    def get(self, key, wait=None):
+        """Espera hasta ``wait`` segundos el render de ``key`` si se está ejecutando en este proceso.
+
+        Devuelve el PDF o None. Un pre-render que todavía espera en la cola no se
+        espera: se cancela y la descarga genera el PDF por su cuenta.
+        """
+        with self._lock:
+            future = self._futures.get(key) if self._executor_pid == os.getpid() else None
+            if future is not None and not future.running() and future.cancel():
+                self._futures.pop(key, None)
+                future = None
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=wait)
+        except Exception:
+            return None
@@ -0,0 +1,309 @@
+"""
+Vista previa de la primera página del CV como imagen, generada solo con Pillow.
+
+``render_preview`` interpreta el contenido de la primera página tal como lo
+escribe FPDF (rectángulos, líneas, texto con las fuentes base e imágenes JPEG)
+y lo dibuja en una imagen de baja resolución, así que la vista previa sale del
+mismo plan de render que el PDF. El texto se dibuja con la fuente escalable de
+Pillow; cada palabra se ubica con los anchos de la fuente del PDF, de modo que
+las posiciones coinciden aunque el trazo de las letras sea distinto.
+
+Como ``pdf_document``, este módulo importa PIL y la aplicación lo carga recién
+con la primera vista previa.
+"""
+
+import re
+import threading
+import unicodedata
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+import text_layout
+
+# Formatos de salida: tipo MIME y opciones de Pillow (compresión rápida: la imagen es chica)
+FORMATS = {
+    'png': ('image/png', {'format': 'PNG', 'compress_level': 1}),
+    'webp': ('image/webp', {'format': 'WEBP', 'quality': 80, 'method': 0}),
+}
+
+# Colores del PNG: con paleta pesa y tarda en codificarse la mitad o menos que en RGB
+PNG_COLORS = 64
+
+# Cadenas (con sus escapes), nombres, números y operadores del contenido de la página
+_TOKEN_RE = re.compile(r'\((?:\\.|[^\\)])*\)|/[^\s/()\[\]<>]+|[-+]?(?:\d+\.?\d*|\.\d+)|[A-Za-z\'"*]+')
+_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t'}
+
+# La fuente de Pillow solo trae ASCII: las letras acentuadas se componen con la base y el acento
+_ACCENTS = {'\u0301': '´', '\u0300': '`', '\u0302': '^', '\u0303': '~', '\u0308': '..'}
+
+# Máximo de palabras dibujadas que se guardan
+WORD_CACHE_SIZE = 20000
+
+# Con workers gthread varias vistas previas se dibujan a la vez: cada hilo usa sus propias fuentes
+# (FreeType no admite usar la misma desde dos hilos) y las máscaras, que no se modifican una vez
+# dibujadas, se comparten con un lock
+_local = threading.local()
+_cache_lock = threading.Lock()
+_glyphs = {}
+_words = {}
+
+
+def _font(size):
+    """Fuente escalable de Pillow en ``size`` píxeles (en caché por tamaño, una por hilo)."""
+    fonts = getattr(_local, 'fonts', None)
+    if fonts is None:
+        fonts = _local.fonts = {}
+    font = fonts.get(size)
+    if font is None:
+        font = fonts[size] = ImageFont.load_default(size=size)
+    return font
+
+
+def _draw_glyph(char, pixels, stroke):
+    """Máscara de un carácter y su posición respecto del origen en la línea de base."""
+    font = _font(pixels)
+    left, top, right, bottom = font.getbbox(char, anchor='ls', stroke_width=stroke)
+    mask = Image.new('L', (max(1, right - left), max(1, bottom - top)))
+    ImageDraw.Draw(mask).text((-left, -top), char, font=font, fill=255, anchor='ls', stroke_width=stroke, stroke_fill=255)
+    # getbbox da la caja de la línea: se recorta a la parte dibujada
+    ink = mask.getbbox()
+    if ink is None:
+        return mask, left, top
+    return mask.crop(ink), left + ink[0], top + ink[1]
+
+
+def _glyph(char, pixels, stroke):
+    """Como ``_draw_glyph``, en caché, componiendo las letras acentuadas que la fuente no trae."""
+    key = (char, pixels, stroke)
+    with _cache_lock:
+        glyph = _glyphs.get(key)
+    if glyph is not None:
+        return glyph
+    if char.isascii():
+        glyph = _draw_glyph(char, pixels, stroke)
+    else:
+        base, *marks = unicodedata.normalize('NFD', char)
+        if not base.isascii():
+            base = '?'
+        mask, left, top = _draw_glyph(base, pixels, stroke)
+        accent = _ACCENTS.get(marks[0]) if marks else None
+        if accent is not None:
+            # El acento se apoya sobre la letra, con un píxel de separación
+            accent_mask, accent_left, _ = _draw_glyph(accent, pixels, stroke)
+            accent_x = max(0, (mask.width - accent_mask.width) // 2)
+            combined = Image.new('L', (max(mask.width, accent_x + accent_mask.width), mask.height + accent_mask.height + 1))
+            combined.paste(mask, (0, accent_mask.height + 1))
+            combined.paste(accent_mask, (accent_x, 0), accent_mask)
+            mask, top = combined, top - accent_mask.height - 1
+        glyph = (mask, left, top)
+    with _cache_lock:
+        # Si otro hilo la dibujó mientras tanto se usa la suya: son iguales
+        return _glyphs.setdefault(key, glyph)
+
+
+def _unescape(token):
+    return _ESCAPE_RE.sub(lambda match: _ESCAPES.get(match.group(1), match.group(1)), token[1:-1])
+
+
+def _rgb(values):
+    return tuple(round(value * 255) for value in values)
+
+
+class _PageRasterizer:
+    """Ejecuta los operadores de la página sobre un lienzo de Pillow."""
+
+    def __init__(self, pdf, dpi):
+        self.scale = dpi / 72.0
+        self.height_pt = pdf.h_pt
+        self.image = Image.new('RGB', (round(pdf.w_pt * self.scale), round(pdf.h_pt * self.scale)), 'white')
+        self.draw = ImageDraw.Draw(self.image)
+        self.fonts = {f"F{font['i']}": font for font in pdf.fonts.values()}
+        self.images = {f"I{info['i']}": info for info in pdf.images.values()}
+        # Estado gráfico: relleno, trazo, grosor de línea, matriz (cm), fuente, tamaño y espaciado de palabras
+        self.state = {'fill': (0, 0, 0), 'stroke': (0, 0, 0), 'line_width': 1.0, 'cm': (1, 0, 0, 1, 0, 0),
+                      'font': None, 'size': 0.0, 'word_spacing': 0.0}
+        self.stack = []
+        self.path = []
+        self.text_x = self.text_y = 0.0
+
+    def point(self, x, y):
+        return x * self.scale, (self.height_pt - y) * self.scale
+
+    def run(self, content):
+        operands = []
+        for token in _TOKEN_RE.findall(content):
+            first = token[0]
+            if first == '(':
+                operands.append(_unescape(token))
+            elif first == '/':
+                operands.append(token[1:])
+            elif first.isdigit() or first in '-+.':
+                operands.append(float(token))
+            else:
+                handler = getattr(self, f'op_{token}', None)
+                if handler is not None:
+                    handler(*operands)
+                operands = []
+        return self.image
+
+    # --- Estado gráfico ---
+
+    def op_q(self):
+        self.stack.append(dict(self.state))
+
+    def op_Q(self):
+        if self.stack:
+            self.state = self.stack.pop()
+
+    def op_cm(self, a, b, c, d, e, f):
+        self.state['cm'] = (a, b, c, d, e, f)
+
+    def op_w(self, width):
+        self.state['line_width'] = width
+
+    def op_rg(self, r, g, b):
+        self.state['fill'] = _rgb((r, g, b))
+
+    def op_g(self, gray):
+        self.state['fill'] = _rgb((gray, gray, gray))
+
+    def op_RG(self, r, g, b):
+        self.state['stroke'] = _rgb((r, g, b))
+
+    def op_G(self, gray):
+        self.state['stroke'] = _rgb((gray, gray, gray))
+
+    # --- Trazados ---
+
+    def op_re(self, x, y, w, h):
+        self.path.append(('rect', x, y, w, h))
+
+    def op_m(self, x, y):
+        self.path.append(('move', x, y))
+
+    def op_l(self, x, y):
+        self.path.append(('line', x, y))
+
+    def _paint(self, fill, stroke):
+        width = max(1, round(self.state['line_width'] * self.scale))
+        current = None
+        for segment in self.path:
+            kind = segment[0]
+            if kind == 'rect':
+                _, x, y, w, h = segment
+                x0, y0 = self.point(x, y)
+                x1, y1 = self.point(x + w, y + h)
+                box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+                self.draw.rectangle(box, fill=self.state['fill'] if fill else None,
+                                    outline=self.state['stroke'] if stroke else None, width=width if stroke else 0)
+            elif kind == 'move':
+                current = self.point(segment[1], segment[2])
+            elif kind == 'line' and current is not None:
+                end = self.point(segment[1], segment[2])
+                if stroke:
+                    self.draw.line((current, end), fill=self.state['stroke'], width=width)
+                current = end
+        self.path = []
+
+    def op_f(self):
+        self._paint(fill=True, stroke=False)
+
+    op_F = op_f
+
+    def op_S(self):
+        self._paint(fill=False, stroke=True)
+
+    def op_B(self):
+        self._paint(fill=True, stroke=True)
+
+    def op_n(self):
+        self.path = []
+
+    # --- Texto ---
+
+    def op_BT(self):
+        self.text_x = self.text_y = 0.0
+
+    def op_Tf(self, name, size):
+        self.state['font'] = self.fonts.get(name)
+        self.state['size'] = size
+
+    def op_Tw(self, spacing):
+        self.state['word_spacing'] = spacing
+
+    def op_Td(self, x, y):
+        self.text_x += x
+        self.text_y += y
+
+    def _word(self, word, font, size):
+        """Máscara de la palabra con cada letra en su avance según la fuente del PDF (en caché)."""
+        key = (word, font['name'], size, self.scale)
+        with _cache_lock:
+            cached = _words.get(key)
+        if cached is not None:
+            return cached
+        pixels = max(1, round(size * self.scale))
+        # Negrita simulada con un trazo alrededor de cada letra
+        stroke = round(pixels / 24) if 'Bold' in font['name'] else 0
+        widths = font['cw']
+        placed = []
+        x = 0.0
+        for char in word:
+            mask, left, top = _glyph(char, pixels, stroke)
+            placed.append((mask, round(x) + left, top))
+            x += widths.get(char, 0) * size / 1000.0 * self.scale
+        left = min(offset for _, offset, _ in placed)
+        top = min(top for _, _, top in placed)
+        width = max(offset + mask.width for mask, offset, _ in placed) - left
+        height = max(top_ + mask.height for mask, _, top_ in placed) - top
+        word_mask = Image.new('L', (width, height))
+        for mask, offset, glyph_top in placed:
+            word_mask.paste(mask, (offset - left, glyph_top - top), mask)
+        with _cache_lock:
+            if len(_words) >= WORD_CACHE_SIZE:
+                _words.clear()
+            return _words.setdefault(key, (word_mask, left, top))
+
+    def op_Tj(self, text):
+        font = self.state['font']
+        size = self.state['size']
+        if font is None or not text.strip():
+            return
+        fill = self.state['fill']
+        metrics = text_layout.font_metrics(font)
+        spacing = self.state['word_spacing']
+        x = self.text_x
+        # Cada palabra en la posición que le da el PDF (incluye el espaciado de justificación)
+        for word in text.split(' '):
+            if word:
+                mask, left, top = self._word(word, font, size)
+                px, py = self.point(x, self.text_y)
+                self.image.paste(fill, (round(px) + left, round(py) + top), mask)
+            x += (metrics.word_width(word) + metrics.space_width) * size / 1000.0 + spacing
+
+    # --- Imágenes ---
+
+    def op_Do(self, name):
+        info = self.images.get(name)
+        a, _, _, d, e, f = self.state['cm']
+        if info is None or info.get('f') != 'DCTDecode':
+            return
+        x0, y0 = self.point(e, f + d)
+        size = (max(1, round(a * self.scale)), max(1, round(d * self.scale)))
+        with Image.open(BytesIO(info['data'])) as img:
+            # Decodificar el JPEG directamente a escala reducida
+            img.draft('RGB', size)
+            self.image.paste(img.convert('RGB').resize(size, Image.BILINEAR), (round(x0), round(y0)))
+
+
+def render_preview(pdf, dpi=72, image_format='png'):
+    """Dibuja la primera página de ``pdf`` (un FPDF sin cerrar) y la devuelve como bytes PNG o WebP."""
+    _, options = FORMATS[image_format]
+    image = _PageRasterizer(pdf, dpi).run(pdf.pages[1])
+    if image_format == 'png':
+        image = image.quantize(PNG_COLORS, method=Image.Quantize.FASTOCTREE)
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
@@ -0,0 +1,241 @@
+"""
+Pool de procesos para generar PDFs fuera de los workers HTTP.
+
+Separa la capacidad de render (CPU) de la capacidad HTTP: los workers HTTP solo
+encolan trabajos y esperan el resultado, con una cola acotada y un tiempo
+máximo por trabajo. Cada proceso de render atiende un trabajo por vez a través
+de su propio pipe; si se cae o se cuelga, se termina y se reemplaza solo ese
+proceso, sin afectar a los demás trabajos ni al worker HTTP.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+
+class RenderPoolError(Exception):
+    """Error de capacidad del pool de render; se traduce a una respuesta HTTP con Retry-After."""
+
+    status_code = 503
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RenderQueueFull(RenderPoolError):
+    """La cola de render está llena."""
+
+
+class RenderTimeout(RenderPoolError):
+    """El trabajo no terminó dentro del tiempo máximo."""
+
+    status_code = 504
+
+
+class RenderWorkerCrashed(RenderPoolError):
+    """El proceso de render terminó de forma inesperada."""
+
+
+def _worker_main(conn):
+    """Bucle de un proceso de render: recibe ``(fn, args)`` y responde ``(ok, resultado o excepción)``."""
+    # Con fork se heredan los manejadores del worker HTTP (gunicorn): terminate() debe terminar el proceso
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        fn, args = job
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Resultado o excepción que no se puede serializar
+            conn.send((False, RuntimeError(f'{type(e).__name__}: {e}')))
+
+
+class _WorkerProcess:
+    """Un proceso de render con su pipe."""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name='render', daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, fn, args):
+        """Ejecuta el trabajo en el proceso (EOFError u OSError si el proceso murió)."""
+        self.conn.send((fn, args))
+        return self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+
+class _Job:
+    """Proceso que ejecuta un trabajo, para poder terminar solo ese si vence su tiempo."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.worker = None
+        self.abandoned = False
+
+    def abandon(self):
+        with self.lock:
+            self.abandoned = True
+            worker = self.worker
+        if worker is not None:
+            worker.kill()
+
+
+class RenderPool:
+    """Pool de procesos de render con cola acotada, timeouts por trabajo y aislamiento de fallos.
+
+    Con ``workers=0`` los trabajos se ejecutan en línea en el hilo de la petición.
+    """
+
+    def __init__(self, workers=0, queue_size=None, timeout=30.0, retry_after=5, start_method=None):
+        self.workers = workers
+        self.queue_size = queue_size if queue_size is not None else workers * 2
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.start_method = start_method
+        # Un "slot" por trabajo en ejecución o en cola
+        self._slots = threading.BoundedSemaphore(workers + self.queue_size) if workers else None
+        # Un hilo de despacho por proceso de render; los procesos libres esperan en _idle
+        self._executor = None
+        self._executor_pid = None
+        self._idle = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_executor(self):
+        with self._lock:
+            # Tras un fork (p. ej. gunicorn --preload) cada proceso crea sus propios hilos y procesos
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='render')
+                self._executor_pid = os.getpid()
+                self._idle = queue.LifoQueue()
+            return self._executor
+
+    def _take_worker(self, idle):
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            # Hay tantos hilos de despacho como procesos: se crea uno nuevo (o el reemplazo de uno terminado)
+            context = multiprocessing.get_context(self.start_method) if self.start_method else multiprocessing
+            return _WorkerProcess(context)
+
+    def _execute(self, idle, job, fn, args):
+        """Corre en un hilo de despacho: pasa el trabajo a un proceso libre y espera su respuesta."""
+        worker = self._take_worker(idle)
+        with job.lock:
+            if job.abandoned:
+                idle.put(worker)
+                raise RenderTimeout('La generación del PDF superó el tiempo máximo', self.retry_after)
+            job.worker = worker
+        try:
+            ok, value = worker.call(fn, args)
+        except (EOFError, OSError):
+            # El proceso se cayó o se terminó por timeout: se descarta y el siguiente trabajo crea otro
+            worker.kill()
+            raise RenderWorkerCrashed('El proceso de generación del PDF terminó inesperadamente', self.retry_after)
+        except BaseException:
+            # El trabajo no se pudo enviar (p. ej. no es serializable); el proceso sigue sano
+            idle.put(worker)
+            raise
+        idle.put(worker)
+        if not ok:
+            raise value
+        return value
+
+    def submit(self, fn, *args):
+        """Encola un trabajo y devuelve su Future. Lanza RenderQueueFull si no hay lugar."""
+        if not self.enabled:
+            # Sin pool: ejecutar en línea y devolver un Future ya resuelto
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull('La cola de generación de PDF está llena', self.retry_after)
+        try:
+            executor = self._get_executor()
+            job = _Job()
+            future = executor.submit(self._execute, self._idle, job, fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.render_job = job
+        future.render_slot_held = True
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def _release_slot(self, future):
+        # Se puede liberar antes de que el Future termine (trabajo colgado), pero solo una vez
+        with self._lock:
+            if not getattr(future, 'render_slot_held', False):
+                return
+            future.render_slot_held = False
+        self._slots.release()
+
+    def result(self, future, timeout=None):
+        """Espera el resultado de un trabajo; un timeout termina solo el proceso de ese trabajo."""
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FuturesTimeoutError:
+            # En cola se cancela; en ejecución se termina su proceso (los demás trabajos siguen)
+            job = getattr(future, 'render_job', None)
+            if not future.cancel() and job is not None:
+                job.abandon()
+                self._release_slot(future)
+            raise RenderTimeout('La generación del PDF superó el tiempo máximo', self.retry_after)
+
+    def run(self, fn, *args):
+        """Ejecuta un trabajo en el pool (o en línea si está desactivado) y devuelve su resultado."""
+        if not self.enabled:
+            return fn(*args)
+        return self.result(self.submit(fn, *args))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            idle, self._idle = self._idle, None
+            owned = self._executor_pid == os.getpid()
+        if executor is None or not owned:
+            return
+        executor.shutdown(wait=True, cancel_futures=True)
+        while True:
+            try:
+                idle.get_nowait().stop()
+            except queue.Empty:
+                break
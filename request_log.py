@@ -0,0 +1,221 @@
+"""
+Logging estructurado, perezoso y con muestreo.
+
+Cada registro es un evento con nombre (``pdf.render``) y campos. Los campos
+se evalúan solo si el nivel está habilitado y el evento sale en el muestreo:
+un campo puede ser una función sin argumentos (``size=lambda: len(data)``) que
+solo se llama en ese caso. Los textos largos nunca se escriben completos y los
+datos del CV se resumen con ``payload_summary`` (claves y tamaños), sin
+convertir a texto la foto en base64.
+
+Además, cada petición HTTP deja un único registro ``request`` con el estado,
+la duración total y el tiempo de cada etapa medida con ``stage()``. Las mismas
+mediciones alimentan las métricas de ``metrics`` (``/metrics``).
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+from metrics import ERRORS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, STAGE_SECONDS
+
+# Largo máximo de un campo de texto en los registros
+MAX_FIELD_LENGTH = 200
+
+
+def parse_sample_rates(value):
+    """Interpreta ``evento=tasa,evento=tasa`` (tasas entre 0 y 1)."""
+    rates = {}
+    for item in (value or '').split(','):
+        name, _, rate = item.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def payload_summary(data):
+    """Resumen liviano de los datos de un CV para los registros (sin serializar la foto)."""
+    if not isinstance(data, dict):
+        return {'type': type(data).__name__}
+    summary = {'keys': len(data)}
+    for name in ('form_id', 'template_type', 'template_color'):
+        if name in data:
+            summary[name] = data[name]
+    image = data.get('profile_image')
+    if isinstance(image, str):
+        summary['image'] = image if image.startswith('blob:') else f'{len(image)} caracteres'
+    for name in ('experiencia', 'educacion', 'habilidades'):
+        if isinstance(data.get(name), list):
+            summary[name] = len(data[name])
+    return summary
+
+
+def _clip(value):
+    if isinstance(value, str) and len(value) > MAX_FIELD_LENGTH:
+        return f'{value[:MAX_FIELD_LENGTH]}... ({len(value)} caracteres)'
+    return value
+
+
+class EventLogger:
+    """Registra eventos estructurados sobre un ``logging.Logger`` con muestreo por evento.
+
+    Las advertencias y errores no se muestrean nunca.
+    """
+
+    def __init__(self, logger, sample_rates=None, rng=random.random):
+        self.logger = logger
+        self.sample_rates = dict(sample_rates or {})
+        self.rng = rng
+
+    def enabled(self, level, event):
+        if not self.logger.isEnabledFor(level):
+            return False
+        if level >= logging.WARNING:
+            return True
+        rate = self.sample_rates.get(event, 1.0)
+        return rate >= 1.0 or self.rng() < rate
+
+    def log(self, level, event, **fields):
+        if not self.enabled(level, event):
+            return
+        for name, value in fields.items():
+            if callable(value):
+                fields[name] = value()
+        self.logger.log(level, event, extra={'event': event, 'fields': fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formatea los eventos como JSON (una línea por registro) o como ``clave=valor``."""
+
+    def __init__(self, fmt='text'):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = {name: _clip(value) for name, value in getattr(record, 'fields', {}).items()}
+        event = getattr(record, 'event', None) or record.getMessage()
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+        if self.fmt == 'json':
+            payload = {
+                'ts': round(record.created, 3),
+                'level': record.levelname,
+                'event': event,
+            }
+            payload.update(fields)
+            return json.dumps(payload, ensure_ascii=False, default=str, separators=(',', ':'))
+        timestamp = self.formatTime(record)
+        parts = ' '.join(f'{name}={json.dumps(value, ensure_ascii=False, default=str)}' for name, value in fields.items())
+        return f'[{timestamp}] {record.levelname} {event} {parts}'.rstrip()
+
+
+class RequestLog:
+    """Tiempos por etapa y campos de una petición, para el registro de resumen."""
+
+    __slots__ = ('started', 'stages', 'fields')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+
+    def add_stage(self, name, elapsed):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+
+def current_request_log():
+    if has_request_context():
+        return g.get('request_log')
+    return None
+
+
+@contextmanager
+def stage(name):
+    """Mide el tiempo de una etapa para las métricas y para el registro de la petición actual, si la hay.
+
+    Una excepción dentro de la etapa se cuenta como error de esa etapa.
+    """
+    request_log = current_request_log()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if request_log is not None:
+            request_log.add_stage(name, elapsed)
+
+
+def annotate(**fields):
+    """Agrega campos al registro de resumen de la petición actual."""
+    request_log = current_request_log()
+    if request_log is not None:
+        request_log.fields.update(fields)
+
+
+def install_request_log(app, events):
+    """Registra los hooks que emiten el evento ``request`` y las métricas HTTP de cada petición, al terminar de enviarse la respuesta."""
+
+    @app.before_request
+    def _start_request_log():
+        g.request_log = RequestLog()
+
+    @app.after_request
+    def _finish_request_log(response):
+        request_log = g.get('request_log')
+        if request_log is None:
+            return response
+        method, path, status = request.method, request.path, response.status_code
+        # La regla de la ruta (no la URL) mantiene acotada la cantidad de series de métricas
+        route = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        log_enabled = events.enabled(logging.INFO, 'request')
+
+        # En respuestas en streaming la duración incluye el envío completo
+        def finish():
+            duration = time.perf_counter() - request_log.started
+            HTTP_REQUEST_SECONDS.observe(duration, route=route, method=method)
+            HTTP_REQUESTS.inc(route=route, method=method, status=status)
+            if not log_enabled:
+                return
+            fields = {
+                'method': method,
+                'path': path,
+                'status': status,
+                'duration_ms': round(duration * 1000, 2),
+                'stages_ms': {name: round(elapsed * 1000, 2) for name, elapsed in request_log.stages.items()},
+            }
+            fields.update(request_log.fields)
+            events.logger.info('request', extra={'event': 'request', 'fields': fields})
+
+        response.call_on_close(finish)
+        return response
+
+
+def configure_logging(app, level='INFO', fmt='text', sample_rates=None):
+    """Configura el logger de la aplicación y devuelve el ``EventLogger`` para usar en las rutas."""
+    app.logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    formatter = StructuredFormatter(fmt)
+    for handler in app.logger.handlers:
+        handler.setFormatter(formatter)
+    events = EventLogger(app.logger, sample_rates)
+    install_request_log(app, events)
+    return events
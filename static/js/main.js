@@ -37,6 +37,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     
                     // Guardar la imagen optimizada en localStorage
                     localStorage.setItem('profile_image', optimizedImage);
+                    uploadProfileImage(optimizedImage);
                     
                     // Actualizar vista previa del CV
                     updateCVPreview();
@@ -102,6 +103,8 @@ function loadSavedData() {
     const savedImage = localStorage.getItem('profile_image');
     if (savedImage) {
         document.getElementById('previewImage').src = savedImage;
+        // Volver a subirla: el token de una sesión anterior puede haber vencido
+        uploadProfileImage(savedImage);
     }
     updateCVPreview();
 }
@@ -129,21 +132,84 @@ function updateCVPreview() {
             formData.profile_image = profileImage;
         }
         
-        // Generar HTML según el tipo de plantilla
-        let previewHTML = '';
-        if (templateType === 'profesional') {
-            previewHTML = generateProTemplate(formData, templateColor);
-        } else {
-            previewHTML = generateBasicTemplate(formData);
+        // Mientras no llegue la imagen del servidor, mostrar la vista previa en HTML
+        if (!serverPreviewUrl) {
+            let previewHTML = '';
+            if (templateType === 'profesional') {
+                previewHTML = generateProTemplate(formData, templateColor);
+            } else {
+                previewHTML = generateBasicTemplate(formData);
+            }
+            
+            // Actualizar el contenedor de vista previa
+            document.getElementById('cvPreview').innerHTML = previewHTML;
         }
         
-        // Actualizar el contenedor de vista previa
-        document.getElementById('cvPreview').innerHTML = previewHTML;
+        // Pedir al servidor la primera página real del PDF cuando se deja de escribir
+        scheduleServerPreview();
     } catch (error) {
         console.error('Error al actualizar la vista previa:', error.message);
     }
 }
 
+// Vista previa generada por el servidor con el mismo layout que el PDF
+const SERVER_PREVIEW_DELAY = 400;
+let serverPreviewTimer = null;
+let serverPreviewController = null;
+let serverPreviewUrl = null;
+
+function scheduleServerPreview() {
+    clearTimeout(serverPreviewTimer);
+    serverPreviewTimer = setTimeout(updateServerPreview, SERVER_PREVIEW_DELAY);
+}
+
+async function updateServerPreview() {
+    // Cancelar la petición anterior si todavía no respondió
+    if (serverPreviewController) {
+        serverPreviewController.abort();
+    }
+    serverPreviewController = new AbortController();
+    try {
+        const cvData = obtenerDatosFormulario();
+        // Enviar el token de la foto en lugar de la imagen en base64
+        const profileImage = profileImageForServer();
+        if (profileImage) {
+            cvData.profile_image = profileImage;
+        } else {
+            delete cvData.profile_image;
+        }
+        
+        const response = await fetch('/preview', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(cvData),
+            signal: serverPreviewController.signal
+        });
+        if (!response.ok) {
+            throw new Error(`Error ${response.status} al generar la vista previa`);
+        }
+        
+        const blob = await response.blob();
+        if (serverPreviewUrl) {
+            URL.revokeObjectURL(serverPreviewUrl);
+        }
+        serverPreviewUrl = URL.createObjectURL(blob);
+        document.getElementById('cvPreview').innerHTML =
+            `<img class="cv-preview-image" src="${serverPreviewUrl}" alt="Vista previa del CV" style="width: 100%;">`;
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            // Volver a la vista previa en HTML
+            console.error('Error al actualizar la vista previa:', error.message);
+            if (serverPreviewUrl) {
+                URL.revokeObjectURL(serverPreviewUrl);
+                serverPreviewUrl = null;
+            }
+        }
+    }
+}
+
 function generateBasicTemplate(data) {
     return `
     <div class="cv-preview template-basic">
@@ -316,6 +382,7 @@ function handleImageUpload(event) {
                 
                 // Guardar la imagen optimizada en localStorage
                 localStorage.setItem('profile_image', optimizedImage);
+                uploadProfileImage(optimizedImage);
                 
                 // Actualizar vista previa del CV
                 updateCVPreview();
@@ -509,8 +576,8 @@ function obtenerDatosFormulario() {
         }
     });
 
-    // SIEMPRE obtener la imagen de perfil del localStorage
-    const profileImage = localStorage.getItem('profile_image');
+    // SIEMPRE obtener la imagen de perfil del localStorage (el token si ya se subió)
+    const profileImage = profileImageForServer();
     if (profileImage) {
         cvData.profile_image = profileImage;
     }
@@ -717,7 +784,11 @@ async function generarPDF() {
         
         // Obtener imagen directamente del elemento img
         const previewImage = document.getElementById('previewImage');
-        if (previewImage && previewImage.src && !previewImage.src.includes('default-profile')) {
+        const imageToken = localStorage.getItem('profile_image_token');
+        if (imageToken) {
+            // La foto ya está en el servidor: enviar solo su token
+            cvData.profile_image = imageToken;
+        } else if (previewImage && previewImage.src && !previewImage.src.includes('default-profile')) {
             // Asegurarse de que la imagen esté optimizada
             await new Promise((resolve) => {
                 optimizeImage(previewImage.src, (optimizedImage) => {
@@ -870,6 +941,39 @@ function agregarHabilidad() {
     updatePreview();
 }
 
+// Subir la foto optimizada en binario y guardar el token que devuelve el servidor
+async function uploadProfileImage(imageData) {
+    localStorage.removeItem('profile_image_token');
+    try {
+        const blob = await (await fetch(imageData)).blob();
+        const response = await fetch('/upload_image', {
+            method: 'POST',
+            headers: {
+                'Content-Type': blob.type || 'application/octet-stream',
+            },
+            body: blob
+        });
+        
+        if (!response.ok) {
+            throw new Error('Error al subir la imagen');
+        }
+        
+        const data = await response.json();
+        // Guardar el token solo si la foto no cambió mientras se subía
+        if (localStorage.getItem('profile_image') === imageData) {
+            localStorage.setItem('profile_image_token', data.image_token);
+        }
+    } catch (error) {
+        // Sin token se envía la foto en base64, como antes
+        console.error('Error al subir la imagen de perfil:', error);
+    }
+}
+
+// Foto de perfil para enviar al servidor: el token de /upload_image o, si no hay, la foto en base64
+function profileImageForServer() {
+    return localStorage.getItem('profile_image_token') || localStorage.getItem('profile_image');
+}
+
 // Función para optimizar la imagen
 function optimizeImage(base64Image, callback) {
     
@@ -1072,7 +1176,7 @@ async function descargarPDFDirecto() {
         const cvData = obtenerDatosFormulario();
         
         // Asegurarse de que la imagen esté incluida
-        const profileImage = localStorage.getItem('profile_image');
+        const profileImage = profileImageForServer();
         if (profileImage) {
             cvData.profile_image = profileImage;
         } 
@@ -1134,35 +1238,117 @@ function agregarResumen() {
     const prompt = generarPromptParaIA(datosFormulario);
     
     
-    // Llamar a la API de DeepSeek R1
-    fetch('/generar_resumen_ia', {
+    // Llamar a la API de DeepSeek R1 en streaming; si el navegador no lo soporta
+    // o falla antes de recibir texto, se usa el endpoint JSON
+    const campoResumen = document.getElementById('resumen');
+    const quitarIndicador = () => {
+        if (document.getElementById('resumen-loading')) {
+            document.getElementById('resumen-loading').remove();
+        }
+    };
+
+    leerResumenEnStream(prompt, textoParcial => {
+        quitarIndicador();
+        campoResumen.value = textoParcial;
+    })
+    .then(resumen => {
+        quitarIndicador();
+        campoResumen.value = resumen;
+        updateCVPreview();
+    })
+    .catch(errorStream => {
+        console.warn('Streaming del resumen no disponible, usando la respuesta completa:', errorStream);
+        return fetch('/generar_resumen_ia', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ prompt: prompt })
+        })
+        .then(response => response.json())
+        .then(data => {
+            // Eliminar indicador de carga
+            quitarIndicador();
+            
+            // Actualizar el campo de resumen con la respuesta de la IA
+            if (data.resumen) {
+                campoResumen.value = data.resumen;
+                // Actualizar la vista previa
+                updateCVPreview();
+            } else {
+                alert('No se pudo generar el resumen. Por favor, intenta de nuevo.');
+            }
+        });
+    })
+    .catch(error => {
+        console.error('Error al generar resumen con IA:', error);
+        // Eliminar indicador de carga
+        quitarIndicador();
+        alert('Error al comunicarse con la IA. Por favor, intenta de nuevo más tarde.');
+    });
+}
+
+// Lee el resumen desde /generar_resumen_ia/stream (server-sent events) e informa
+// el texto acumulado en cada fragmento. Rechaza la promesa si no llegó ningún texto.
+function leerResumenEnStream(prompt, onParcial) {
+    if (!window.ReadableStream || !window.TextDecoder) {
+        return Promise.reject(new Error('Streaming no soportado'));
+    }
+    return fetch('/generar_resumen_ia/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
         },
         body: JSON.stringify({ prompt: prompt })
     })
-    .then(response => response.json())
-    .then(data => {
-        // Eliminar indicador de carga
-        document.getElementById('resumen-loading').remove();
-        
-        // Actualizar el campo de resumen con la respuesta de la IA
-        if (data.resumen) {
-            document.getElementById('resumen').value = data.resumen;
-            // Actualizar la vista previa
-            updateCVPreview();
-        } else {
-            alert('No se pudo generar el resumen. Por favor, intenta de nuevo.');
+    .then(response => {
+        if (!response.ok || !response.body) {
+            throw new Error(`Respuesta inesperada: ${response.status}`);
         }
-    })
-    .catch(error => {
-        console.error('Error al generar resumen con IA:', error);
-        // Eliminar indicador de carga
-        if (document.getElementById('resumen-loading')) {
-            document.getElementById('resumen-loading').remove();
-        }
-        alert('Error al comunicarse con la IA. Por favor, intenta de nuevo más tarde.');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let texto = '';
+        let final = null;
+
+        const procesarEvento = bloque => {
+            let evento = 'message';
+            let datos = '';
+            bloque.split('\n').forEach(linea => {
+                if (linea.startsWith('event:')) evento = linea.slice(6).trim();
+                else if (linea.startsWith('data:')) datos += linea.slice(5).trim();
+            });
+            if (!datos) return;
+            const payload = JSON.parse(datos);
+            if (evento === 'done') {
+                final = payload.resumen || texto;
+            } else if (evento === 'error') {
+                // Con texto parcial se conserva; sin texto se usa el resumen genérico del servidor
+                final = texto || payload.resumen || null;
+            } else if (payload.delta) {
+                texto += payload.delta;
+                onParcial(texto);
+            }
+        };
+
+        const leer = () => reader.read().then(({ done, value }) => {
+            if (value) {
+                buffer += decoder.decode(value, { stream: true });
+                let separador;
+                while ((separador = buffer.indexOf('\n\n')) !== -1) {
+                    procesarEvento(buffer.slice(0, separador));
+                    buffer = buffer.slice(separador + 2);
+                }
+            }
+            if (done) {
+                const resumen = final || texto;
+                if (!resumen) throw new Error('El stream terminó sin texto');
+                return resumen;
+            }
+            return leer();
+        });
+        return leer();
     });
 }
 
@@ -0,0 +1,252 @@
+"""
+Caché de resúmenes generados con IA.
+
+Los resúmenes se indexan por el prompt normalizado (espacios colapsados y forma
+Unicode NFC), de modo que pedir dos veces el mismo resumen no vuelve a llamar a
+OpenRouter. Las entradas vencen por TTL y la caché en memoria es LRU; con una
+ruta configurada se guardan además en SQLite, compartidas entre procesos.
+
+Las peticiones simultáneas con el mismo prompt se agrupan: solo una llama a la
+API y las demás esperan su resultado. Con ``stream`` las que esperan reciben
+los fragmentos de la generación en curso a medida que llegan.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from cache import LRUCache
+
+
+def normalize_prompt(prompt):
+    """Normaliza el prompt para que variaciones de espacios o de codificación compartan la misma entrada."""
+    return ' '.join(unicodedata.normalize('NFC', prompt).split())
+
+
+def prompt_key(prompt):
+    return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    """Generación en curso de un resumen, compartida por las peticiones que la esperan."""
+
+    __slots__ = ('changed', 'chunks', 'finished', 'summary', 'error')
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.chunks = []
+        self.finished = False
+        self.summary = None
+        self.error = None
+
+    def add(self, chunk):
+        with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    def finish(self, summary=None, error=None):
+        with self.changed:
+            self.summary = summary
+            self.error = error
+            # Una generación sin streaming se entrega completa como un único fragmento
+            if summary and not self.chunks:
+                self.chunks.append(summary)
+            self.finished = True
+            self.changed.notify_all()
+
+    def wait(self, timeout):
+        with self.changed:
+            return self.changed.wait_for(lambda: self.finished, timeout)
+
+    def follow(self, timeout):
+        """Fragmentos desde el principio a medida que llegan; TimeoutError si pasan ``timeout`` segundos sin novedades."""
+        sent = 0
+        while True:
+            with self.changed:
+                if not self.changed.wait_for(lambda: self.finished or len(self.chunks) > sent, timeout):
+                    raise TimeoutError('Tiempo de espera agotado para el resumen en curso')
+                chunks = self.chunks[sent:]
+                finished = self.finished
+            yield from chunks
+            sent += len(chunks)
+            if finished:
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SummaryCache:
+    """Caché LRU con TTL de resúmenes, con persistencia opcional en SQLite."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS summaries ('
+        ' key TEXT PRIMARY KEY,'
+        ' summary TEXT NOT NULL,'
+        ' expires_at REAL NOT NULL'
+        ') WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS summaries_expires_at ON summaries (expires_at)',
+    )
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600, path=None, wait_timeout=None):
+        self.ttl = ttl
+        self.path = path
+        # Tiempo máximo que una petición espera el resultado de otra igual
+        self.wait_timeout = wait_timeout
+        self.memory = LRUCache(max_entries=max_entries, sizeof=lambda entry: len(entry[0]))
+        self.coalesced = 0
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Una conexión por hilo y por proceso (no se comparten tras un fork)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, key):
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                return entry[0]
+            self.memory.pop(key)
+        if not self.path:
+            return None
+        try:
+            row = self._connect().execute(
+                'SELECT summary, expires_at FROM summaries WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        self.memory.put(key, row)
+        return row[0]
+
+    def _put(self, key, summary):
+        entry = (summary, time.time() + self.ttl)
+        self.memory.put(key, entry)
+        if self.path:
+            try:
+                self._connect().execute(
+                    'INSERT OR REPLACE INTO summaries (key, summary, expires_at) VALUES (?, ?, ?)',
+                    (key,) + entry
+                )
+            except sqlite3.Error:
+                pass
+
+    def get(self, prompt):
+        """Devuelve el resumen guardado para el prompt o None."""
+        return self._get(prompt_key(prompt))
+
+    def put(self, prompt, summary):
+        if summary:
+            self._put(prompt_key(prompt), summary)
+
+    def get_or_generate(self, prompt, generate):
+        """Devuelve (resumen, acierto de caché) llamando a ``generate(prompt)`` solo si hace falta.
+
+        Si otra petición ya está generando el mismo resumen se espera su resultado
+        en lugar de repetir la llamada; los errores se propagan a todas las que esperan.
+        """
+        key = prompt_key(prompt)
+        summary = self._get(key)
+        if summary is not None:
+            return summary, True
+
+        flight, leader = self._join(key)
+        if not leader:
+            if not flight.wait(self.wait_timeout):
+                raise TimeoutError('Tiempo de espera agotado para el resumen en curso')
+            if flight.error is not None:
+                raise flight.error
+            return flight.summary, True
+
+        summary = error = None
+        try:
+            # Otro proceso pudo haberlo guardado mientras tanto
+            summary = self._get(key)
+            hit = summary is not None
+            if not hit:
+                summary = generate(prompt)
+                if summary:
+                    self._put(key, summary)
+            return summary, hit
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._land(key, flight, summary, error)
+
+    def stream(self, prompt, stream):
+        """Fragmentos del resumen: el guardado, los de la generación en curso del mismo prompt o los de ``stream(prompt)``.
+
+        Quien genera guarda el resumen al terminar; las peticiones que se suman
+        reciben todos los fragmentos desde el principio y los mismos errores.
+        """
+        key = prompt_key(prompt)
+        summary = self._get(key)
+        if summary is not None:
+            yield summary
+            return
+
+        flight, leader = self._join(key)
+        if not leader:
+            yield from flight.follow(self.wait_timeout)
+            return
+
+        summary = error = None
+        try:
+            summary = self._get(key)
+            if summary is not None:
+                yield summary
+            else:
+                for delta in stream(prompt):
+                    flight.add(delta)
+                    yield delta
+                summary = ''.join(flight.chunks)
+                if summary:
+                    self._put(key, summary)
+        except BaseException as e:
+            # También si el cliente se desconecta (GeneratorExit): las que esperan no quedan colgadas
+            error = e if isinstance(e, Exception) else RuntimeError('La generación del resumen se interrumpió')
+            raise
+        finally:
+            self._land(key, flight, summary, error)
+
+    def _join(self, key):
+        """Devuelve (generación en curso para ``key``, si esta petición es la que genera)."""
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+        return flight, leader
+
+    def _land(self, key, flight, summary, error):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        flight.finish(summary, error)
+
+    def sweep(self):
+        """Elimina de SQLite los resúmenes vencidos."""
+        if not self.path:
+            return 0
+        cursor = self._connect().execute('DELETE FROM summaries WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
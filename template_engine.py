@@ -0,0 +1,277 @@
+"""
+Motor de plantillas declarativas para los PDFs de CV.
+
+Una plantilla es un layout (tupla de operaciones) más una paleta de colores.
+``compile_template`` traduce el layout una sola vez a un ``RenderPlan``: una
+lista de pasos ya resueltos (colores de la paleta, textos, transformaciones)
+que al generar un CV solo se ejecutan en orden. Durante la compilación se
+sigue el estado de fuente y color de texto, de modo que los cambios de estado
+redundantes no llegan al plan.
+
+Operaciones del layout:
+
+- ``('font', familia, estilo, tamaño)``
+- ``('text_color', rol)`` / ``('fill_color', rol)``: rol de la paleta o tupla RGB
+- ``('rect', x, y, w, h, estilo)``
+- ``('xy', x, y)``: con ``y=None`` conserva la posición vertical actual
+- ``('ln', h)``
+- ``('rule', x1, x2)``: línea horizontal en la posición vertical actual
+- ``('cell', w, h, texto, ln, align)``
+- ``('measured_cell', margen, h, texto, align)``: celda tan ancha como el texto más el margen
+- ``('multi_cell', w, h, texto)``
+- ``('image', campo, x, y, w, h)``
+- ``('if', campo, ops)``: solo si el campo tiene valor
+- ``('each', campo, ops)``: repite ``ops`` por cada elemento de la lista del campo
+- ``('option', nombre, ops)``: solo en plantillas que habilitan esa opción
+
+Los textos se describen con ``literal``, ``field``, ``fmt`` y ``join``. Los
+campos se leen como atributos del CV compilado (``cv_model``) o del elemento
+actual; un campo ``None`` toma el valor por defecto de ``field``.
+"""
+
+from collections import namedtuple
+from operator import attrgetter
+
+import text_layout
+
+
+def capitalize_text(text):
+    """Capitaliza cada palabra en el texto."""
+    if text:
+        return ' '.join(word.capitalize() for word in text.split())
+    return ''
+
+
+TRANSFORMS = {
+    None: lambda value: value,
+    'capitalize': capitalize_text,
+}
+
+# Definición de una plantilla: layout, paletas por color, color por defecto y opciones habilitadas
+TemplateSpec = namedtuple('TemplateSpec', ['layout', 'palettes', 'default_color', 'options'])
+
+
+# --- Expresiones de texto ---------------------------------------------------
+
+def literal(text):
+    """Texto fijo."""
+    return ('literal', text)
+
+
+def field(name, default='', transform=None):
+    """Valor de un campo del CV (o el elemento actual con ``name=None``); ``default`` si es None."""
+    return ('field', name, default, transform)
+
+
+def fmt(template, name):
+    """Texto con formato a partir de un campo, p. ej. ``fmt('DNI: {}', 'dni')``."""
+    return ('fmt', template, name)
+
+
+def join(separator, *parts):
+    """Une con ``separator`` los ``(formato, campo)`` cuyos campos tienen valor."""
+    return ('join', separator, parts)
+
+
+def _compile_text(expr):
+    kind = expr[0]
+    if kind == 'literal':
+        text = expr[1]
+        return lambda scope: text
+    if kind == 'field':
+        _, name, default, transform = expr
+        apply = TRANSFORMS[transform]
+        if name is None:
+            return lambda scope: apply(scope)
+        get = attrgetter(name)
+
+        def value(scope):
+            text = get(scope)
+            return apply(default if text is None else text)
+        return value
+    if kind == 'fmt':
+        _, template, name = expr
+        if name is None:
+            return lambda scope: template.format(scope)
+        get = attrgetter(name)
+        return lambda scope: template.format(get(scope))
+    if kind == 'join':
+        _, separator, parts = expr
+        getters = tuple((template, attrgetter(name)) for template, name in parts)
+
+        def joined(scope):
+            return separator.join(template.format(value) for template, get in getters if (value := get(scope)))
+        return joined
+    raise ValueError(f'Expresión de texto desconocida: {kind}')
+
+
+# --- Compilación --------------------------------------------------------------
+
+def _merge_state(a, b):
+    """Estado conocido en ambos caminos (el valor se conserva solo si coincide)."""
+    return {key: a[key] for key in a if key in b and a[key] == b[key]}
+
+
+class TemplateCompiler:
+    """Traduce un layout declarativo a pasos ejecutables para una paleta concreta."""
+
+    def __init__(self, palette, options=()):
+        self.palette = palette
+        self.options = set(options)
+
+    def color(self, role):
+        return tuple(role) if isinstance(role, (tuple, list)) else self.palette[role]
+
+    def compile(self, ops, state):
+        """Compila ``ops`` partiendo de ``state`` y devuelve (pasos, estado final)."""
+        steps = []
+        for op in ops:
+            kind = op[0]
+            if kind == 'font':
+                font = tuple(op[1:])
+                if state.get('font') == font:
+                    continue
+                state['font'] = font
+                steps.append(lambda pdf, scope, env, font=font: pdf.set_font(*font))
+            elif kind == 'text_color':
+                rgb = self.color(op[1])
+                if state.get('text_color') == rgb:
+                    continue
+                state['text_color'] = rgb
+                steps.append(lambda pdf, scope, env, rgb=rgb: pdf.set_text_color(*rgb))
+            elif kind == 'fill_color':
+                # set_fill_color escribe en el contenido de la página: nunca se omite
+                rgb = self.color(op[1])
+                steps.append(lambda pdf, scope, env, rgb=rgb: pdf.set_fill_color(*rgb))
+            elif kind == 'rect':
+                args = op[1:]
+                steps.append(lambda pdf, scope, env, args=args: pdf.rect(*args))
+            elif kind == 'xy':
+                x, y = op[1], op[2]
+                if y is None:
+                    steps.append(lambda pdf, scope, env, x=x: pdf.set_xy(x, pdf.get_y()))
+                else:
+                    steps.append(lambda pdf, scope, env, x=x, y=y: pdf.set_xy(x, y))
+            elif kind == 'ln':
+                h = op[1]
+                steps.append(lambda pdf, scope, env, h=h: pdf.ln(h))
+            elif kind == 'rule':
+                x1, x2 = op[1], op[2]
+                steps.append(lambda pdf, scope, env, x1=x1, x2=x2: pdf.line(x1, pdf.get_y(), x2, pdf.get_y()))
+            elif kind == 'cell':
+                _, w, h, text, ln, align = op
+                text = _compile_text(text)
+                steps.append(lambda pdf, scope, env, w=w, h=h, text=text, ln=ln, align=align:
+                             pdf.cell(w, h, txt=text(scope), ln=ln, align=align))
+            elif kind == 'measured_cell':
+                _, padding, h, text, align = op
+                text = _compile_text(text)
+                steps.append(lambda pdf, scope, env, padding=padding, h=h, text=text, align=align:
+                             _measured_cell(pdf, padding, h, text(scope), align))
+            elif kind == 'multi_cell':
+                _, w, h, text = op
+                text = _compile_text(text)
+                steps.append(lambda pdf, scope, env, w=w, h=h, text=text: text_layout.multi_cell(pdf, w, h, text(scope)))
+            elif kind == 'image':
+                _, name, x, y, w, h = op
+                get = attrgetter(name)
+                steps.append(lambda pdf, scope, env, get=get, x=x, y=y, w=w, h=h:
+                             env.embed_image(pdf, get(scope), x, y, w, h) if get(scope) else None)
+            elif kind == 'option':
+                if op[1] in self.options:
+                    body, state = self.compile(op[2], state)
+                    steps.extend(body)
+            elif kind == 'if':
+                get = attrgetter(op[1])
+                body, body_state = self.compile(op[2], dict(state))
+                state = _merge_state(state, body_state)
+                steps.append(lambda pdf, scope, env, get=get, body=body:
+                             _run(body, pdf, scope, env) if get(scope) else None)
+            elif kind == 'each':
+                get = attrgetter(op[1])
+                # El estado al inicio de cada iteración es el común entre la entrada y el final del cuerpo
+                entry = dict(state)
+                while True:
+                    body, exit_state = self.compile(op[2], dict(entry))
+                    merged = _merge_state(entry, exit_state)
+                    if merged == entry:
+                        break
+                    entry = merged
+                state = _merge_state(state, exit_state)
+                steps.append(lambda pdf, scope, env, get=get, body=body:
+                             _each(body, pdf, get(scope), env))
+            else:
+                raise ValueError(f'Operación de plantilla desconocida: {kind}')
+        return steps, state
+
+
+def _measured_cell(pdf, padding, h, text, align):
+    pdf.cell(text_layout.string_width(pdf, text) + padding, h, txt=text, align=align)
+
+
+def _run(steps, pdf, scope, env):
+    for step in steps:
+        step(pdf, scope, env)
+
+
+def _each(steps, pdf, items, env):
+    for item in items:
+        for step in steps:
+            step(pdf, item, env)
+
+
+class RenderEnv:
+    """Servicios externos que necesitan los pasos del plan (p. ej. incrustar la foto)."""
+
+    __slots__ = ('embed_image',)
+
+    def __init__(self, embed_image=None):
+        self.embed_image = embed_image
+
+
+class RenderPlan:
+    """Plan de render precompilado para una plantilla y un color."""
+
+    __slots__ = ('template_type', 'template_color', 'steps')
+
+    def __init__(self, template_type, template_color, steps):
+        self.template_type = template_type
+        self.template_color = template_color
+        self.steps = steps
+
+    def render(self, pdf, data, env):
+        for step in self.steps:
+            step(pdf, data, env)
+
+
+def compile_template(template_type, template_color, spec):
+    """Compila una plantilla con uno de sus colores."""
+    compiler = TemplateCompiler(spec.palettes[template_color], spec.options)
+    steps, _ = compiler.compile(spec.layout, {})
+    return RenderPlan(template_type, template_color, steps)
+
+
+class TemplateRegistry:
+    """Planes compilados de todas las plantillas y colores, resueltos al iniciar."""
+
+    def __init__(self, templates, default_template):
+        self.templates = templates
+        self.default_template = default_template
+        self.plans = {
+            (template_type, color): compile_template(template_type, color, spec)
+            for template_type, spec in templates.items()
+            for color in spec.palettes
+        }
+
+    def resolve(self, template_type, template_color):
+        """Plantilla y color pedidos, reemplazados por los valores por defecto si no existen."""
+        if template_type not in self.templates:
+            template_type = self.default_template
+        spec = self.templates[template_type]
+        if template_color not in spec.palettes:
+            template_color = spec.default_color
+        return template_type, template_color
+
+    def get_plan(self, template_type, template_color):
+        """Plan para la plantilla y el color pedidos, con los valores por defecto si no existen."""
+        return self.plans[self.resolve(template_type, template_color)]
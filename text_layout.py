@@ -0,0 +1,136 @@
+"""
+Medición de texto y corte de líneas para las fuentes base de FPDF.
+
+``multi_cell`` de FPDF 1.7.2 recorre el texto carácter por carácter sumando
+anchos en Python. Aquí los anchos de cada fuente se toman de una tabla, las
+palabras ya medidas se guardan en caché y los cortes de línea se calculan con
+sumas prefijas y búsqueda binaria. El resultado (celdas y espaciado de
+justificación) es idéntico al de ``FPDF.multi_cell``.
+"""
+
+from bisect import bisect_right
+from itertools import accumulate, repeat
+
+# Máximo de palabras medidas que se guardan por fuente
+WORD_CACHE_SIZE = 20000
+
+# Tipos de corte de línea
+BREAK_NEWLINE = 0  # salto de línea explícito
+BREAK_SPACE = 1  # corte automático en el último espacio
+BREAK_CHAR = 2  # corte automático dentro de una palabra
+BREAK_LAST = 3  # último tramo del texto
+
+
+class FontMetrics:
+    """Tabla de anchos de una fuente (en milésimas del tamaño) con caché de palabras."""
+
+    __slots__ = ('widths', 'space_width', 'word_widths')
+
+    def __init__(self, widths):
+        self.widths = widths
+        self.space_width = widths.get(' ', 0)
+        self.word_widths = {}
+
+    def word_width(self, word):
+        width = self.word_widths.get(word)
+        if width is None:
+            width = sum(map(self.widths.get, word, repeat(0)))
+            if len(self.word_widths) >= WORD_CACHE_SIZE:
+                self.word_widths.clear()
+            self.word_widths[word] = width
+        return width
+
+    def text_width(self, text):
+        """Ancho del texto en milésimas del tamaño de fuente."""
+        words = text.split(' ')
+        return sum(map(self.word_width, words)) + self.space_width * (len(words) - 1)
+
+    def prefix_widths(self, text):
+        """Sumas prefijas de los anchos: ``P[k]`` es el ancho de ``text[:k]``."""
+        return list(accumulate(map(self.widths.get, text, repeat(0)), initial=0))
+
+
+_metrics = {}
+
+
+def font_metrics(font):
+    """Métricas de una fuente base registrada en el PDF (``pdf.fonts[...]``)."""
+    metrics = _metrics.get(font['name'])
+    if metrics is None:
+        metrics = _metrics[font['name']] = FontMetrics(font['cw'])
+    return metrics
+
+
+def metrics_for(pdf):
+    """Métricas de la fuente actual del PDF (None para fuentes TrueType Unicode)."""
+    if pdf.unifontsubset:
+        return None
+    return font_metrics(pdf.current_font)
+
+
+def string_width(pdf, text):
+    """Equivalente a ``pdf.get_string_width`` usando la caché de palabras."""
+    metrics = metrics_for(pdf)
+    if metrics is None:
+        return pdf.get_string_width(text)
+    return metrics.text_width(text) * pdf.font_size / 1000.0
+
+
+def break_lines(metrics, text, wmax):
+    """Corta ``text`` en líneas de ancho máximo ``wmax`` con el mismo criterio que ``FPDF.multi_cell``.
+
+    Devuelve tuplas ``(inicio, fin, tipo, ancho_hasta_el_espacio, espacios)``.
+    """
+    nb = len(text)
+    if nb > 0 and text[nb - 1] == '\n':
+        nb -= 1
+    prefix = metrics.prefix_widths(text)
+    lines = []
+    j = 0
+    while True:
+        end = text.find('\n', j, nb)
+        if end == -1:
+            end = nb
+        # Cortes automáticos dentro del párrafo [j, end)
+        while j < end:
+            # Primer carácter cuyo ancho acumulado desde j supera wmax
+            k = bisect_right(prefix, prefix[j] + wmax, j + 1, end + 1)
+            if k > end:
+                break
+            i = k - 1
+            sep = text.rfind(' ', j, i + 1)
+            if sep == -1:
+                if i == j:
+                    i += 1
+                lines.append((j, i, BREAK_CHAR, 0, 0))
+                j = i
+            else:
+                lines.append((j, sep, BREAK_SPACE, prefix[sep] - prefix[j], text.count(' ', j, sep + 1)))
+                j = sep + 1
+        if end == nb:
+            lines.append((j, nb, BREAK_LAST, 0, 0))
+            return lines
+        lines.append((j, end, BREAK_NEWLINE, 0, 0))
+        j = end + 1
+
+
+def multi_cell(pdf, w, h, txt='', align='J'):
+    """Equivalente a ``pdf.multi_cell(w, h, txt, align=align)`` sin borde ni relleno."""
+    metrics = metrics_for(pdf)
+    if metrics is None:
+        return pdf.multi_cell(w, h, txt=txt, align=align)
+    if w == 0:
+        w = pdf.w - pdf.r_margin - pdf.x
+    wmax = (w - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+    text = txt.replace('\r', '')
+    for start, end, kind, line_width, spaces in break_lines(metrics, text, wmax):
+        if kind == BREAK_SPACE:
+            # Justificación: repartir el espacio sobrante entre las palabras de la línea
+            if align == 'J':
+                pdf.ws = (wmax - line_width) / 1000.0 * pdf.font_size / (spaces - 1) if spaces > 1 else 0
+                pdf._out('%.3f Tw' % (pdf.ws * pdf.k))
+        elif pdf.ws > 0:
+            pdf.ws = 0
+            pdf._out('0 Tw')
+        pdf.cell(w, h, text[start:end], 0, 2, align, 0)
+    pdf.x = pdf.l_margin